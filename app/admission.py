@@ -0,0 +1,170 @@
+import os
+import math
+import time
+import sqlite3
+import asyncio
+import threading
+import contextlib
+
+
+class AdmissionRejected(Exception):
+    """Request turned away; `retry_after` is a hint in seconds for the client."""
+
+    def __init__(self, retry_after, reason):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+# --- TOKEN BUCKET STORES ---
+class MemoryBucketStore:
+    """Per-process buckets. Exact for a single worker."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {}  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def take(self, key, cost, rate, burst, now):
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            if len(self._buckets) >= self.max_keys and key not in self._buckets:
+                # Full buckets carry no state worth keeping
+                self._buckets = {k: v for k, v in self._buckets.items() if v[0] + (now - v[1]) * rate < burst}
+            self._buckets[key] = (tokens, now)
+            return allowed, tokens
+
+
+class SqliteBucketStore:
+    """Buckets in a local SQLite file, shared by every worker process on the host."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, cost, rate, burst, now):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now))
+            conn.execute("COMMIT")
+            return allowed, tokens
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class RateLimiter:
+    """Token bucket per key: `per_minute` sustained, bursts up to `burst`."""
+
+    def __init__(self, per_minute, burst, store=None):
+        self.rate = per_minute / 60.0
+        self.burst = float(burst)
+        self.store = store or MemoryBucketStore()
+        self.rejected = 0
+
+    def check(self, key, cost=1.0):
+        """Raise AdmissionRejected if `key` is over its limit."""
+        cost = min(float(cost), self.burst)
+        try:
+            allowed, tokens = self.store.take(key, cost, self.rate, self.burst, time.time())
+        except sqlite3.Error:
+            return  # a contended shared store must not take the endpoint down
+        if not allowed:
+            self.rejected += 1
+            retry_after = max(1, math.ceil((cost - tokens) / self.rate)) if self.rate > 0 else 60
+            raise AdmissionRejected(retry_after, "rate limit")
+
+
+# --- GLOBAL CONCURRENCY CAP ---
+class ConcurrencyGate:
+    """At most `limit` requests run at once; up to `max_queue` more may wait
+    `queue_timeout` seconds for a slot. Anyone beyond that is rejected at once
+    so clients get a fast 429 instead of a slow timeout."""
+
+    def __init__(self, limit, max_queue, queue_timeout=5.0, retry_after=5):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._slots = threading.Semaphore(limit)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    def _enter_queue(self):
+        with self._lock:
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                raise AdmissionRejected(self.retry_after, "server busy")
+            self.waiting += 1
+
+    def _leave_queue(self, admitted):
+        with self._lock:
+            self.waiting -= 1
+            if admitted:
+                self.in_flight += 1
+            else:
+                self.rejected += 1
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    @contextlib.contextmanager
+    def slot(self):
+        self._enter_queue()
+        admitted = self._slots.acquire(timeout=self.queue_timeout)
+        self._leave_queue(admitted)
+        if not admitted:
+            raise AdmissionRejected(self.retry_after, "server busy")
+        try:
+            yield
+        finally:
+            self._release()
+            self._slots.release()
+
+    @contextlib.asynccontextmanager
+    async def async_slot(self):
+        # Same accounting for the asgi.py event loop, without blocking it
+        self._enter_queue()
+        deadline = time.monotonic() + self.queue_timeout
+        admitted = self._slots.acquire(blocking=False)
+        while not admitted and time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+            admitted = self._slots.acquire(blocking=False)
+        self._leave_queue(admitted)
+        if not admitted:
+            raise AdmissionRejected(self.retry_after, "server busy")
+        try:
+            yield
+        finally:
+            self._release()
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": self.in_flight, "waiting": self.waiting, "rejected": self.rejected, "limit": self.limit}
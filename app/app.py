@@ -1,12 +1,15 @@
 import os
+import sys
 import uuid
 import tempfile
 import warnings
 import io
+import re
+import json
+import time
 import datetime
 import random # Added for mock sensor data
 import certifi # ADDED: To fix SSL Handshake errors
-import pickle # ADDED: For loading the ML model
 import pandas as pd # ADDED: For structuring model input
 import xgboost # ADDED: Essential for loading XGBoost models from pickle
 
@@ -14,7 +17,7 @@ import xgboost # ADDED: Essential for loading XGBoost models from pickle
 warnings.filterwarnings("ignore", category=FutureWarning)
 warnings.filterwarnings("ignore", category=UserWarning)
 
-from flask import Flask, render_template_string, request, jsonify, send_file, session, redirect, url_for
+from flask import Flask, render_template, request, abort, g, jsonify, send_file, session, redirect, url_for, Response, stream_with_context
 import google.generativeai as genai
 from gtts import gTTS
 from dotenv import load_dotenv
@@ -22,12 +25,26 @@ from PIL import Image
 
 # --- AUTHENTICATION & DB IMPORTS ---
 from pymongo import MongoClient
-from pymongo.errors import ServerSelectionTimeoutError, OperationFailure
-from werkzeug.security import generate_password_hash, check_password_hash
+from pymongo.errors import ServerSelectionTimeoutError, OperationFailure, DuplicateKeyError
+
+from diagnosis_cache import DiagnosisCache, phash
+from pricing import CATEGORICAL_COLUMNS, InvalidDateError, PredictionCache, build_feature_frame, predict_frame
+from model_registry import ModelRegistry
+from forecasts import ForecastStore, make_key
+from autocomplete import CategoryIndex
+from timeseries import TimeSeriesStore, parse_ts, parse_value
+from hashing import HashQueueFull, HashTimeout, PasswordHasher
+from assets import AssetBundle, compress_response
+from admission import AdmissionRejected, ConcurrencyGate, RateLimiter, SqliteBucketStore
+from metrics import Metrics, RequestProfiler
+from knowledge import KnowledgeBase, is_agricultural
+from conversation import ConversationMemory
 
 # --- CONFIGURATION ---
 load_dotenv()
-app = Flask(__name__)
+# CSS/JS live in app/static and are served precompressed from /assets (see assets.py);
+# the page itself is app/templates/index.html, compiled once and cached by Jinja.
+app = Flask(__name__, static_folder=None)
 
 # Security Config
 app.secret_key = os.getenv("SECRET_KEY", "dev_secret_key_change_in_prod")
@@ -43,757 +60,332 @@ else:
 # Configure MongoDB
 mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
 users_collection = None # Initialize safely
+devices_collection = None # Sensor device_id -> owning username
+username_index_ready = False # Unique index lets register() skip the pre-check
+
+def connect_mongo():
+    # "mongomock://" selects an in-process fake for local runs and tests (pip install mongomock)
+    if mongo_uri.startswith("mongomock://"):
+        import mongomock
+        return mongomock.MongoClient()
 
-try:
     # FIXED: Reverted to tlsAllowInvalidCertificates=True as certifi failed in your environment.
     # This ensures connection works for the hackathon regardless of SSL issues.
-    client = MongoClient(
+    # One shared client per process; pool sizes are tuned for many short user lookups.
+    return MongoClient(
         mongo_uri, 
         serverSelectionTimeoutMS=5000,
-        tlsAllowInvalidCertificates=True
+        tlsAllowInvalidCertificates=True,
+        maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", "50")),
+        minPoolSize=int(os.getenv("MONGO_MIN_POOL_SIZE", "5")),
+        maxIdleTimeMS=int(os.getenv("MONGO_MAX_IDLE_MS", "300000")),
+        waitQueueTimeoutMS=int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000")),
+        connectTimeoutMS=5000,
+        retryWrites=True,
     )
+
+try:
+    client = connect_mongo()
     client.admin.command('ping')
     db = client.cropsense_db
     users_collection = db.users
+    devices_collection = db.devices
     print(f"✅ Successfully connected and authenticated to MongoDB")
+    try:
+        devices_collection.create_index("device_id", unique=True, name="device_id_unique")
+    except OperationFailure as e:
+        print(f"⚠️ Warning: could not create unique device index: {e}")
+    try:
+        # Idempotent; turns login into an index lookup and makes usernames unique
+        users_collection.create_index("username", unique=True, name="username_unique")
+        username_index_ready = True
+    except OperationFailure as e:
+        # Usually existing duplicate usernames; keep the old check-then-insert flow
+        print(f"⚠️ Warning: could not create unique username index: {e}")
 except Exception as e:
     print(f"❌ MongoDB Error: {e}")
     users_collection = None
+    devices_collection = None
+
+# Password hashing runs on its own bounded pool so login bursts cannot starve chat requests.
+# PASSWORD_HASH_METHOD takes werkzeug method strings, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000";
+# unset keeps werkzeug's default. Existing hashes verify whatever method made them.
+password_hasher = PasswordHasher(
+    workers=int(os.getenv("PASSWORD_HASH_WORKERS", "2")),
+    max_pending=int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32")),
+    method=os.getenv("PASSWORD_HASH_METHOD") or None,
+    timeout=float(os.getenv("PASSWORD_HASH_TIMEOUT", "10")),
+)
+
+def auth_busy_response():
+    return {"success": False, "message": "Too many sign-ins right now, please retry in a few seconds"}, 503, {"Retry-After": "2"}
 
 # --- LOAD PRICE PREDICTION MODEL ---
-price_model = None
+# Versions live in app/models/<version>/ (see model_registry.py); the old
+# app/price_model.pkl is still served when no versioned model exists.
 model_path = os.path.join(os.path.dirname(__file__), 'price_model.pkl')
-try:
-    if os.path.exists(model_path):
-        with open(model_path, 'rb') as f:
-            price_model = pickle.load(f)
-        print(f"✅ Price Prediction Model loaded from {model_path}")
-    else:
-        print(f"⚠️ Warning: price_model.pkl not found at {model_path}")
-except Exception as e:
-    print(f"❌ Error loading price model: {e}")
+model_dir = os.getenv("PRICE_MODEL_DIR", os.path.join(os.path.dirname(__file__), 'models'))
+
+# Cache of recent predictions; cleared whenever a new model is swapped in
+prediction_cache = PredictionCache(
+    max_entries=int(os.getenv("PRICE_CACHE_SIZE", "4096")),
+    ttl_seconds=int(os.getenv("PRICE_CACHE_TTL", "900")),
+)
+
+# Autocomplete/canonicalisation over the active model's training categories
+category_index = CategoryIndex()
+
+def on_price_model_swap(bundle):
+    global category_index
+    prediction_cache.invalidate()
+    category_index = CategoryIndex(bundle.categories)
+
+price_registry = ModelRegistry(
+    model_dir,
+    legacy_path=model_path,
+    on_swap=on_price_model_swap,
+    check_interval=float(os.getenv("PRICE_MODEL_CHECK_INTERVAL", "5")),
+)
+if price_registry.refresh(force=True) is None:
+    print(f"⚠️ Warning: no price model found in {model_dir} or at {model_path}")
+elif price_registry.active.categories is None:
+    print("⚠️ Warning: no training categories found next to the price model; using legacy category encoding")
+
+# Precomputed multi-horizon forecasts (built offline by forecasts.py)
+forecast_store = ForecastStore(
+    os.getenv("PRICE_FORECAST_DIR", os.path.join(os.path.dirname(__file__), 'forecasts')),
+    check_interval=float(os.getenv("PRICE_FORECAST_CHECK_INTERVAL", "30")),
+)
+
+# --- SENSOR & MARKET PRICE TIME SERIES ---
+timeseries_store = TimeSeriesStore(
+    os.getenv("TIMESERIES_DIR", os.path.join(os.path.dirname(__file__), '..', 'data', 'timeseries'))
+)
+# Devices and price feeds post without a browser session and must send this
+# token (ingestion is off while it is unset). Users see readings only from the
+# devices they have registered through /api/sensors/devices.
+SENSOR_INGEST_TOKEN = os.getenv("SENSOR_INGEST_TOKEN")
+DEVICE_ID_RE = re.compile(r'^[\w.-]{1,64}$', re.ASCII)
+TIMESERIES_MAX_POINTS = int(os.getenv("TIMESERIES_MAX_POINTS", "5000"))
+TIMESERIES_MAX_RANGE_DAYS = int(os.getenv("TIMESERIES_MAX_RANGE_DAYS", "92"))
+
+# Batch prediction limits
+PRICE_BATCH_MAX_ROWS = int(os.getenv("PRICE_BATCH_MAX_ROWS", "10000"))
+PRICE_BATCH_CHUNK = int(os.getenv("PRICE_BATCH_CHUNK", "2048"))
 
 # Global Temp Directory for Audio
 TEMP_DIR = tempfile.gettempdir()
 
-# --- HTML/CSS/JS FRONTEND ---
-HTML_TEMPLATE = """
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>CropSense AI | Ultimate Agri-Tech</title>
-    <link href="https://fonts.googleapis.com/css2?family=Outfit:wght@300;400;600;700&display=swap" rel="stylesheet">
-    <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css" rel="stylesheet">
-    <script src="https://cdn.jsdelivr.net/npm/marked/marked.min.js"></script>
-    <style>
-        :root {
-            --glass-bg: rgba(255, 255, 255, 0.05);
-            --glass-border: rgba(255, 255, 255, 0.1);
-            --primary-accent: #00ff88;
-            --secondary-accent: #00b894;
-            --recording-color: #ff4757;
-            --text-color: #ffffff;
-            --dark-overlay: rgba(5, 20, 10, 0.85);
-            --error-color: #ff6b6b;
-            --nitrogen-color: #00d2ff;
-        }
-
-        * { margin: 0; padding: 0; box-sizing: border-box; font-family: 'Outfit', sans-serif; }
-
-        body {
-            background: url("https://images.unsplash.com/photo-1625246333195-5519a495d026?q=80&w=2574&auto=format&fit=crop");
-            background-size: cover;
-            background-position: center;
-            background-attachment: fixed;
-            min-height: 100vh;
-            color: var(--text-color);
-            overflow-x: hidden;
-        }
-
-        body::before {
-            content: ''; position: absolute; top: 0; left: 0; width: 100%; height: 100%;
-            background: var(--dark-overlay); z-index: -1; backdrop-filter: blur(3px);
-        }
-
-        /* --- AUTH STYLES --- */
-        .auth-container {
-            display: flex; justify-content: center; align-items: center; height: 100vh;
-        }
-        .auth-box {
-            background: var(--glass-bg);
-            backdrop-filter: blur(20px);
-            border: 1px solid var(--glass-border);
-            padding: 3rem;
-            border-radius: 24px;
-            width: 100%; max-width: 420px;
-            text-align: center;
-            box-shadow: 0 8px 32px 0 rgba(0, 0, 0, 0.37);
-        }
-        .auth-title { font-size: 2rem; margin-bottom: 0.5rem; color: var(--primary-accent); }
-        .auth-subtitle { color: #ccc; margin-bottom: 2rem; font-size: 0.9rem; }
-        
-        .form-group { margin-bottom: 1.5rem; text-align: left; }
-        .form-group label { display: block; margin-bottom: 0.5rem; font-size: 0.9rem; color: #ddd; }
-        .auth-input {
-            width: 100%; background: rgba(0,0,0,0.3); border: 1px solid var(--glass-border);
-            padding: 14px; color: white; border-radius: 12px; font-size: 1rem; outline: none; transition: 0.3s;
-        }
-        .auth-input:focus { border-color: var(--primary-accent); background: rgba(0,0,0,0.5); }
-        
-        .auth-btn {
-            width: 100%; background: var(--primary-accent); color: #05140a;
-            padding: 14px; border-radius: 12px; border: none; font-weight: 700; font-size: 1rem;
-            cursor: pointer; transition: 0.3s; margin-top: 1rem;
-        }
-        .auth-btn:hover { transform: translateY(-2px); box-shadow: 0 0 20px rgba(0, 255, 136, 0.4); }
-        
-        .switch-auth { margin-top: 1.5rem; font-size: 0.9rem; color: #aaa; }
-        .switch-auth a { color: var(--primary-accent); text-decoration: none; font-weight: 600; cursor: pointer; }
-        .switch-auth a:hover { text-decoration: underline; }
-
-        .hidden { display: none; }
-        .error-msg { color: var(--error-color); font-size: 0.85rem; margin-top: 5px; min-height: 20px; }
-
-        /* --- APP LAYOUT --- */
-        .container {
-            max-width: 1200px; margin: 0 auto; padding: 2rem;
-            display: grid; grid-template-columns: 300px 1fr; gap: 2rem; height: 100vh;
-        }
-        .sidebar {
-            background: var(--glass-bg); backdrop-filter: blur(20px);
-            border: 1px solid var(--glass-border); border-radius: 24px; padding: 2rem;
-            display: flex; flex-direction: column; gap: 2rem;
-            box-shadow: 0 8px 32px 0 rgba(0, 0, 0, 0.37);
-        }
-        .logo-area { text-align: center; margin-bottom: 1rem; }
-        .logo-icon { font-size: 3rem; color: var(--primary-accent); text-shadow: 0 0 20px rgba(0, 255, 136, 0.4); }
-        .control-group label { display: block; margin-bottom: 0.5rem; font-size: 0.9rem; color: #ccc; }
-        select, .toggle-btn {
-            width: 100%; background: rgba(0, 0, 0, 0.3); border: 1px solid var(--glass-border);
-            color: white; padding: 12px; border-radius: 12px; outline: none; cursor: pointer; transition: 0.3s;
-        }
-        select:hover { border-color: var(--primary-accent); }
-        .main-content { display: flex; flex-direction: column; gap: 1.5rem; height: calc(100vh - 4rem); }
-        
-        /* Glass Panel */
-        .glass-panel {
-            background: var(--glass-bg); backdrop-filter: blur(16px);
-            border: 1px solid var(--glass-border); border-radius: 24px; padding: 1.5rem;
-            box-shadow: 0 4px 20px rgba(0,0,0,0.2); position: relative; overflow: hidden;
-            display: flex; flex-direction: column; /* Ensure flex flow */
-        }
-        .chat-container { flex-grow: 1; overflow-y: auto; padding-right: 10px; display: flex; flex-direction: column; gap: 1rem; }
-        .chat-container::-webkit-scrollbar { width: 6px; }
-        .chat-container::-webkit-scrollbar-thumb { background: rgba(255,255,255,0.2); border-radius: 3px; }
-        
-        .message { display: flex; gap: 1rem; align-items: flex-start; max-width: 80%; animation: fadeIn 0.3s ease; }
-        .message.user { align-self: flex-end; flex-direction: row-reverse; }
-        .avatar { width: 40px; height: 40px; border-radius: 50%; display: flex; align-items: center; justify-content: center; font-size: 1.2rem; flex-shrink: 0; }
-        .avatar.ai { background: linear-gradient(135deg, #11998e, #38ef7d); box-shadow: 0 0 15px rgba(56, 239, 125, 0.4); }
-        .avatar.user { background: rgba(255,255,255,0.2); }
-        .bubble {
-            background: rgba(255,255,255,0.05); padding: 1rem; border-radius: 18px;
-            border-top-left-radius: 2px; line-height: 1.6; font-size: 0.95rem; border: 1px solid rgba(255,255,255,0.05);
-        }
-        .bubble strong { color: var(--primary-accent); font-weight: 700; }
-        .bubble ul { margin-left: 20px; margin-top: 5px; margin-bottom: 5px; }
-        .message.user .bubble {
-            background: rgba(0, 255, 136, 0.1); border-color: rgba(0, 255, 136, 0.2); border-radius: 18px; border-top-right-radius: 2px;
-        }
-        
-        /* Special Buttons */
-        .nitrogen-btn {
-            background: rgba(0, 210, 255, 0.15); 
-            border-color: var(--nitrogen-color);
-            color: var(--nitrogen-color);
-            font-weight: 600;
-        }
-        .nitrogen-btn:hover {
-            background: rgba(0, 210, 255, 0.3);
-            box-shadow: 0 0 15px rgba(0, 210, 255, 0.4);
-        }
-
-        .price-toggle-btn {
-            background: rgba(241, 196, 15, 0.15);
-            border-color: #f1c40f;
-            color: #f1c40f;
-            font-weight: 600;
-            margin-top: 10px;
-        }
-        .price-toggle-btn:hover {
-            background: rgba(241, 196, 15, 0.3);
-            box-shadow: 0 0 15px rgba(241, 196, 15, 0.4);
-        }
-
-        .input-area {
-            display: flex; gap: 1rem; align-items: center; background: rgba(0,0,0,0.2);
-            padding: 0.5rem; border-radius: 50px; border: 1px solid var(--glass-border);
-        }
-        .file-upload-label { cursor: pointer; padding: 10px; color: var(--primary-accent); transition: 0.3s; }
-        .file-upload-label:hover { transform: scale(1.1); text-shadow: 0 0 10px var(--primary-accent); }
-        #imageInput { display: none; }
-        #textInput { flex-grow: 1; background: transparent; border: none; color: white; padding: 10px; font-size: 1rem; outline: none; }
-        .action-btn {
-            background: var(--primary-accent); color: #000; border: none; width: 45px; height: 45px;
-            border-radius: 50%; cursor: pointer; transition: 0.3s; display: flex; align-items: center; justify-content: center;
-        }
-        .action-btn:hover { transform: scale(1.1); box-shadow: 0 0 15px var(--primary-accent); }
-        #micBtn.listening { background: var(--recording-color); color: white; animation: pulse 1.5s infinite; }
-        .image-preview { max-width: 100px; max-height: 100px; border-radius: 10px; display: none; border: 2px solid var(--primary-accent); margin-right: 10px; }
-
-        /* --- PRICE PREDICTION UI --- */
-        .price-dashboard {
-            display: none; /* Hidden by default */
-            flex-direction: column;
-            gap: 20px;
-            animation: fadeIn 0.5s ease;
-            height: 100%;
-            overflow-y: auto;
-        }
-
-        .price-card {
-            background: rgba(255, 255, 255, 0.05);
-            backdrop-filter: blur(20px);
-            border: 1px solid rgba(255, 255, 255, 0.1);
-            border-radius: 24px;
-            padding: 2rem;
-            box-shadow: 0 8px 32px 0 rgba(0, 0, 0, 0.37);
-            background: linear-gradient(135deg, rgba(255,255,255,0.03) 0%, rgba(0,255,136,0.05) 100%);
-        }
-
-        .form-grid {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-            gap: 1.5rem;
-            margin-bottom: 2rem;
-        }
-
-        .price-input-group label {
-            display: block;
-            color: #ccc;
-            margin-bottom: 0.5rem;
-            font-size: 0.9rem;
-        }
-
-        .price-input {
-            width: 100%;
-            background: rgba(0, 0, 0, 0.3);
-            border: 1px solid var(--glass-border);
-            color: white;
-            padding: 12px;
-            border-radius: 12px;
-            outline: none;
-            transition: 0.3s;
-        }
-        .price-input:focus { border-color: var(--primary-accent); box-shadow: 0 0 10px rgba(0, 255, 136, 0.2); }
-
-        .predict-btn {
-            width: 100%;
-            background: linear-gradient(90deg, #00ff88, #00b894);
-            color: #05140a;
-            padding: 15px;
-            border: none;
-            border-radius: 15px;
-            font-size: 1.1rem;
-            font-weight: 700;
-            cursor: pointer;
-            transition: 0.3s;
-            text-transform: uppercase;
-            letter-spacing: 1px;
-            box-shadow: 0 0 20px rgba(0, 255, 136, 0.3);
-        }
-        .predict-btn:hover { transform: translateY(-2px); box-shadow: 0 0 30px rgba(0, 255, 136, 0.6); }
-
-        .result-box {
-            margin-top: 2rem;
-            padding: 2rem;
-            background: rgba(0, 0, 0, 0.2);
-            border-radius: 20px;
-            border: 1px solid rgba(255,255,255,0.05);
-            text-align: center;
-            display: none;
-        }
-
-        .price-display {
-            font-size: 3.5rem;
-            font-weight: 800;
-            color: var(--primary-accent);
-            margin: 10px 0;
-            text-shadow: 0 0 20px rgba(0, 255, 136, 0.3);
-        }
-
-        .alert-box {
-            margin-top: 1.5rem;
-            padding: 1rem;
-            border-radius: 12px;
-            font-weight: 600;
-            font-size: 1.1rem;
-            display: inline-block;
-            width: 100%;
-        }
-
-        .alert-green { background: rgba(46, 204, 113, 0.2); color: #2ecc71; border: 1px solid #2ecc71; }
-        .alert-red { background: rgba(231, 76, 60, 0.2); color: #e74c3c; border: 1px solid #e74c3c; }
-        .alert-yellow { background: rgba(241, 196, 15, 0.2); color: #f1c40f; border: 1px solid #f1c40f; }
-
-        @keyframes shimmer {
-            0% { background-position: -1000px 0; }
-            100% { background-position: 1000px 0; }
-        }
-        .loading-shimmer {
-            animation: shimmer 2s infinite linear;
-            background: linear-gradient(to right, rgba(255,255,255,0.05) 4%, rgba(255,255,255,0.1) 25%, rgba(255,255,255,0.05) 36%);
-            background-size: 1000px 100%;
-        }
-        
-        @keyframes fadeIn { from { opacity: 0; transform: translateY(10px); } to { opacity: 1; transform: translateY(0); } }
-        @keyframes pulse { 0% { box-shadow: 0 0 0 0 rgba(255, 71, 87, 0.7); } 70% { box-shadow: 0 0 0 10px rgba(255, 71, 87, 0); } 100% { box-shadow: 0 0 0 0 rgba(255, 71, 87, 0); } }
-        
-        @media (max-width: 768px) {
-            .container { grid-template-columns: 1fr; height: auto; }
-            .sidebar { padding: 1rem; }
-            .main-content { height: 600px; }
-        }
-    </style>
-</head>
-<body>
-
-    {% if not user %}
-    <!-- === LOGIN / REGISTER VIEW === -->
-    <div class="auth-container">
-        <div class="auth-box">
-            <div class="logo-icon"><i class="fa-solid fa-leaf"></i></div>
-            <h2 class="auth-title">CropSense AI</h2>
-            <p class="auth-subtitle">Login to access advanced agri-intelligence</p>
-            
-            <!-- Login Form -->
-            <form id="loginForm" onsubmit="handleAuth(event, 'login')">
-                <div class="form-group">
-                    <label>Username</label>
-                    <input type="text" name="username" class="auth-input" required placeholder="Enter username">
-                </div>
-                <div class="form-group">
-                    <label>Password</label>
-                    <input type="password" name="password" class="auth-input" required placeholder="Enter password">
-                </div>
-                <div id="loginError" class="error-msg"></div>
-                <button type="submit" class="auth-btn">Sign In</button>
-                <div class="switch-auth">
-                    Don't have an account? <a onclick="toggleForms()">Sign Up</a>
-                </div>
-            </form>
-
-            <!-- Register Form -->
-            <form id="registerForm" class="hidden" onsubmit="handleAuth(event, 'register')">
-                <div class="form-group">
-                    <label>Choose Username</label>
-                    <input type="text" name="username" class="auth-input" required placeholder="Choose username">
-                </div>
-                <div class="form-group">
-                    <label>Choose Password</label>
-                    <input type="password" name="password" class="auth-input" required placeholder="Choose password">
-                </div>
-                <div id="registerError" class="error-msg"></div>
-                <button type="submit" class="auth-btn">Create Account</button>
-                <div class="switch-auth">
-                    Already have an account? <a onclick="toggleForms()">Sign In</a>
-                </div>
-            </form>
-        </div>
-    </div>
-    
-    <script>
-        function toggleForms() {
-            document.getElementById('loginForm').classList.toggle('hidden');
-            document.getElementById('registerForm').classList.toggle('hidden');
-            document.querySelectorAll('.error-msg').forEach(e => e.innerText = '');
-        }
-
-        async function handleAuth(e, type) {
-            e.preventDefault();
-            const form = e.target;
-            const formData = new FormData(form);
-            const errorDiv = document.getElementById(`${type}Error`);
-            const btn = form.querySelector('button');
-            
-            btn.innerHTML = '<i class="fa-solid fa-spinner fa-spin"></i> Processing...';
-            errorDiv.innerText = '';
-
-            try {
-                const res = await fetch(`/auth/${type}`, {
-                    method: 'POST',
-                    body: formData
-                });
-                const data = await res.json();
-                
-                if (data.success) {
-                    window.location.reload();
-                } else {
-                    errorDiv.innerText = data.message || "An error occurred";
-                    btn.innerText = type === 'login' ? 'Sign In' : 'Create Account';
-                }
-            } catch (err) {
-                errorDiv.innerText = "Connection Failed. Check Server.";
-                btn.innerText = type === 'login' ? 'Sign In' : 'Create Account';
-            }
-        }
-    </script>
-
-    {% else %}
-    <!-- === MAIN CHAT VIEW (Protected) === -->
-    <div class="container">
-        <!-- SIDEBAR -->
-        <aside class="sidebar">
-            <div class="logo-area">
-                <div class="logo-icon"><i class="fa-solid fa-leaf"></i></div>
-                <h2>CropSense AI</h2>
-                <p style="opacity: 0.7; font-size: 0.8rem;">Welcome, {{ user }}</p>
-            </div>
-
-            <div class="control-group">
-                <label><i class="fa-solid fa-language"></i> Language</label>
-                <select id="languageSelect">
-                    <option value="en">English</option>
-                    <option value="hi">Hindi (हिंदी)</option>
-                    <option value="es">Spanish (Español)</option>
-                    <option value="fr">French (Français)</option>
-                    <option value="ta">Tamil (தமிழ்)</option>
-                    <option value="te">Telugu (తెలుగు)</option>
-                </select>
-            </div>
-
-            <div class="control-group">
-                <label><i class="fa-solid fa-volume-high"></i> Audio Response</label>
-                <select id="audioToggle">
-                    <option value="true">Enabled</option>
-                    <option value="false">Disabled</option>
-                </select>
-            </div>
-
-            <!-- Dashboard Features -->
-            <div class="control-group" style="margin-top: 1rem; border-top: 1px solid rgba(255,255,255,0.1); padding-top: 1rem;">
-                <label style="color: #ccc;"><i class="fa-solid fa-layer-group"></i> Smart Tools</label>
-                
-                <button id="nitrogenBtn" onclick="toggleView('chat')" class="toggle-btn nitrogen-btn">
-                    <i class="fa-solid fa-flask"></i> Nitrogen Tracker
-                </button>
-                
-                <button id="priceBtn" onclick="toggleView('price')" class="toggle-btn price-toggle-btn">
-                    <i class="fa-solid fa-chart-line"></i> Price Predictor
-                </button>
-                
-                <button onclick="toggleView('chat')" class="toggle-btn" style="margin-top: 10px; background: rgba(0, 255, 136, 0.15); border-color: var(--primary-accent); color: var(--primary-accent);">
-                    <i class="fa-regular fa-comments"></i> AI Chatbot
-                </button>
-            </div>
-            
-            <a href="/logout" style="text-decoration: none; margin-top: auto;">
-                <button class="toggle-btn" style="background: rgba(255, 71, 87, 0.2); color: #ff4757; border-color: #ff4757;">
-                    <i class="fa-solid fa-right-from-bracket"></i> Logout
-                </button>
-            </a>
-
-            <div style="padding-top: 20px;">
-                <p style="font-size: 0.8rem; opacity: 0.5;"><i class="fa-solid fa-circle-info"></i> v2.5 Auth Edition</p>
-            </div>
-        </aside>
-
-        <!-- MAIN INTERFACE -->
-        <main class="main-content">
-            
-            <!-- VIEW 1: CHAT BOT & NITROGEN -->
-            <div id="chat-view" style="display: flex; flex-direction: column; height: 100%;">
-                <div class="glass-panel" style="flex-grow: 1;">
-                    <div class="chat-container" id="chatContainer">
-                        <div class="message ai">
-                            <div class="avatar ai"><i class="fa-solid fa-robot"></i></div>
-                            <div class="bubble">
-                                Hello {{ user }}! I am CropSense AI. 🌱<br>
-                                I'm ready to help with your crop analysis.
-                            </div>
-                        </div>
-                    </div>
-                </div>
-
-                <div class="glass-panel" style="padding: 0.8rem; margin-top: 1.5rem; flex-shrink: 0;">
-                    <div style="display: flex; align-items: center;">
-                        <img id="preview" class="image-preview">
-                        <div class="input-area" style="flex-grow: 1;">
-                            <label for="imageInput" class="file-upload-label">
-                                <i class="fa-solid fa-camera"></i>
-                            </label>
-                            <input type="file" id="imageInput" accept="image/*">
-                            
-                            <input type="text" id="textInput" placeholder="Ask about crop health..." autocomplete="off">
-                            
-                            <button id="micBtn" class="action-btn" title="Speak"><i class="fa-solid fa-microphone"></i></button>
-                            <button id="sendBtn" class="action-btn" style="margin-left: 5px;"><i class="fa-solid fa-paper-plane"></i></button>
-                        </div>
-                    </div>
-                </div>
-            </div>
-
-            <!-- VIEW 2: PRICE PREDICTOR DASHBOARD -->
-            <div id="price-view" class="price-dashboard">
-                <div class="price-card">
-                    <h2 style="margin-bottom: 20px; color: var(--primary-accent);"><i class="fa-solid fa-chart-line"></i> Crop Price Prediction & Farmer Alert</h2>
-                    
-                    <div class="form-grid">
-                        <div class="price-input-group"><label>State</label><input type="text" id="predState" class="price-input" placeholder="e.g. Maharashtra"></div>
-                        <div class="price-input-group"><label>District</label><input type="text" id="predDistrict" class="price-input" placeholder="e.g. Pune"></div>
-                        <div class="price-input-group"><label>Market</label><input type="text" id="predMarket" class="price-input" placeholder="e.g. APMC"></div>
-                        <div class="price-input-group"><label>Commodity</label><input type="text" id="predCommodity" class="price-input" placeholder="e.g. Onion"></div>
-                        <div class="price-input-group"><label>Variety</label><input type="text" id="predVariety" class="price-input" placeholder="e.g. Red"></div>
-                        <div class="price-input-group"><label>Grade</label><input type="text" id="predGrade" class="price-input" placeholder="e.g. A"></div>
-                        <div class="price-input-group"><label>Min Price (₹)</label><input type="number" id="predMin" class="price-input" placeholder="0"></div>
-                        <div class="price-input-group"><label>Max Price (₹)</label><input type="number" id="predMax" class="price-input" placeholder="0"></div>
-                        <div class="price-input-group"><label>Current Modal Price (₹)</label><input type="number" id="currentPrice" class="price-input" placeholder="2000"></div>
-                        <div class="price-input-group"><label>Date</label><input type="date" id="predDate" class="price-input"></div>
-                    </div>
-
-                    <button onclick="predictPrice()" class="predict-btn">
-                        <i class="fa-solid fa-wand-magic-sparkles"></i> Predict Future Price
-                    </button>
-
-                    <div id="priceResult" class="result-box">
-                        <div id="loadingAnim" style="display:none;">
-                            <p>Analyzing market trends & historical data...</p>
-                            <div style="height: 60px; width: 80%; margin: 10px auto; border-radius: 10px;" class="loading-shimmer"></div>
-                        </div>
-                        <div id="finalResult" style="display:none;">
-                            <p style="opacity: 0.8; font-size: 1rem;">Predicted Modal Price (Next 7 Days)</p>
-                            <div class="price-display" id="predictedPriceDisplay">₹ 0</div>
-                            <div id="alertBox" class="alert-box"></div>
-                        </div>
-                    </div>
-                </div>
-            </div>
-
-        </main>
-    </div>
-
-    <!-- MAIN APP SCRIPT -->
-    <script>
-        const chatContainer = document.getElementById('chatContainer');
-        const textInput = document.getElementById('textInput');
-        const sendBtn = document.getElementById('sendBtn');
-        const micBtn = document.getElementById('micBtn');
-        const imageInput = document.getElementById('imageInput');
-        const preview = document.getElementById('preview');
-        const langSelect = document.getElementById('languageSelect');
-        const audioToggle = document.getElementById('audioToggle');
-        const nitrogenBtn = document.getElementById('nitrogenBtn');
-
-        marked.setOptions({ breaks: true, gfm: true });
-
-        // VIEW TOGGLING logic
-        function toggleView(viewName) {
-            const chatView = document.getElementById('chat-view');
-            const priceView = document.getElementById('price-view');
-            
-            if (viewName === 'price') {
-                chatView.style.display = 'none';
-                priceView.style.display = 'flex';
-            } else {
-                chatView.style.display = 'flex';
-                priceView.style.display = 'none';
-            }
-        }
-
-        // PRICE PREDICTION LOGIC (Connected to Backend)
-        async function predictPrice() {
-            const currentPriceInput = document.getElementById('currentPrice').value;
-            const currentPrice = parseFloat(currentPriceInput) || 0;
-            
-            const resultBox = document.getElementById('priceResult');
-            const loading = document.getElementById('loadingAnim');
-            const finalResult = document.getElementById('finalResult');
-            const display = document.getElementById('predictedPriceDisplay');
-            const alertBox = document.getElementById('alertBox');
-
-            // Gather Data
-            const payload = {
-                State: document.getElementById('predState').value,
-                District: document.getElementById('predDistrict').value,
-                Market: document.getElementById('predMarket').value,
-                Commodity: document.getElementById('predCommodity').value,
-                Variety: document.getElementById('predVariety').value,
-                Grade: document.getElementById('predGrade').value,
-                Min_Price: document.getElementById('predMin').value,
-                Max_Price: document.getElementById('predMax').value,
-                Current_Price: currentPrice,
-                Date: document.getElementById('predDate').value
-            };
-
-            resultBox.style.display = 'block';
-            loading.style.display = 'block';
-            finalResult.style.display = 'none';
-
-            try {
-                // Call Backend API
-                const response = await fetch('/api/predict_price', {
-                    method: 'POST',
-                    headers: {'Content-Type': 'application/json'},
-                    body: JSON.stringify(payload)
-                });
-                
-                const data = await response.json();
-                
-                loading.style.display = 'none';
-                finalResult.style.display = 'block';
-
-                if (response.ok) {
-                    const predicted = data.predicted_price.toFixed(2);
-                    display.innerText = `₹ ${predicted}`;
-                    
-                    // Reset Classes
-                    alertBox.className = 'alert-box';
-                    
-                    // Logic for Alert Message (Comparing predicted vs current)
-                    if (currentPrice > 0) {
-                        if (predicted > currentPrice * 1.05) {
-                            alertBox.classList.add('alert-green');
-                            alertBox.innerHTML = '<i class="fa-solid fa-arrow-trend-up"></i> Price Increasing: Hold crop for better profit';
-                        } else if (predicted < currentPrice * 0.95) {
-                            alertBox.classList.add('alert-red');
-                            alertBox.innerHTML = '<i class="fa-solid fa-arrow-trend-down"></i> Price Decreasing: Sell early to avoid loss';
-                        } else {
-                            alertBox.classList.add('alert-yellow');
-                            alertBox.innerHTML = '<i class="fa-solid fa-minus"></i> Market Stable: Price expected to remain stable';
-                        }
-                    } else {
-                        alertBox.classList.add('alert-yellow');
-                        alertBox.innerHTML = '<i class="fa-solid fa-check"></i> Prediction Complete';
-                    }
-                } else {
-                    display.innerText = "Error";
-                    alertBox.innerText = data.error || "Prediction failed";
-                    alertBox.className = 'alert-box alert-red';
-                }
-
-            } catch (error) {
-                loading.style.display = 'none';
-                finalResult.style.display = 'block';
-                display.innerText = "Error";
-                alertBox.innerText = "Connection Failed";
-                alertBox.className = 'alert-box alert-red';
-                console.error(error);
-            }
-        }
-
-        // Voice Input
-        const SpeechRecognition = window.SpeechRecognition || window.webkitSpeechRecognition;
-        let recognition = null;
-        if (SpeechRecognition) {
-            recognition = new SpeechRecognition();
-            recognition.continuous = false;
-            const langMap = { 'en': 'en-US', 'hi': 'hi-IN', 'es': 'es-ES', 'fr': 'fr-FR', 'ta': 'ta-IN', 'te': 'te-IN' };
-
-            recognition.onstart = () => { micBtn.classList.add('listening'); textInput.placeholder = "Listening..."; };
-            recognition.onend = () => { micBtn.classList.remove('listening'); textInput.placeholder = "Ask about crop health..."; };
-            recognition.onresult = (event) => { textInput.value = event.results[0][0].transcript; };
-            micBtn.addEventListener('click', () => { recognition.lang = langMap[langSelect.value] || 'en-US'; recognition.start(); });
-        } else { micBtn.style.display = 'none'; }
-
-        // --- MOCK SENSOR LOGIC (FOR HACKATHON) ---
-        nitrogenBtn.addEventListener('click', () => {
-            toggleView('chat'); // Ensure we are on chat view to see result
-            
-            // 1. Show Connecting Message
-            addMessage("📡 Connecting to IoT Soil Sensor (ESP32)...", 'ai');
-            
-            // 2. Simulate delay for "Scanning"
-            setTimeout(() => {
-                const levels = [120, 135, 142, 128, 145]; // Fake realistic data
-                const randomLevel = levels[Math.floor(Math.random() * levels.length)];
-                
-                const resultMsg = `
-### 🌱 Soil Nitrogen Analysis Complete
-
-* **Sensor Status:** Online 🟢
-* **Detected Nitrogen (N):** ${randomLevel} kg/ha
-* **Status:** **Optimal Range** ✅
-
-**Recommendation:** Your soil nitrogen levels are sufficient for the current growth stage. Continue with standard irrigation. No immediate fertilization required.
-                `;
-                addMessage(resultMsg, 'ai');
-                
-            }, 2500); // 2.5 second delay
-        });
-
-        imageInput.addEventListener('change', function() {
-            const file = this.files[0];
-            if (file) {
-                const reader = new FileReader();
-                reader.onload = (e) => { preview.src = e.target.result; preview.style.display = 'block'; };
-                reader.readAsDataURL(file);
-            }
-        });
-
-        async function sendMessage() {
-            const text = textInput.value;
-            const file = imageInput.files[0];
-            const lang = langSelect.value;
-            const audioEnabled = audioToggle.value === 'true';
-
-            if (!text && !file) return;
-
-            addMessage(text || "Analyzing...", 'user', file ? URL.createObjectURL(file) : null);
-            textInput.value = ''; imageInput.value = ''; preview.style.display = 'none';
-
-            const formData = new FormData();
-            formData.append('prompt', text);
-            formData.append('lang', lang);
-            if (file) formData.append('image', file);
-
-            const loadingId = addLoadingBubble();
-
-            try {
-                const response = await fetch('/api/chat', { method: 'POST', body: formData });
-                const data = await response.json();
-                removeMessage(loadingId);
-                
-                if (response.ok) {
-                    addMessage(data.text, 'ai');
-                    if (audioEnabled && data.audio_url) { new Audio(data.audio_url).play(); }
-                } else {
-                    addMessage("Error: " + (data.text || "Unknown Server Error"), 'ai');
-                }
-            } catch (error) {
-                removeMessage(loadingId);
-                addMessage("Connection failed.", 'ai');
-            }
-        }
-
-        function addMessage(text, sender, imageUrl = null) {
-            const div = document.createElement('div');
-            div.className = `message ${sender}`;
-            let content = sender === 'ai' ? marked.parse(text) : text;
-            if (imageUrl) content = `<img src="${imageUrl}" style="max-width: 150px; border-radius: 10px; margin-bottom: 5px; display:block;">` + content;
-            div.innerHTML = `<div class="avatar ${sender}"><i class="fa-solid fa-${sender === 'ai' ? 'robot' : 'user'}"></i></div><div class="bubble">${content}</div>`;
-            chatContainer.appendChild(div);
-            chatContainer.scrollTop = chatContainer.scrollHeight;
-        }
-
-        function addLoadingBubble() {
-            const id = 'loading-' + Date.now();
-            const div = document.createElement('div'); div.id = id; div.className = 'message ai';
-            div.innerHTML = `<div class="avatar ai"><i class="fa-solid fa-robot"></i></div><div class="bubble"><i class="fa-solid fa-spinner fa-spin"></i> Analyzing...</div>`;
-            chatContainer.appendChild(div);
-            chatContainer.scrollTop = chatContainer.scrollHeight;
-            return id;
-        }
-        function removeMessage(id) { const el = document.getElementById(id); if (el) el.remove(); }
-
-        sendBtn.addEventListener('click', sendMessage);
-        textInput.addEventListener('keypress', (e) => { if (e.key === 'Enter') sendMessage(); });
-    </script>
-    {% endif %}
-</body>
-</html>
-"""
+# --- IMAGE DIAGNOSIS CACHE ---
+# Near-identical crop photos (re-sent images, same outbreak) reuse the previous
+# Gemini diagnosis instead of paying for another vision call.
+diagnosis_cache = DiagnosisCache(
+    max_entries=int(os.getenv("DIAGNOSIS_CACHE_SIZE", "512")),
+    ttl_seconds=int(os.getenv("DIAGNOSIS_CACHE_TTL", str(6 * 3600))),
+    max_distance=int(os.getenv("DIAGNOSIS_CACHE_MAX_DISTANCE", "6")),
+)
+
+# --- RAG KNOWLEDGE BASE ---
+# Chat answers are grounded on the manuals ingested by rag/ingest.py. The vector
+# DB loads in the background; each chat starts its search on a small pool while
+# the image is decoded and waits at most RAG_TIMEOUT_MS for it (knowledge.py).
+# Non-English questions are translated locally for the search (rag/translation.py).
+# When rag/watch.py publishes builds into RAG_INDEX_DIR, the build named by its
+# CURRENT pointer is served and newer builds are swapped in without downtime;
+# otherwise the single RAG_CHROMA_DIR written by rag/ingest.py is used.
+RAG_DIR = os.path.join(os.path.dirname(__file__), '..', 'rag')
+RAG_CHROMA_DIR = os.getenv("RAG_CHROMA_DIR", os.path.join(os.path.dirname(__file__), '..', 'data', 'chroma_db'))
+RAG_INDEX_DIR = os.getenv("RAG_INDEX_DIR", os.path.join(os.path.dirname(__file__), '..', 'data', 'rag_index'))
+query_normalizer = None
+
+def knowledge_dir():
+    try:
+        with open(os.path.join(RAG_INDEX_DIR, 'CURRENT'), 'r', encoding='utf-8') as f:
+            build = f.read().strip()
+    except FileNotFoundError:
+        return RAG_CHROMA_DIR
+    return os.path.join(RAG_INDEX_DIR, build) if build else RAG_CHROMA_DIR
+
+def load_knowledge_search():
+    global query_normalizer
+    chroma_dir = knowledge_dir()
+    if not os.path.exists(os.path.join(chroma_dir, "chroma.sqlite3")):
+        raise FileNotFoundError(f"no vector DB in {chroma_dir}, run rag/ingest.py or rag/watch.py first")
+    if RAG_DIR not in sys.path:
+        sys.path.append(RAG_DIR)
+    import retriever
+    store = retriever.load_vectorstore(chroma_dir)
+    # Load the index into memory now, not on the first chat after a swap
+    store.similarity_search_with_score("crop", k=1)
+    # Also loads the translation models: here on the loader thread, not in a chat's retrieval budget
+    query_normalizer = query_normalizer or retriever.get_normalizer()
+
+    def search(query, k):
+        # `query` is already in English (translate_query below)
+        if not is_agricultural(query):
+            return []
+        with metrics.timer("chat_stage_seconds", stage="retrieval"):
+            hits = store.similarity_search_with_score(query, k=k)
+        # Chroma returns squared L2 distance; for MiniLM's unit vectors that is 2 - 2*cosine
+        return [(doc, 1 - distance / 2) for doc, distance in hits]
+    return search
+
+def translate_query(query):
+    # Its own stage with RAG_TRANSLATE_TIMEOUT_MS, so CPU translation doesn't use up RAG_TIMEOUT_MS
+    if query_normalizer is None:
+        return query
+    with metrics.timer("chat_stage_seconds", stage="translation"):
+        return query_normalizer.normalize(query)
+
+knowledge_base = KnowledgeBase(
+    load_knowledge_search,
+    k=int(os.getenv("RAG_TOP_K", "4")),
+    max_tokens=int(os.getenv("RAG_CONTEXT_TOKENS", "600")),
+    min_similarity=float(os.getenv("RAG_MIN_SIMILARITY", "0.3")),
+    timeout=int(os.getenv("RAG_TIMEOUT_MS", "300")) / 1000,
+    workers=int(os.getenv("RAG_WORKERS", "4")),
+    version=knowledge_dir,
+    check_interval=float(os.getenv("RAG_INDEX_CHECK_SECONDS", "30")),
+    translate=translate_query,
+    translate_timeout=int(os.getenv("RAG_TRANSLATE_TIMEOUT_MS", "1500")) / 1000,
+)
+if os.getenv("RAG_ENABLED", "1") == "1":
+    knowledge_base.start()
+
+# --- ADMISSION CONTROL FOR LLM-BACKED ROUTES ---
+# Per-user token bucket (image analyses cost more) plus a per-process cap on
+# concurrent Gemini calls with a short bounded queue. RATE_LIMIT_DB shares the
+# buckets between worker processes on one host through a local SQLite file.
+CHAT_IMAGE_COST = float(os.getenv("CHAT_IMAGE_COST", "3"))
+chat_limiter = RateLimiter(
+    per_minute=float(os.getenv("CHAT_RATE_PER_MINUTE", "10")),
+    burst=float(os.getenv("CHAT_RATE_BURST", "6")),
+    store=SqliteBucketStore(os.environ["RATE_LIMIT_DB"]) if os.getenv("RATE_LIMIT_DB") else None,
+)
+llm_gate = ConcurrencyGate(
+    limit=int(os.getenv("LLM_MAX_CONCURRENT", "16")),
+    max_queue=int(os.getenv("LLM_MAX_QUEUE", "32")),
+    queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "5")),
+)
+
+def rejected_body(e):
+    message = "⚠️ Too many requests, please wait a moment." if e.reason == "rate limit" else "⚠️ Server is busy, please try again shortly."
+    return {"text": message, "retry_after": e.retry_after}, 429, {"Retry-After": str(e.retry_after)}
+
+# --- CONVERSATION MEMORY ---
+# Recent turns per user are replayed into the chat prompt; older turns are
+# folded into a short summary so the history stays under CHAT_MEMORY_TOKENS.
+def summarize_history(text):
+    model = genai.GenerativeModel(CHAT_MODEL_NAME)
+    with llm_gate.slot():
+        response = model.generate_content(
+            "Condense these notes about an ongoing conversation with a farmer into at most 80 words. "
+            "Keep crops, locations, problems, quantities and advice already given.\n\n" + text
+        )
+    return response.text
+
+conversation_memory = ConversationMemory(
+    max_turns=int(os.getenv("CHAT_MEMORY_TURNS", "8")),
+    max_tokens=int(os.getenv("CHAT_MEMORY_TOKENS", "800")),
+    idle_seconds=int(os.getenv("CHAT_MEMORY_IDLE_MINUTES", "30")) * 60,
+    # Extractive summaries by default; "1" condenses them with Gemini in the background
+    summarizer=summarize_history if os.getenv("CHAT_MEMORY_LLM_SUMMARY") == "1" else None,
+)
+
+# --- METRICS & PROFILING ---
+metrics = Metrics()
+metrics.describe("http_requests_total", "counter", "Requests by endpoint and status")
+metrics.describe("http_request_duration_seconds", "histogram", "Request latency by endpoint")
+metrics.describe("http_requests_in_flight", "gauge", "Requests currently being handled")
+metrics.describe("app_errors_total", "counter", "Handled errors by endpoint")
+metrics.describe("chat_stage_seconds", "histogram", "Time per /api/chat stage")
+metrics.describe("predict_stage_seconds", "histogram", "Time per price prediction stage")
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+# Per-request profiling (X-Profile: 1) is off unless PROFILE_DIR is set, and is
+# only honoured for requests carrying the METRICS_TOKEN bearer
+PROFILE_DIR = os.getenv("PROFILE_DIR")
+request_profiler = None
+if PROFILE_DIR and not METRICS_TOKEN:
+    print("⚠️ Warning: PROFILE_DIR is set but METRICS_TOKEN is not; request profiling stays off")
+elif PROFILE_DIR:
+    request_profiler = RequestProfiler(PROFILE_DIR, max_reports=int(os.getenv("PROFILE_MAX_REPORTS", "200")))
+
+def metrics_authorized():
+    return not METRICS_TOKEN or request.headers.get("Authorization") == f"Bearer {METRICS_TOKEN}"
+
+def component_stats():
+    # Existing stats() of caches and pools, read only at scrape time
+    caches = {"diagnosis": diagnosis_cache.stats(), "prediction": prediction_cache.stats()}
+    for metric, key in (("cache_hits_total", "hits"), ("cache_misses_total", "misses"),
+                        ("cache_hit_ratio", "hit_rate"), ("cache_entries", "entries")):
+        for name, stats in caches.items():
+            yield metric, {"cache": name}, stats[key]
+    gate = llm_gate.stats()
+    yield "llm_in_flight", {}, gate["in_flight"]
+    yield "llm_queue_waiting", {}, gate["waiting"]
+    yield "llm_rejected_total", {}, gate["rejected"]
+    yield "chat_rate_limited_total", {}, chat_limiter.rejected
+    hashing = password_hasher.stats()
+    yield "password_hash_pending", {}, hashing["pending"]
+    yield "password_hash_rejected_total", {}, hashing["rejected"]
+    yield "password_hash_timed_out_total", {}, hashing["timed_out"]
+    yield "password_hash_avg_seconds", {}, hashing["avg_seconds"]
+    yield "password_hash_max_seconds", {}, hashing["max_seconds"]
+    yield "timeseries_points_written_total", {}, timeseries_store.points_written
+    memory = conversation_memory.stats()
+    yield "chat_memory_sessions", {}, memory["sessions"]
+    yield "chat_memory_evicted_total", {}, memory["evicted"]
+    rag = knowledge_base.stats()
+    yield "rag_ready", {}, int(rag["ready"])
+    yield "rag_index_swaps_total", {}, rag["swaps"]
+    for outcome, count in rag["outcomes"].items():
+        yield "rag_retrievals_total", {"outcome": outcome}, count
+    if query_normalizer is not None:
+        for result, count in query_normalizer.stats.items():
+            yield "rag_query_translations_total", {"result": result}, count
+
+for counter in ("cache_hits_total", "cache_misses_total", "llm_rejected_total", "chat_rate_limited_total",
+                "password_hash_rejected_total", "timeseries_points_written_total", "rag_retrievals_total", "chat_memory_evicted_total",
+                "rag_query_translations_total", "rag_index_swaps_total",
+                "password_hash_timed_out_total"):
+    metrics.describe(counter, "counter", counter.replace("_total", "").replace("_", " "))
+metrics.register_callback(component_stats)
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    metrics.gauge_add("http_requests_in_flight", 1)
+    if request_profiler and request.headers.get("X-Profile") == "1" and metrics_authorized():
+        g.profiler = request_profiler.start()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or "unknown"
+    metrics.inc("http_requests_total", endpoint=endpoint, status=response.status_code)
+    metrics.observe("http_request_duration_seconds", time.perf_counter() - g.request_started, endpoint=endpoint)
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        response.headers["X-Profile-Report"] = os.path.basename(request_profiler.stop(profiler, endpoint))
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    if "request_started" in g:
+        metrics.gauge_add("http_requests_in_flight", -1)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    if not metrics_authorized():
+        return "Unauthorized", 401
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# --- FRONTEND ASSETS ---
+static_assets = AssetBundle(os.path.join(os.path.dirname(__file__), 'static'))
+
+@app.context_processor
+def inject_asset_url():
+    return {"asset_url": static_assets.url}
 
 # --- BACKEND ROUTES ---
 
@@ -801,56 +393,86 @@ HTML_TEMPLATE = """
 def home():
     # Pass user session to template to trigger conditional rendering
     user = session.get('user')
-    return render_template_string(HTML_TEMPLATE, user=user)
-
-@app.route('/auth/register', methods=['POST'])
-def register():
+    response = app.make_response(render_template('index.html', user=user))
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return compress_response(response, request)
+
+@app.route('/assets/<path:name>')
+def asset(name):
+    response = static_assets.response(name, request)
+    if response is None:
+        abort(404)
+    return response
+
+# --- AUTH CORE (shared by the Flask routes and the async server in asgi.py) ---
+# Each helper returns (body, status, headers); callers set session['user'] on success.
+def register_user(username, password):
     # FIXED: Check explicitly against None
     if users_collection is None:
-        return jsonify({"success": False, "message": "Database not connected"}), 500
-
-    username = request.form.get('username')
-    password = request.form.get('password')
+        return {"success": False, "message": "Database not connected"}, 500, {}
 
     if not username or not password:
-        return jsonify({"success": False, "message": "Username and password required"}), 400
-
-    # Check if user exists
-    if users_collection.find_one({"username": username}):
-        return jsonify({"success": False, "message": "Username already taken"}), 400
-
-    # Hash and Store
-    hashed_pw = generate_password_hash(password)
-    users_collection.insert_one({
-        "username": username,
-        "password": hashed_pw,
-        "created_at": datetime.datetime.utcnow()
-    })
-    
-    # Auto-login
-    session['user'] = username
-    return jsonify({"success": True, "message": "Account created!"})
+        return {"success": False, "message": "Username and password required"}, 400, {}
 
-@app.route('/auth/login', methods=['POST'])
-def login():
+    # Without the unique index fall back to checking first
+    if not username_index_ready and users_collection.find_one({"username": username}, {"_id": 1}):
+        return {"success": False, "message": "Username already taken"}, 400, {}
+
+    # Hash and Store; the unique index rejects a taken username in the same round trip
+    try:
+        hashed_pw = password_hasher.hash(password)
+    except (HashQueueFull, HashTimeout):
+        return auth_busy_response()
+    try:
+        users_collection.insert_one({
+            "username": username,
+            "password": hashed_pw,
+            "created_at": datetime.datetime.utcnow()
+        })
+    except DuplicateKeyError:
+        return {"success": False, "message": "Username already taken"}, 400, {}
+
+    return {"success": True, "message": "Account created!"}, 200, {}
+
+def authenticate_user(username, password):
     # FIXED: Check explicitly against None
     if users_collection is None:
-        return jsonify({"success": False, "message": "Database not connected"}), 500
+        return {"success": False, "message": "Database not connected"}, 500, {}
 
-    username = request.form.get('username')
-    password = request.form.get('password')
+    user = users_collection.find_one({"username": username}, {"password": 1, "_id": 0})
+    
+    try:
+        valid = bool(user) and password_hasher.verify(user['password'], password)
+    except (HashQueueFull, HashTimeout):
+        return auth_busy_response()
 
-    user = users_collection.find_one({"username": username})
+    if valid:
+        return {"success": True}, 200, {}
     
-    if user and check_password_hash(user['password'], password):
+    return {"success": False, "message": "Invalid credentials"}, 401, {}
+
+@app.route('/auth/register', methods=['POST'])
+def register():
+    username = request.form.get('username')
+    body, status, headers = register_user(username, request.form.get('password'))
+    if body["success"]:
+        # Auto-login
         session['user'] = username
-        return jsonify({"success": True})
-    
-    return jsonify({"success": False, "message": "Invalid credentials"}), 401
+    return jsonify(body), status, headers
+
+@app.route('/auth/login', methods=['POST'])
+def login():
+    username = request.form.get('username')
+    body, status, headers = authenticate_user(username, request.form.get('password'))
+    if body["success"]:
+        session['user'] = username
+    return jsonify(body), status, headers
 
 @app.route('/logout')
 def logout():
-    session.pop('user', None)
+    user = session.pop('user', None)
+    if user:
+        conversation_memory.clear(user)
     return redirect(url_for('home'))
 
 @app.route('/favicon.ico')
@@ -859,56 +481,343 @@ def favicon():
 
 @app.route('/api/predict_price', methods=['POST'])
 def predict_price():
-    if not price_model:
+    # Read before refresh(): if the model is swapped after this point, put() drops the
+    # result instead of caching an old-model prediction under the new generation
+    generation = prediction_cache.generation
+    bundle = price_registry.refresh()
+    if bundle is None:
         return jsonify({"error": "Price Model not loaded. Check server logs for pkl error."}), 500
     
     try:
-        data = request.json
-        # NOTE: This creates a DataFrame from the input. 
-        # Make sure the keys below match the columns your model was trained on!
-        
-        # --- FIX: Split Date into Year and Month ---
-        # Feature mismatch (10 vs 11) usually means Date was split during training.
-        date_str = data.get('Date')
-        if date_str:
-            dt = pd.to_datetime(date_str)
-            year = dt.year
-            month = dt.month
-        else:
-            dt = datetime.datetime.now()
-            year = dt.year
-            month = dt.month
-
-        input_data = pd.DataFrame([{
-            'State': data.get('State'),
-            'District': data.get('District'),
-            'Market': data.get('Market'),
-            'Commodity': data.get('Commodity'),
-            'Variety': data.get('Variety'),
-            'Grade': data.get('Grade'),
-            'Min Price': float(data.get('Min_Price', 0)),
-            'Max Price': float(data.get('Max_Price', 0)),
-            'Modal Price': float(data.get('Current_Price', 0)), # Assuming this is a feature too
-            'Year': year,
-            'Month': month
-        }])
-        
-        # --- FIX: Convert object columns to 'category' dtype for XGBoost ---
-        # The error "Invalid columns: State: object" happens because XGBoost needs 
-        # specific category types, not raw strings.
-        categorical_cols = ['State', 'District', 'Market', 'Commodity', 'Variety', 'Grade']
-        for col in categorical_cols:
-            if col in input_data.columns:
-                input_data[col] = input_data[col].astype('category')
+        # Free-text form values are mapped onto the training spelling when possible
+        data = category_index.canonicalize_row(request.json)
+        fast = bundle.fast
+
+        # Fast path: encode straight into a NumPy row and call the booster
+        if fast is not None:
+            with metrics.timer("predict_stage_seconds", stage="encode"):
+                row = fast.encode(data)
+            key = row.tobytes()
+            prediction = prediction_cache.get(key)
+            if prediction is None:
+                with metrics.timer("predict_stage_seconds", stage="model"):
+                    prediction = fast.predict_row(row)
+                prediction_cache.put(key, prediction, generation)
+            return jsonify({"predicted_price": prediction})
+
+        # Date is split into Year/Month and the six text fields are converted
+        # to 'category' dtype for XGBoost inside build_feature_frame.
+        with metrics.timer("predict_stage_seconds", stage="encode"):
+            input_data = build_feature_frame([data], bundle.categories)
+        key = tuple(input_data.astype(object).iloc[0].tolist())
+        prediction = prediction_cache.get(key)
+        if prediction is None:
+            with metrics.timer("predict_stage_seconds", stage="model"):
+                prediction = float(predict_frame(bundle.model, input_data)[0])
+            prediction_cache.put(key, prediction, generation)
         
-        prediction = price_model.predict(input_data)[0]
-        
-        return jsonify({"predicted_price": float(prediction)})
+        return jsonify({"predicted_price": prediction})
         
+    except InvalidDateError:
+        return jsonify({"error": "Invalid Date, expected e.g. 2024-06-03"}), 400
     except Exception as e:
+        metrics.inc("app_errors_total", endpoint="predict_price")
         print(f"Prediction Error Details: {e}") # Log detailed error to console
         return jsonify({"error": f"Prediction failed: {str(e)}"}), 500
 
+@app.route('/api/predict_price/stats')
+def predict_price_stats():
+    return jsonify(prediction_cache.stats())
+
+@app.route('/api/price_autocomplete')
+def price_autocomplete():
+    field = request.args.get('field', '')
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    if field not in category_index.columns:
+        return jsonify({"error": f"Unknown field '{field}'"}), 400
+    return jsonify({"field": field, "suggestions": category_index.suggest(field, request.args.get('q', ''), limit)})
+
+@app.route('/api/price_model')
+def price_model_info():
+    return jsonify(price_registry.info())
+
+@app.route('/api/price_forecast')
+def price_forecast():
+    table = forecast_store.get()
+    if table is None:
+        return jsonify({"error": "No precomputed forecasts available"}), 503
+
+    row = table.lookup(request.args.get('Market'), request.args.get('Commodity'), request.args.get('Variety'))
+    if row is None:
+        return jsonify({"error": "No forecast for this market/commodity/variety"}), 404
+    row["model_version"] = table.meta.get("model_version")
+    row["generated_at"] = table.meta.get("generated_at")
+    row["step_days"] = table.meta.get("step_days")  # model horizon the forecasts assume, see forecasts.py
+    return jsonify(row)
+
+@app.route('/api/price_forecast/signals')
+def price_forecast_signals():
+    """Bulk hold/sell signals, e.g. ?Commodity=Onion&signal=sell&horizon=7 for SMS alerts."""
+    table = forecast_store.get()
+    if table is None:
+        return jsonify({"error": "No precomputed forecasts available"}), 503
+
+    horizon = request.args.get('horizon', type=int)
+    if (horizon is None and request.args.get('horizon')) or (horizon is not None and horizon not in table.horizons):
+        return jsonify({"error": f"Unknown horizon, expected one of {table.horizons}", "horizons_days": table.horizons}), 400
+    limit = max(1, min(request.args.get('limit', 1000, type=int), 10000))
+    rows = table.signals(request.args.get('Commodity'), horizon, request.args.get('signal'), limit)
+    return jsonify({"horizons_days": table.horizons, "generated_at": table.meta.get("generated_at"), "rows": rows})
+
+@app.route('/api/predict_price/batch', methods=['POST'])
+def predict_price_batch():
+    """Predict many rows at once from a JSON array or an uploaded CSV.
+
+    Rows use the same fields as /api/predict_price. Results are streamed back
+    as newline-delimited JSON in input order.
+    """
+    bundle = price_registry.refresh()
+    if bundle is None:
+        return jsonify({"error": "Price Model not loaded. Check server logs for pkl error."}), 500
+
+    try:
+        upload = request.files.get('file')
+        if upload:
+            raw = pd.read_csv(upload, dtype={c: str for c in CATEGORICAL_COLUMNS + ['Date']})
+        else:
+            data = request.get_json(silent=True)
+            if isinstance(data, dict):
+                data = data.get('rows')
+            if not isinstance(data, list):
+                return jsonify({"error": "Send a JSON array of rows or upload a CSV as 'file'"}), 400
+            raw = pd.DataFrame(data)
+
+        if len(raw) == 0:
+            return jsonify({"error": "No rows to predict"}), 400
+        for col, index in category_index.columns.items():
+            if index.names and col in raw.columns:
+                raw[col] = raw[col].map(index.canonicalize)
+        if len(raw) > PRICE_BATCH_MAX_ROWS:
+            return jsonify({"error": f"Too many rows (max {PRICE_BATCH_MAX_ROWS})"}), 413
+
+        input_data = build_feature_frame(raw, bundle.categories)
+    except Exception as e:
+        print(f"Batch Prediction Error Details: {e}")
+        return jsonify({"error": f"Invalid batch: {str(e)}"}), 400
+
+    echo_cols = [c for c in ('Market', 'Commodity', 'Variety') if c in raw.columns]
+    echo = None
+    if echo_cols:
+        echo = raw[echo_cols].astype(object).where(raw[echo_cols].notna(), None).to_dict('records')
+
+    def generate():
+        # Large batches are predicted in chunks so the first results go out early
+        for start in range(0, len(input_data), PRICE_BATCH_CHUNK):
+            chunk = input_data.iloc[start:start + PRICE_BATCH_CHUNK]
+            try:
+                predictions = predict_frame(bundle.model, chunk)
+            except Exception as e:
+                print(f"Batch Prediction Error Details: {e}")
+                yield json.dumps({"error": f"Prediction failed: {str(e)}", "index": start}) + "\n"
+                return
+            for offset, value in enumerate(predictions):
+                i = start + offset
+                row = {"index": i, "predicted_price": float(value)}
+                if echo:
+                    row.update(echo[i])
+                yield json.dumps(row) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def ingest_authorized():
+    return bool(SENSOR_INGEST_TOKEN) and request.headers.get('X-Ingest-Token') == SENSOR_INGEST_TOKEN
+
+def valid_device_id(device):
+    return isinstance(device, str) and bool(DEVICE_ID_RE.match(device))
+
+def user_devices(username):
+    if devices_collection is None:
+        return []
+    return sorted(d["device_id"] for d in devices_collection.find({"username": username}, {"device_id": 1, "_id": 0}))
+
+def as_records(data, nested_key):
+    # Accept a single object, a list of objects, or {"<nested_key>": [...]} with shared fields
+    if isinstance(data, list):
+        records = data
+    elif isinstance(data, dict) and isinstance(data.get(nested_key), list):
+        shared = {k: v for k, v in data.items() if k != nested_key}
+        records = [{**shared, **item} if isinstance(item, dict) else item for item in data[nested_key]]
+    elif isinstance(data, dict):
+        records = [data]
+    else:
+        return None
+    return records if all(isinstance(record, dict) for record in records) else None
+
+@app.route('/api/sensors/readings', methods=['POST'])
+def ingest_sensor_readings():
+    """ESP32-style readings, e.g. {"device_id": "esp32-01", "ts": 1717400000, "nitrogen": 132, "moisture": 41.5}"""
+    if not ingest_authorized():
+        return jsonify({"error": "Unauthorized"}), 401
+
+    records = as_records(request.get_json(silent=True), 'readings')
+    if records is None:
+        return jsonify({"error": "Expected a JSON object or array of readings"}), 400
+    if len(records) > TIMESERIES_MAX_POINTS:
+        return jsonify({"error": f"Too many readings (max {TIMESERIES_MAX_POINTS})"}), 413
+
+    points = []
+    try:
+        for record in records:
+            device = record.get('device_id')
+            if not valid_device_id(device):
+                return jsonify({"error": "device_id is required: 1-64 letters, digits, '_', '.' or '-'"}), 400
+            ts = parse_ts(record.get('ts'))
+            for metric, value in record.items():
+                if metric in ('device_id', 'ts') or isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                points.append((ts, device, metric, parse_value(value)))
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": f"Invalid reading: {str(e)}"}), 400
+
+    return jsonify({"stored": timeseries_store.append('sensor', points)})
+
+@app.route('/api/prices/observations', methods=['POST'])
+def ingest_price_observations():
+    """Observed mandi prices using the price form fields (Market, Commodity, Variety, Min_Price, Max_Price, Current_Price, Date)."""
+    if not ingest_authorized():
+        return jsonify({"error": "Unauthorized"}), 401
+
+    records = as_records(request.get_json(silent=True), 'observations')
+    if records is None:
+        return jsonify({"error": "Expected a JSON object or array of observations"}), 400
+    if len(records) > TIMESERIES_MAX_POINTS:
+        return jsonify({"error": f"Too many observations (max {TIMESERIES_MAX_POINTS})"}), 413
+
+    points = []
+    try:
+        for record in records:
+            series = make_key(record.get('Market'), record.get('Commodity'), record.get('Variety'))
+            ts = parse_ts(record.get('Date'))
+            for field, metric in (('Min_Price', 'min'), ('Max_Price', 'max'), ('Current_Price', 'modal')):
+                if record.get(field) not in (None, ''):
+                    points.append((ts, series, metric, parse_value(record[field])))
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": f"Invalid observation: {str(e)}"}), 400
+
+    return jsonify({"stored": timeseries_store.append('price', points)})
+
+@app.route('/api/timeseries/<kind>')
+def timeseries_query(kind):
+    """?series=esp32-01&metric=nitrogen&start=...&end=...&resolution=raw|1h (price series are "market|commodity|variety")"""
+    if 'user' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    if kind not in ('sensor', 'price'):
+        return jsonify({"error": f"Unknown series kind '{kind}'"}), 404
+
+    series = request.args.get('series')
+    metric = request.args.get('metric')
+    if not series or not metric:
+        return jsonify({"error": "series and metric are required"}), 400
+    if kind == 'sensor' and series not in user_devices(session['user']):
+        return jsonify({"error": "Unknown device"}), 404
+    try:
+        end = parse_ts(request.args.get('end'))
+        start = parse_ts(request.args.get('start')) if request.args.get('start') else end - 86400
+    except ValueError as e:
+        return jsonify({"error": f"Invalid time range: {str(e)}"}), 400
+    if end - start > TIMESERIES_MAX_RANGE_DAYS * 86400:
+        return jsonify({"error": f"Range too large (max {TIMESERIES_MAX_RANGE_DAYS} days)"}), 400
+
+    if request.args.get('resolution', 'raw') == '1h':
+        return jsonify({"series": series, "metric": metric, "resolution": "1h",
+                        "buckets": timeseries_store.rollup(kind, series, metric, start, end)})
+    points = timeseries_store.query(kind, series, metric, start, end)
+    return jsonify({"series": series, "metric": metric, "resolution": "raw",
+                    "points": [{"ts": ts, "value": value} for ts, value in points]})
+
+@app.route('/api/sensors/devices', methods=['GET', 'POST'])
+def sensor_devices():
+    """GET lists the caller's devices; POST {"device_id": "esp32-01"} registers one to the caller."""
+    if 'user' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    if devices_collection is None:
+        return jsonify({"error": "Database unavailable"}), 503
+    if request.method == 'GET':
+        return jsonify({"devices": user_devices(session['user'])})
+
+    device = (request.get_json(silent=True) or {}).get('device_id')
+    if not valid_device_id(device):
+        return jsonify({"error": "device_id must be 1-64 letters, digits, '_', '.' or '-'"}), 400
+    try:
+        devices_collection.insert_one({"device_id": device, "username": session['user']})
+    except DuplicateKeyError:
+        owner = devices_collection.find_one({"device_id": device}, {"username": 1, "_id": 0})
+        if not owner or owner.get("username") != session['user']:
+            return jsonify({"error": "Device is registered to another account"}), 409
+    return jsonify({"devices": user_devices(session['user'])})
+
+@app.route('/api/sensors/latest')
+def sensor_latest():
+    if 'user' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    devices = user_devices(session['user'])
+    wanted = request.args.get('device_id')
+    if wanted:
+        if wanted not in devices:
+            return jsonify({"error": "Unknown device"}), 404
+        devices = [wanted]
+    metric = request.args.get('metric', 'nitrogen')
+    readings = [r for r in (timeseries_store.latest('sensor', device, metric) for device in devices) if r]
+    if not readings:
+        return jsonify({"error": "No readings yet"}), 404
+    device, ts, value = max(readings, key=lambda r: r[1])
+    return jsonify({"device_id": device, "ts": ts, "value": value})
+
+# --- CHAT CORE (shared by the Flask route and the async server in asgi.py) ---
+CHAT_MODEL_NAME = "gemini-2.5-flash-preview-09-2025"
+
+def build_chat_prompt(prompt, lang, has_image, context=None, history=None):
+    # UPDATED: Added instruction to forbid LaTeX formatting
+    system_instruction = "IMPORTANT: Use plain text for temperatures and units (e.g., 25°C, 75°F). Do NOT use LaTeX formatting like $25^{\circ}$."
+
+    full_prompt = f"{prompt}. Reply in {lang} language. If this is about agriculture, act as an expert agronomist. {system_instruction}"
+    if not prompt and has_image:
+        full_prompt = f"Analyze this image. Identify crop, disease, and provide solution. Reply in {lang} language. {system_instruction}"
+    if context:
+        # Excerpts retrieved from the ingested manuals (knowledge.py)
+        full_prompt = (
+            "Reference excerpts from agricultural manuals. Base your answer on them when they are relevant "
+            f"and ignore them when they are not:\n{context}\n\n{full_prompt}"
+        )
+    if history:
+        # Earlier turns of this user's conversation (conversation.py)
+        full_prompt = f"{history}\n\nNew message:\n{full_prompt}"
+    return full_prompt
+
+def chat_turn_text(prompt, has_image):
+    return f"[photo] {prompt}".strip() if has_image else prompt
+
+def decode_chat_image(img_bytes):
+    with metrics.timer("chat_stage_seconds", stage="image_decode"):
+        image = Image.open(io.BytesIO(img_bytes))
+        return image, phash(image)
+
+def synthesize_speech(text, lang):
+    """Write the reply as MP3 into TEMP_DIR; returns its /audio URL or None."""
+    try:
+        with metrics.timer("chat_stage_seconds", stage="tts"):
+            audio = io.BytesIO()
+            gTTS(text=text, lang=lang, slow=False).write_to_fp(audio)
+        filename = f"speech_{uuid.uuid4()}.mp3"
+        filepath = os.path.join(TEMP_DIR, filename)
+        with metrics.timer("chat_stage_seconds", stage="audio_write"):
+            with open(filepath, 'wb') as f:
+                f.write(audio.getvalue())
+        return f"/audio/{filename}"
+    except Exception:
+        metrics.inc("app_errors_total", endpoint="tts")
+        return None
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     # Protect Route
@@ -923,38 +832,53 @@ def chat():
         lang = request.form.get('lang', 'en')
         image_file = request.files.get('image')
 
-        # UPDATED: Added instruction to forbid LaTeX formatting
-        system_instruction = "IMPORTANT: Use plain text for temperatures and units (e.g., 25°C, 75°F). Do NOT use LaTeX formatting like $25^{\circ}$."
-
-        full_prompt = f"{prompt}. Reply in {lang} language. If this is about agriculture, act as an expert agronomist. {system_instruction}"
-        if not prompt and image_file:
-            full_prompt = f"Analyze this image. Identify crop, disease, and provide solution. Reply in {lang} language. {system_instruction}"
+        chat_limiter.check(session['user'], CHAT_IMAGE_COST if image_file else 1)
 
-        model = genai.GenerativeModel("gemini-2.5-flash-preview-09-2025")
+        # Knowledge base search runs concurrently with the image decoding below
+        retrieval = knowledge_base.submit(prompt)
+        history = conversation_memory.history(session['user'])
+        model = genai.GenerativeModel(CHAT_MODEL_NAME)
         
         if image_file:
-            img_bytes = image_file.read()
-            image = Image.open(io.BytesIO(img_bytes))
-            response = model.generate_content([full_prompt, image])
+            image, image_hash = decode_chat_image(image_file.read())
+            # Answers shaped by a user's history are theirs alone: only history-free diagnoses are shared
+            ai_text = diagnosis_cache.get(image_hash, prompt, lang) if history is None else None
+            if ai_text is None:
+                full_prompt = build_chat_prompt(prompt, lang, True, knowledge_base.context(retrieval), history)
+                with llm_gate.slot(), metrics.timer("chat_stage_seconds", stage="gemini"):
+                    response = model.generate_content([full_prompt, image])
+                ai_text = response.text
+                if history is None:
+                    diagnosis_cache.put(image_hash, prompt, lang, ai_text)
+            elif retrieval is not None:
+                retrieval.cancel()
         else:
-            response = model.generate_content(full_prompt)
-            
-        ai_text = response.text
-
-        try:
-            tts = gTTS(text=ai_text, lang=lang, slow=False)
-            filename = f"speech_{uuid.uuid4()}.mp3"
-            filepath = os.path.join(TEMP_DIR, filename)
-            tts.save(filepath)
-            audio_url = f"/audio/{filename}"
-        except Exception:
-            audio_url = None
+            full_prompt = build_chat_prompt(prompt, lang, False, knowledge_base.context(retrieval), history)
+            with llm_gate.slot(), metrics.timer("chat_stage_seconds", stage="gemini"):
+                response = model.generate_content(full_prompt)
+            ai_text = response.text
+
+        conversation_memory.record(session['user'], chat_turn_text(prompt, bool(image_file)), ai_text)
+
+        audio_url = synthesize_speech(ai_text, lang)
 
         return jsonify({"text": ai_text, "audio_url": audio_url})
 
+    except AdmissionRejected as e:
+        body, status, headers = rejected_body(e)
+        return jsonify(body), status, headers
     except Exception as e:
+        metrics.inc("app_errors_total", endpoint="chat")
         return jsonify({"text": f"Error: {str(e)}"}), 500
 
+@app.route('/api/chat/reset', methods=['POST'])
+def chat_reset():
+    # Start a new conversation: forget this user's history
+    if 'user' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+    conversation_memory.clear(session['user'])
+    return jsonify({"success": True})
+
 @app.route('/audio/<filename>')
 def get_audio(filename):
     if 'user' not in session: return "Unauthorized", 401
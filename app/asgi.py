@@ -0,0 +1,185 @@
+"""Async serving mode.
+
+    cd app && uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+/api/chat and the auth routes are served natively on the event loop: the
+Gemini call is awaited, while gTTS, image decoding and Mongo/password work
+run in a thread pool without holding a request slot. Every other route is
+the unchanged Flask app behind a WSGI bridge, so one process can hold
+hundreds of in-flight chats.
+"""
+import os
+import time
+import asyncio
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+import app as core
+from admission import AdmissionRejected
+
+
+# --- FLASK SESSION BRIDGE ---
+# Native routes read and write the same signed cookie Flask uses, so a user
+# can log in through either side.
+_flask = core.app
+_serializer = _flask.session_interface.get_signing_serializer(_flask)
+_cookie_name = _flask.config["SESSION_COOKIE_NAME"]
+_max_age = int(_flask.permanent_session_lifetime.total_seconds())
+
+
+def read_session(request):
+    cookie = request.cookies.get(_cookie_name)
+    if not cookie or _serializer is None:
+        return {}
+    try:
+        return dict(_serializer.loads(cookie, max_age=_max_age))
+    except Exception:
+        return {}
+
+
+def write_session(response, data):
+    response.set_cookie(
+        _cookie_name,
+        _serializer.dumps(data),
+        httponly=_flask.config["SESSION_COOKIE_HTTPONLY"],
+        secure=_flask.config["SESSION_COOKIE_SECURE"],
+        samesite=_flask.config["SESSION_COOKIE_SAMESITE"] or "lax",
+        path=_flask.config["SESSION_COOKIE_PATH"] or "/",
+    )
+
+
+# --- NATIVE ASYNC ROUTES ---
+async def chat(request):
+    user = read_session(request).get("user")
+    if not user:
+        return JSONResponse({"text": "⚠️ Session expired. Please login again."}, status_code=401)
+
+    try:
+        if not core.api_key:
+            return JSONResponse({"text": "⚠️ Server Error: GOOGLE_API_KEY not found."}, status_code=500)
+
+        form = await request.form()
+        prompt = form.get("prompt", "") or ""
+        lang = form.get("lang", "en") or "en"
+        upload = form.get("image")
+        has_image = hasattr(upload, "read")
+
+        await asyncio.to_thread(core.chat_limiter.check, user, core.CHAT_IMAGE_COST if has_image else 1)
+
+        # Knowledge base search runs on its pool while the image is decoded
+        retrieval = core.knowledge_base.submit(prompt)
+        history = core.conversation_memory.history(user)
+        model = core.genai.GenerativeModel(core.CHAT_MODEL_NAME)
+
+        if has_image:
+            image, image_hash = await asyncio.to_thread(core.decode_chat_image, await upload.read())
+            # Only history-free diagnoses are shared between users (see app.py)
+            ai_text = core.diagnosis_cache.get(image_hash, prompt, lang) if history is None else None
+            if ai_text is not None and retrieval is not None:
+                retrieval.cancel()
+            if ai_text is None:
+                context = await core.knowledge_base.context_async(retrieval)
+                full_prompt = core.build_chat_prompt(prompt, lang, True, context, history)
+                async with core.llm_gate.async_slot():
+                    with core.metrics.timer("chat_stage_seconds", stage="gemini"):
+                        response = await model.generate_content_async([full_prompt, image])
+                ai_text = response.text
+                if history is None:
+                    core.diagnosis_cache.put(image_hash, prompt, lang, ai_text)
+        else:
+            context = await core.knowledge_base.context_async(retrieval)
+            full_prompt = core.build_chat_prompt(prompt, lang, False, context, history)
+            async with core.llm_gate.async_slot():
+                with core.metrics.timer("chat_stage_seconds", stage="gemini"):
+                    response = await model.generate_content_async(full_prompt)
+            ai_text = response.text
+
+        core.conversation_memory.record(user, core.chat_turn_text(prompt, has_image), ai_text)
+        audio_url = await asyncio.to_thread(core.synthesize_speech, ai_text, lang)
+        return JSONResponse({"text": ai_text, "audio_url": audio_url})
+
+    except AdmissionRejected as e:
+        body, status, headers = core.rejected_body(e)
+        return JSONResponse(body, status_code=status, headers=headers)
+    except Exception as e:
+        core.metrics.inc("app_errors_total", endpoint="chat")
+        return JSONResponse({"text": f"Error: {str(e)}"}, status_code=500)
+
+
+async def _auth(request, handler):
+    form = await request.form()
+    username = form.get("username")
+    body, status, headers = await asyncio.to_thread(handler, username, form.get("password"))
+    response = JSONResponse(body, status_code=status, headers=headers)
+    if body["success"]:
+        session = read_session(request)
+        session["user"] = username
+        write_session(response, session)
+    return response
+
+
+async def register(request):
+    return await _auth(request, core.register_user)
+
+
+async def login(request):
+    return await _auth(request, core.authenticate_user)
+
+
+class NativeRouteMetrics:
+    """Request count/latency/in-flight for the routes served natively here;
+    everything forwarded to Flask is already measured by its own hooks."""
+
+    def __init__(self, app, endpoints):
+        self.app = app
+        self.endpoints = endpoints
+
+    async def __call__(self, scope, receive, send):
+        endpoint = self.endpoints.get(scope.get("path")) if scope["type"] == "http" else None
+        if endpoint is None:
+            return await self.app(scope, receive, send)
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        core.metrics.gauge_add("http_requests_in_flight", 1)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            core.metrics.gauge_add("http_requests_in_flight", -1)
+            core.metrics.inc("http_requests_total", endpoint=endpoint, status=status["code"])
+            core.metrics.observe("http_request_duration_seconds", time.perf_counter() - started, endpoint=endpoint)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # to_thread uses the loop's default executor; size it for many parallel TTS calls
+    workers = int(os.getenv("ASYNC_IO_THREADS", "64"))
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=workers, thread_name_prefix="async-io"))
+    yield
+
+
+starlette_app = Starlette(
+    routes=[
+        Route("/api/chat", chat, methods=["POST"]),
+        Route("/auth/register", register, methods=["POST"]),
+        Route("/auth/login", login, methods=["POST"]),
+        Mount("/", app=WSGIMiddleware(_flask, workers=int(os.getenv("ASGI_WSGI_WORKERS", "16")))),
+    ],
+    lifespan=lifespan,
+)
+
+application = NativeRouteMetrics(
+    starlette_app,
+    {"/api/chat": "chat", "/auth/register": "register", "/auth/login": "login"},
+)
@@ -0,0 +1,100 @@
+import os
+import gzip
+import hashlib
+import mimetypes
+
+from flask import Response
+
+try:
+    import brotli  # optional: pip install brotli
+except ImportError:
+    brotli = None
+
+
+# Versioned URLs never change content, so browsers may keep them for a year
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "public, max-age=300"
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.html', '.txt')
+
+
+class Asset:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.body = f.read()
+        digest = hashlib.sha256(self.body).hexdigest()
+        self.version = digest[:12]
+        self.etag = digest[:32]
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.encoded = {}
+        if path.endswith(COMPRESSIBLE):
+            self.encoded['gzip'] = gzip.compress(self.body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.encoded['br'] = brotli.compress(self.body, quality=11)
+
+
+class AssetBundle:
+    """Static files loaded and precompressed once at startup.
+
+    Pages link to `url(name)`, which carries a content hash, so the files can
+    be served with a one-year immutable Cache-Control while a redeploy with
+    new content still changes the URL.
+    """
+
+    def __init__(self, static_dir):
+        self.static_dir = static_dir
+        self.assets = {}
+        for root, _, files in os.walk(static_dir):
+            for filename in files:
+                if filename.endswith(('.gz', '.br')):
+                    continue
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, static_dir).replace(os.sep, '/')
+                self.assets[name] = Asset(path)
+
+    def url(self, name):
+        asset = self.assets.get(name)
+        if asset is None:
+            return f"/assets/{name}"
+        return f"/assets/{name}?v={asset.version}"
+
+    def response(self, name, request):
+        asset = self.assets.get(name)
+        if asset is None:
+            return None
+
+        encoding = pick_encoding(request.headers.get('Accept-Encoding', ''), asset.encoded)
+        etag = f"{asset.etag}-{encoding}" if encoding else asset.etag
+        cache = IMMUTABLE_CACHE if request.args.get('v') == asset.version else REVALIDATE_CACHE
+        headers = {"Cache-Control": cache, "Vary": "Accept-Encoding"}
+
+        if request.if_none_match.contains(etag):
+            resp = Response(status=304, headers=headers)
+        else:
+            resp = Response(asset.encoded[encoding] if encoding else asset.body, mimetype=asset.mimetype, headers=headers)
+            if encoding:
+                resp.headers['Content-Encoding'] = encoding
+        resp.set_etag(etag)
+        return resp
+
+
+def pick_encoding(accept_encoding, available):
+    accepted = {part.split(';')[0].strip().lower() for part in accept_encoding.split(',')}
+    for encoding in ('br', 'gzip'):
+        if encoding in available and encoding in accepted:
+            return encoding
+    return None
+
+
+def compress_response(response, request, min_size=1024):
+    """gzip a dynamic response (the rendered page) when the client accepts it."""
+    if response.direct_passthrough or response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return response
+    if 'gzip' not in request.headers.get('Accept-Encoding', '').lower():
+        return response
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+    response.set_data(gzip.compress(body, compresslevel=6))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
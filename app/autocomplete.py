@@ -0,0 +1,70 @@
+import bisect
+
+from pricing import CATEGORICAL_COLUMNS
+
+
+def normalize(text):
+    return ' '.join(str(text).lower().split())
+
+
+class PrefixIndex:
+    """Sorted-array prefix index over one column's known values.
+
+    A bisect over the sorted normalised names finds the block of entries that
+    start with the query; a second sorted array of (word, name) pairs catches
+    matches on later words ("apmc" -> "Pune APMC").
+    """
+
+    def __init__(self, values):
+        self.canonical = {}
+        for value in values:
+            if value is None:
+                continue
+            self.canonical.setdefault(normalize(value), str(value))
+        self.names = sorted(self.canonical)
+        pairs = sorted({(word, name) for name in self.names for word in name.split()[1:]})
+        self.words = [word for word, _ in pairs]
+        self.word_names = [name for _, name in pairs]
+
+    @staticmethod
+    def _prefix_range(keys, prefix):
+        return bisect.bisect_left(keys, prefix), bisect.bisect_left(keys, prefix + '\uffff')
+
+    def suggest(self, query, limit=10):
+        query = normalize(query)
+        if not query:
+            return []
+        lo, hi = self._prefix_range(self.names, query)
+        starts = self.names[lo:hi]
+        # Shorter names first: "Pune" should beat "Pune Cantonment" for "pun"
+        ranked = sorted(starts, key=lambda name: (name != query, len(name), name))
+        if len(ranked) < limit:
+            seen = set(ranked)
+            lo, hi = self._prefix_range(self.words, query)
+            inner = sorted(set(self.word_names[lo:hi]) - seen, key=lambda name: (len(name), name))
+            ranked.extend(inner)
+        return [self.canonical[name] for name in ranked[:limit]]
+
+    def canonicalize(self, value):
+        """Training spelling of `value` if it matches ignoring case/spacing, else `value`."""
+        if value is None:
+            return None
+        return self.canonical.get(normalize(value), value)
+
+
+class CategoryIndex:
+    """One PrefixIndex per categorical price-model column."""
+
+    def __init__(self, categories=None):
+        self.columns = {col: PrefixIndex((categories or {}).get(col) or []) for col in CATEGORICAL_COLUMNS}
+
+    def suggest(self, column, query, limit=10):
+        index = self.columns.get(column)
+        return index.suggest(query, limit) if index else []
+
+    def canonicalize_row(self, data):
+        row = dict(data)
+        for col, index in self.columns.items():
+            if index.names and isinstance(row.get(col), str):
+                row[col] = index.canonicalize(row[col])
+        return row
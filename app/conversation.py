@@ -0,0 +1,155 @@
+import re
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from knowledge import approx_tokens
+
+
+def clip_words(text, max_words):
+    words = (text or "").split()
+    if len(words) <= max_words:
+        return " ".join(words)
+    return " ".join(words[:max_words]) + " …"
+
+
+_SENTENCE_END = re.compile(r"(?<=[.!?।])\s")
+
+
+def summarize_turn(user_text, reply):
+    """One-line extractive summary: the question and the first sentence of the answer."""
+    plain = re.sub(r"[#*_`>|]+", " ", reply or "")
+    first = _SENTENCE_END.split(" ".join(plain.split()), maxsplit=1)[0]
+    return f"User asked: {clip_words(user_text, 25) or '(photo)'} Advice: {clip_words(first, 30)}"
+
+
+class _Session:
+    __slots__ = ("turns", "summary", "summary_version", "last_seen")
+
+    def __init__(self, max_turns):
+        self.turns = deque(maxlen=max_turns)  # (user_text, reply), oldest first
+        self.summary = deque()  # summary lines, oldest first
+        self.summary_version = 0
+        self.last_seen = time.monotonic()
+
+
+# --- CONVERSATION MEMORY ---
+class ConversationMemory:
+    """Recent chat turns per user, kept under a fixed prompt budget.
+
+    Each session holds at most `max_turns` turns (replies clipped to
+    `max_reply_words`). Whenever the rendered history would exceed
+    `max_tokens`, the oldest turns are folded into a running summary of one
+    line per turn, and the oldest summary lines are dropped last. Sessions idle
+    for `idle_seconds` are evicted. Per process, like the other caches.
+
+    `summarizer(text) -> text`, when given, condenses the summary lines with an
+    LLM on a background thread; the extractive summary is used until it returns.
+    """
+
+    def __init__(self, max_turns=8, max_tokens=800, idle_seconds=1800, max_sessions=10000,
+                 max_reply_words=120, summarizer=None):
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self.max_reply_words = max_reply_words
+        self.summarizer = summarizer
+        self._sessions = OrderedDict()  # key -> _Session, least recently used first
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-summary") if summarizer else None
+        self.evicted = 0
+        self.summarized_turns = 0
+
+    def _evict_idle(self, now):
+        while self._sessions:
+            key, oldest = next(iter(self._sessions.items()))
+            if now - oldest.last_seen < self.idle_seconds and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[key]
+            self.evicted += 1
+
+    @staticmethod
+    def _render(session):
+        parts = []
+        if session.summary:
+            parts.append("Earlier in this conversation:")
+            parts.extend(f"- {line}" for line in session.summary)
+        if session.turns:
+            parts.append("Recent messages:")
+            for user_text, reply in session.turns:
+                parts.append(f"User: {user_text or '(sent a photo)'}")
+                parts.append(f"CropSense: {reply}")
+        return "\n".join(parts)
+
+    def history(self, key):
+        """Rendered history for the prompt, or None for a new conversation."""
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            session = self._sessions.get(key)
+            if session is None:
+                return None
+            session.last_seen = now
+            self._sessions.move_to_end(key)
+            return self._render(session) or None
+
+    def record(self, key, user_text, reply):
+        user_text = clip_words(user_text, self.max_reply_words)
+        reply = clip_words(reply, self.max_reply_words)
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = _Session(self.max_turns)
+            if len(session.turns) == self.max_turns:
+                self._fold(session, session.turns.popleft())
+            session.turns.append((user_text, reply))
+            session.last_seen = now
+            self._sessions.move_to_end(key)
+
+            # Fold the oldest turns into the summary, then trim the summary itself
+            folded = False
+            while approx_tokens(self._render(session)) > self.max_tokens and len(session.turns) > 1:
+                self._fold(session, session.turns.popleft())
+                folded = True
+            while approx_tokens(self._render(session)) > self.max_tokens and session.summary:
+                session.summary.popleft()
+            if folded and self._pool is not None and len(session.summary) > 1:
+                version = session.summary_version
+                text = "\n".join(session.summary)
+                self._pool.submit(self._condense, key, version, text)
+
+    def _fold(self, session, turn):
+        session.summary.append(summarize_turn(*turn))
+        session.summary_version += 1
+        self.summarized_turns += 1
+
+    def _condense(self, key, version, text):
+        try:
+            condensed = " ".join((self.summarizer(text) or "").split())
+        except Exception as e:
+            print(f"⚠️ Warning: conversation summary failed: {e}")
+            return
+        with self._lock:
+            session = self._sessions.get(key)
+            # Skip if the session moved on (new fold, reset or eviction) meanwhile
+            if session is None or session.summary_version != version or not condensed:
+                return
+            if approx_tokens(condensed) < approx_tokens(text):
+                session.summary = deque([condensed])
+                session.summary_version += 1
+
+    def clear(self, key):
+        with self._lock:
+            self._sessions.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "evicted": self.evicted,
+                "summarized_turns": self.summarized_turns,
+            }
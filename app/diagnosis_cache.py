@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+
+# --- PERCEPTUAL HASH ---
+HASH_SIZE = 8       # 8x8 low-frequency block -> 64-bit hash
+HIGHFREQ_FACTOR = 4  # image is shrunk to 32x32 before the DCT
+
+
+def _dct_matrix(n):
+    """Orthonormal DCT-II basis, built once and reused for every hash."""
+    k = np.arange(n).reshape(-1, 1)
+    i = np.arange(n).reshape(1, -1)
+    m = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+    m[0, :] = np.sqrt(1.0 / n)
+    return m
+
+
+_IMG_SIZE = HASH_SIZE * HIGHFREQ_FACTOR
+_DCT = _dct_matrix(_IMG_SIZE)
+
+
+def phash(image: Image.Image) -> int:
+    """64-bit DCT perceptual hash. Re-compressed or resized copies of the
+    same photo land within a few bits of each other."""
+    small = image.convert("L").resize((_IMG_SIZE, _IMG_SIZE), Image.LANCZOS)
+    pixels = np.asarray(small, dtype=np.float64)
+    dct = _DCT @ pixels @ _DCT.T
+    low = dct[:HASH_SIZE, :HASH_SIZE].flatten()
+    # Skip the DC term so overall brightness does not dominate the median
+    bits = low > np.median(low[1:])
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+# --- DIAGNOSIS CACHE ---
+class DiagnosisCache:
+    """LRU + TTL cache of Gemini image diagnoses keyed by perceptual hash.
+
+    Entries are grouped by (prompt, lang) so a lookup only scans images that
+    were asked the same question in the same language; within that group any
+    hash within `max_distance` bits counts as a hit.
+    """
+
+    def __init__(self, max_entries=512, ttl_seconds=6 * 3600, max_distance=6):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self._entries = OrderedDict()  # (hash, prompt, lang) -> (text, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(prompt):
+        return " ".join((prompt or "").lower().split())
+
+    def get(self, image_hash, prompt, lang):
+        prompt = self._normalize(prompt)
+        now = time.monotonic()
+        with self._lock:
+            best_key, best_dist = None, self.max_distance + 1
+            for key, (_, expires_at) in list(self._entries.items()):
+                if expires_at <= now:
+                    del self._entries[key]
+                    continue
+                if key[1] != prompt or key[2] != lang:
+                    continue
+                dist = hamming(key[0], image_hash)
+                if dist < best_dist:
+                    best_key, best_dist = key, dist
+                    if dist == 0:
+                        break
+
+            if best_key is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key][0]
+
+    def put(self, image_hash, prompt, lang, text):
+        key = (image_hash, self._normalize(prompt), lang)
+        with self._lock:
+            self._entries[key] = (text, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
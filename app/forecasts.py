@@ -0,0 +1,234 @@
+import os
+import sys
+import json
+import time
+import datetime
+import threading
+
+import numpy as np
+import pandas as pd
+
+from pricing import build_feature_frame, predict_frame
+
+
+# --- FORECAST TABLE LAYOUT ---
+# forecasts/
+#   CURRENT                <- name of the published build
+#   20240603T0200/
+#     meta.json            <- horizons, step size, model version, generated_at, key columns
+#     keys.json            <- ["market|commodity|variety", ...] in row order
+#     values.npy           <- float32 [n_keys, 1 + n_horizons]: current price, then forecasts
+KEY_COLUMNS = ['Market', 'Commodity', 'Variety']
+DEFAULT_HORIZONS_DAYS = [7, 14, 28]
+# How far ahead one model call is taken to predict. The model was trained on
+# observed prices without a stated horizon, so this is an assumption to set
+# to the spacing of the training data.
+STEP_DAYS = int(os.getenv('PRICE_FORECAST_STEP_DAYS', '7'))
+CURRENT_FILE = 'CURRENT'
+
+# Same thresholds the price tab uses client-side
+HOLD_THRESHOLD = 1.05
+SELL_THRESHOLD = 0.95
+
+# Observed-price CSV column -> request field used by build_feature_frame
+_OBSERVATION_FIELDS = {
+    'Min Price': 'Min_Price', 'Min_Price': 'Min_Price',
+    'Max Price': 'Max_Price', 'Max_Price': 'Max_Price',
+    'Modal Price': 'Current_Price', 'Modal_Price': 'Current_Price', 'Current_Price': 'Current_Price',
+    'Arrival_Date': 'Date', 'Arrival Date': 'Date', 'Date': 'Date',
+}
+
+
+def make_key(market, commodity, variety):
+    # '|' separates the parts, so it is treated as a space inside a name
+    return '|'.join(' '.join(str(v or '').replace('|', ' ').lower().split()) for v in (market, commodity, variety))
+
+
+def price_signal(current, predicted):
+    if current <= 0:
+        return 'unknown'
+    if predicted > current * HOLD_THRESHOLD:
+        return 'hold'
+    if predicted < current * SELL_THRESHOLD:
+        return 'sell'
+    return 'stable'
+
+
+# --- OFFLINE BUILD ---
+def latest_observations(prices):
+    """Latest observed row per (market, commodity, variety)."""
+    prices = prices.rename(columns=_OBSERVATION_FIELDS)
+    dates = prices['Date'] if 'Date' in prices.columns else pd.Series(pd.NaT, index=prices.index)
+    prices['Date'] = pd.to_datetime(dates, errors='coerce')
+    prices['_key'] = [make_key(*row) for row in prices.reindex(columns=KEY_COLUMNS).itertuples(index=False)]
+    prices = prices.sort_values('Date', na_position='first')
+    return prices.drop_duplicates('_key', keep='last').reset_index(drop=True)
+
+
+def forecast_horizons(model, categories, observations, horizons_days, step_days=STEP_DAYS):
+    """Recursive multi-horizon forecast, one batched model call per step.
+
+    Each model call is taken to predict the modal price `step_days` ahead of
+    the current one, so each step feeds the previous prediction back in as the
+    modal price (Min/Max scaled by the same ratio) with the date moved
+    forward. Horizons are rounded up to whole steps.
+    """
+    current = pd.to_numeric(observations['Current_Price'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+    step_input = observations.copy()
+    today = pd.Timestamp(datetime.date.today())
+    base_dates = observations['Date'].fillna(today)
+
+    out = np.empty((len(observations), len(horizons_days)), dtype=np.float32)
+    elapsed = 0
+    last = current.copy()
+    for column, horizon in enumerate(sorted(horizons_days)):
+        while elapsed < horizon:
+            step_input['Date'] = (base_dates + pd.Timedelta(days=elapsed)).dt.strftime('%Y-%m-%d')
+            prediction = np.asarray(predict_frame(model, build_feature_frame(step_input, categories)), dtype=np.float64)
+            ratio = np.divide(prediction, last, out=np.ones_like(prediction), where=last > 0)
+            for field in ('Min_Price', 'Max_Price'):
+                if field in step_input.columns:
+                    step_input[field] = pd.to_numeric(step_input[field], errors='coerce').fillna(0) * ratio
+            step_input['Current_Price'] = prediction
+            last = prediction
+            elapsed += step_days
+        out[:, column] = last
+    return current.astype(np.float32), out
+
+
+def build_forecast_table(prices_csv, out_dir, bundle, horizons_days=None, step_days=STEP_DAYS):
+    """Precompute forecasts for every key in `prices_csv` and publish them."""
+    horizons_days = sorted(horizons_days or DEFAULT_HORIZONS_DAYS)
+    prices = pd.read_csv(prices_csv, dtype={c: str for c in KEY_COLUMNS + ['State', 'District', 'Grade']})
+    observations = latest_observations(prices)
+    current, forecasts = forecast_horizons(bundle.model, bundle.categories, observations, horizons_days, step_days)
+
+    build = datetime.datetime.now().strftime('%Y%m%dT%H%M%S')
+    folder = os.path.join(out_dir, build)
+    os.makedirs(folder, exist_ok=True)
+    np.save(os.path.join(folder, 'values.npy'), np.column_stack([current, forecasts]))
+    with open(os.path.join(folder, 'keys.json'), 'w', encoding='utf-8') as f:
+        json.dump(observations['_key'].tolist(), f)
+    with open(os.path.join(folder, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            "horizons_days": horizons_days,
+            "step_days": step_days,
+            "model_version": bundle.version,
+            "generated_at": time.time(),
+            "source": os.path.basename(prices_csv),
+            "rows": len(observations),
+        }, f)
+
+    # Publish by swapping the pointer; readers never see a half-written build
+    tmp = os.path.join(out_dir, CURRENT_FILE + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(build + '\n')
+    os.replace(tmp, os.path.join(out_dir, CURRENT_FILE))
+    return folder
+
+
+# --- SERVING ---
+class ForecastTable:
+    """Read side of the precomputed table: dict lookup + memory-mapped row."""
+
+    def __init__(self, folder):
+        with open(os.path.join(folder, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        with open(os.path.join(folder, 'keys.json'), 'r', encoding='utf-8') as f:
+            self.keys = json.load(f)
+        self.index = {key: i for i, key in enumerate(self.keys)}
+        self.values = np.load(os.path.join(folder, 'values.npy'), mmap_mode='r')
+        self.horizons = self.meta['horizons_days']
+        self.build = os.path.basename(folder)
+
+    def _row(self, i):
+        current = float(self.values[i, 0])
+        forecasts = [
+            {"horizon_days": h, "predicted_price": float(p), "signal": price_signal(current, float(p))}
+            for h, p in zip(self.horizons, self.values[i, 1:])
+        ]
+        market, commodity, variety = self.keys[i].split('|', 2)
+        return {"market": market, "commodity": commodity, "variety": variety,
+                "current_price": current, "forecasts": forecasts}
+
+    def lookup(self, market, commodity, variety):
+        i = self.index.get(make_key(market, commodity, variety))
+        return None if i is None else self._row(i)
+
+    def signals(self, commodity=None, horizon_days=None, signal=None, limit=1000):
+        """Bulk rows for alerting, filtered by commodity and signal at one horizon (default: the first)."""
+        if horizon_days is not None and horizon_days not in self.horizons:
+            raise ValueError(f"unknown horizon {horizon_days}, expected one of {self.horizons}")
+        column = 1 + (self.horizons.index(horizon_days) if horizon_days is not None else 0)
+        wanted = ' '.join(commodity.lower().split()) if commodity else None
+        current = np.asarray(self.values[:, 0])
+        predicted = np.asarray(self.values[:, column])
+        labels = np.where(current <= 0, 'unknown',
+                 np.where(predicted > current * HOLD_THRESHOLD, 'hold',
+                 np.where(predicted < current * SELL_THRESHOLD, 'sell', 'stable')))
+        rows = []
+        for i, key in enumerate(self.keys):
+            if wanted and key.split('|')[1] != wanted:
+                continue
+            if signal and labels[i] != signal:
+                continue
+            rows.append(self._row(i))
+            if len(rows) >= limit:
+                break
+        return rows
+
+
+class ForecastStore:
+    """Keeps the current ForecastTable, following CURRENT with a cheap periodic check."""
+
+    def __init__(self, out_dir, check_interval=30.0):
+        self.out_dir = out_dir
+        self.check_interval = check_interval
+        self.table = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval or not self._lock.acquire(blocking=False):
+            return self.table
+        try:
+            self._last_check = now
+            pointer = os.path.join(self.out_dir, CURRENT_FILE)
+            if not os.path.exists(pointer):
+                return self.table
+            with open(pointer, 'r', encoding='utf-8') as f:
+                build = f.read().strip()
+            if self.table is None or self.table.build != build:
+                try:
+                    self.table = ForecastTable(os.path.join(self.out_dir, build))
+                    print(f"✅ Price forecasts {build} loaded ({len(self.table.keys)} markets)")
+                except Exception as e:
+                    print(f"❌ Error loading price forecasts {build}: {e}")
+            return self.table
+        finally:
+            self._lock.release()
+
+
+if __name__ == '__main__':
+    # python forecasts.py <latest_prices.csv> [out_dir] [horizon_days,...]
+    from model_registry import ModelRegistry
+
+    if len(sys.argv) < 2:
+        print("usage: python forecasts.py <latest_prices.csv> [out_dir] [7,14,28]")
+        sys.exit(1)
+    here = os.path.dirname(os.path.abspath(__file__))
+    out_dir = sys.argv[2] if len(sys.argv) > 2 else os.getenv("PRICE_FORECAST_DIR", os.path.join(here, 'forecasts'))
+    horizons = [int(h) for h in sys.argv[3].split(',')] if len(sys.argv) > 3 else None
+
+    registry = ModelRegistry(
+        os.getenv("PRICE_MODEL_DIR", os.path.join(here, 'models')),
+        legacy_path=os.path.join(here, 'price_model.pkl'),
+    )
+    bundle = registry.refresh(force=True)
+    if bundle is None:
+        print("❌ No price model available")
+        sys.exit(1)
+    started = time.perf_counter()
+    folder = build_forecast_table(sys.argv[1], out_dir, bundle, horizons)
+    print(f"✅ Forecasts written to {folder} in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,94 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HashQueueFull(Exception):
+    """Raised when too many hash jobs are already waiting."""
+
+
+class HashTimeout(Exception):
+    """Raised when a hash job did not finish within `timeout`; the job keeps its slot until it ends."""
+
+
+class PasswordHasher:
+    """Runs the password KDF on a small dedicated pool.
+
+    hashlib's pbkdf2/scrypt release the GIL, so a few worker threads do the
+    CPU-heavy work while the request threads only wait on a future. The pool
+    size caps how many cores a login storm can take, and `max_pending` caps
+    how many requests may queue behind it before new ones are turned away.
+    """
+
+    def __init__(self, workers=2, max_pending=32, method=None, timeout=10.0):
+        self.method = method
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pwhash")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def _timed(self, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.completed += 1
+                self.total_seconds += elapsed
+                self.max_seconds = max(self.max_seconds, elapsed)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashQueueFull()
+        with self._lock:
+            self.pending += 1
+        try:
+            future = self._executor.submit(self._timed, fn, *args)
+        except BaseException:
+            self._release(None)
+            raise
+        # The slot is freed when the job finishes, not when the caller stops waiting,
+        # so jobs abandoned after a timeout still count against max_pending
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            with self._lock:
+                self.timed_out += 1
+            raise HashTimeout()
+
+    def _release(self, future):
+        with self._lock:
+            self.pending -= 1
+        self._slots.release()
+
+    def hash(self, password):
+        if self.method:
+            return self._run(generate_password_hash, password, self.method)
+        return self._run(generate_password_hash, password)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_seconds": (self.total_seconds / self.completed) if self.completed else 0.0,
+                "max_seconds": self.max_seconds,
+            }
@@ -0,0 +1,244 @@
+import os
+import re
+import time
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+
+# --- AGRICULTURE QUERY CLASSIFIER ---
+# Cheap keyword test run before retrieval; greetings, small talk and unrelated
+# questions skip the vector search altogether.
+AGRI_WORDS = {
+    "crop", "crops", "farm", "farmer", "farmers", "farming", "field", "fields", "soil", "seed", "seeds",
+    "sow", "sowing", "harvest", "yield", "plant", "plants", "leaf", "leaves", "root", "roots", "stem",
+    "pest", "pests", "insect", "insects", "weed", "weeds", "disease", "diseases", "fungus", "fungal",
+    "blight", "rust", "wilt", "rot", "mildew", "aphid", "aphids", "borer", "whitefly", "thrips", "locust",
+    "fertilizer", "fertiliser", "manure", "compost", "urea", "dap", "npk", "potash", "nitrogen",
+    "phosphorus", "potassium", "zinc", "pesticide", "insecticide", "fungicide", "herbicide", "spray",
+    "irrigation", "irrigate", "drip", "monsoon", "rainfall", "kharif", "rabi", "zaid", "mandi", "msp",
+    "wheat", "rice", "paddy", "maize", "corn", "cotton", "sugarcane", "millet", "bajra", "jowar", "ragi",
+    "pulses", "gram", "lentil", "soybean", "groundnut", "mustard", "tomato", "potato", "onion", "chilli",
+    "brinjal", "banana", "mango", "tea", "coffee", "coconut", "cattle", "dairy", "poultry", "livestock",
+    "organic", "greenhouse", "nursery", "orchard", "agriculture", "agronomy", "tractor", "tillage",
+    "खेती", "फसल", "किसान", "खाद", "बीज", "मिट्टी", "सिंचाई", "कीट", "रोग", "गेहूं", "धान",
+    "cultivo", "cultivos", "cosecha", "suelo", "semilla", "semillas", "plaga", "plagas", "riego", "trigo",
+    "arroz", "maíz", "abono", "agricultor", "culture", "cultures", "récolte", "semence", "semences",
+    "ravageur", "ravageurs", "engrais", "blé", "riz", "maïs", "agriculteur", "tomate", "tomates",
+}
+AGRI_PREFIXES = ("agri", "agro", "fertili", "pestic", "insectic", "fungic", "herbic", "irrigat", "germinat",
+                 "cultivat", "horticult", "seedling", "harvest", "transplant")
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def is_agricultural(text):
+    for word in _WORD.findall((text or "").lower()):
+        if word in AGRI_WORDS or word.startswith(AGRI_PREFIXES):
+            return True
+    return False
+
+
+# Indic scripts inflect too much for a keyword list. Those queries go through
+# and are checked again once translated (see load_knowledge_search in app.py).
+_INDIC = re.compile("[\u0900-\u0c7f]")
+
+
+def may_be_agricultural(text):
+    return is_agricultural(text) or bool(_INDIC.search(text or ""))
+
+
+# --- CONTEXT FORMATTING ---
+def approx_tokens(text):
+    # ~4 characters per token for English prose; no tokenizer needed
+    return (len(text) + 3) // 4
+
+
+def format_context(hits, max_tokens):
+    """Number the retrieved chunks and cut them to `max_tokens` in rank order."""
+    parts, used, seen = [], 0, set()
+    for doc, _score in hits:
+        text = " ".join(doc.page_content.split())
+        if not text or text in seen:
+            continue
+        seen.add(text)
+        meta = doc.metadata or {}
+        label = os.path.basename(str(meta.get("source") or "manual"))
+        if meta.get("page") is not None:
+            label = f"{label} p.{int(meta['page']) + 1}"
+        header = f"[{len(parts) + 1}] ({label}) "
+        room = max_tokens - used - approx_tokens(header)
+        if room <= 20:
+            break
+        if approx_tokens(text) > room:
+            text = text[:room * 4].rsplit(" ", 1)[0] + " …"
+        parts.append(header + text)
+        used += approx_tokens(parts[-1])
+    return "\n".join(parts) or None
+
+
+# --- KNOWLEDGE BASE ---
+class KnowledgeBase:
+    """Retrieval from the RAG vector DB, run beside the rest of a chat request.
+
+    `loader()` returns `search(query, k) -> [(Document, similarity)]`; it is
+    called once on a background thread (loading MiniLM takes seconds), and
+    until it has finished chat simply runs without context. `submit()` starts
+    a search on a small pool and `context()` waits for it at most `timeout`
+    seconds, so retrieval never delays the Gemini call by more than that.
+    With `translate(query) -> query` the search runs on the translated query;
+    translation is a stage of its own with its own `translate_timeout`, so a
+    non-English question doesn't spend the search budget on the translation.
+
+    With `version()` (e.g. the build named by rag/watch.py's CURRENT pointer)
+    the loader thread keeps checking it every `check_interval` seconds. When
+    it changes, the new index is loaded beside the old one and swapped in;
+    searches already running finish on the old index.
+    """
+
+    def __init__(self, loader, k=4, max_tokens=600, min_similarity=0.3, timeout=0.3, workers=4, max_pending=16,
+                 version=None, check_interval=30.0, translate=None, translate_timeout=1.0):
+        self.loader = loader
+        self.translate = translate
+        self.translate_timeout = translate_timeout
+        self.k = k
+        self.max_tokens = max_tokens
+        self.min_similarity = min_similarity
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.check_interval = check_interval
+        self._version = version
+        self.version = None
+        self.swaps = 0
+        self._search = None
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rag")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.load_error = None
+        self.outcomes = {}
+
+    def start(self):
+        threading.Thread(target=self._watch, name="rag-load", daemon=True).start()
+        return self
+
+    def _watch(self):
+        self._load()
+        while self._version is not None:
+            time.sleep(self.check_interval)
+            try:
+                changed = self._version() != self.version
+            except Exception:
+                continue
+            if changed:
+                self._load()
+
+    def _load(self):
+        # Recorded even when loading fails, so a broken build is retried only once it is replaced
+        self.version = self._version() if self._version else None
+        try:
+            search = self.loader()
+        except Exception as e:
+            self.load_error = str(e)
+            if self._search is None:
+                print(f"⚠️ Warning: knowledge base not available, chat runs without retrieval: {e}")
+            else:
+                print(f"⚠️ Warning: knowledge base {self.version} not loaded, still serving the previous one: {e}")
+            return
+        swapped = self._search is not None
+        self._search = search  # a single reference swap: no search ever sees a half-loaded index
+        self.load_error = None
+        if swapped:
+            with self._lock:
+                self.swaps += 1
+            print(f"✅ Knowledge base switched to {self.version}")
+
+    @property
+    def ready(self):
+        return self._search is not None
+
+    def _count(self, outcome):
+        with self._lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    def _run(self, query):
+        hits = self._search(query, self.k)
+        return [(doc, score) for doc, score in hits if score is None or score >= self.min_similarity]
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, query):
+        """Start a search for `query`; returns a Future, or None when retrieval is skipped."""
+        if not self.ready:
+            self._count("not_ready")
+            return None
+        if not may_be_agricultural(query):
+            self._count("skipped")
+            return None
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.outcomes["busy"] = self.outcomes.get("busy", 0) + 1
+                return None
+            self._pending += 1
+        if self.translate is None:
+            future = self._pool.submit(self._run, query)
+        else:
+            translation = Future()  # completed by the pool job once the query is translated
+            translation.set_running_or_notify_cancel()
+            future = self._pool.submit(self._translate_and_run, query, translation)
+            future.translation = translation
+        future.add_done_callback(self._done)  # also runs when the caller cancels it
+        return future
+
+    def _translate_and_run(self, query, translation):
+        try:
+            query = self.translate(query)
+        except Exception:
+            pass  # search the query as written
+        translation.set_result(query)
+        return self._run(query)
+
+    def _format(self, hits):
+        context = format_context(hits, self.max_tokens)
+        self._count("used" if context else "empty")
+        return context
+
+    def context(self, future):
+        """Formatted context for a submitted search, or None."""
+        if future is None:
+            return None
+        try:
+            translation = getattr(future, "translation", None)
+            if translation is not None:
+                translation.result(timeout=self.translate_timeout)
+            hits = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            self._count("timeout")
+            return None
+        except Exception:
+            self._count("error")
+            return None
+        return self._format(hits)
+
+    async def context_async(self, future):
+        if future is None:
+            return None
+        try:
+            # shield: a timeout here must not cancel the shared pool future
+            translation = getattr(future, "translation", None)
+            if translation is not None:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(translation)), self.translate_timeout)
+            hits = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+        except asyncio.TimeoutError:
+            self._count("timeout")
+            return None
+        except Exception:
+            self._count("error")
+            return None
+        return self._format(hits)
+
+    def stats(self):
+        with self._lock:
+            return {"ready": self.ready, "pending": self._pending, "outcomes": dict(self.outcomes),
+                    "version": self.version, "swaps": self.swaps}
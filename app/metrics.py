@@ -0,0 +1,172 @@
+import os
+import time
+import uuid
+import threading
+import contextlib
+
+
+# Latency buckets in seconds: sub-millisecond model calls up to slow LLM replies
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+
+class Metrics:
+    """Minimal Prometheus text-format registry: counters, gauges, histograms.
+
+    Gauges can also be callbacks evaluated at scrape time, which is how the
+    existing caches and pools (each with its own stats()) are exported
+    without touching their hot paths.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._help = {}
+        self._types = {}
+        self._counters = {}    # (name, labels) -> value
+        self._gauges = {}      # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+        self._callbacks = []   # fn() -> iterable of (name, labels dict, value)
+
+    def describe(self, name, kind, help_text):
+        self._types[name] = kind
+        self._help[name] = help_text
+
+    def inc(self, name, value=1.0, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def gauge_add(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0.0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            h = self._histograms.get(key)
+            if h is None:
+                h = self._histograms[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    h[i] += 1
+            h[-2] += value
+            h[-1] += 1
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def register_callback(self, fn):
+        self._callbacks.append(fn)
+
+    def render(self):
+        # name -> (default kind, sample lines); the text format needs every
+        # sample of a metric in one group, whichever source produced it
+        families = {}
+
+        def family(name, default_kind):
+            return families.setdefault(name, (default_kind, []))[1]
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted(self._histograms.items())
+
+        for (name, labels), value in counters:
+            family(name, 'counter').append(f'{name}{_labels(labels)} {value}')
+        for (name, labels), value in gauges:
+            family(name, 'gauge').append(f'{name}{_labels(labels)} {value}')
+        for (name, labels), h in histograms:
+            lines = family(name, 'histogram')
+            for bound, count in zip(self.buckets, h):
+                lines.append(f'{name}_bucket{_labels(labels + (("le", bound),))} {count}')
+            lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {h[-1]}')
+            lines.append(f'{name}_sum{_labels(labels)} {h[-2]}')
+            lines.append(f'{name}_count{_labels(labels)} {h[-1]}')
+        for fn in self._callbacks:
+            try:
+                samples = list(fn())
+            except Exception:
+                continue
+            for name, labels, value in samples:
+                family(name, 'gauge').append(f'{name}{_labels(tuple(sorted(labels.items())))} {value}')
+
+        lines = []
+        for name, (default_kind, samples) in families.items():
+            if name in self._help:
+                lines.append(f'# HELP {name} {self._help[name]}')
+            lines.append(f'# TYPE {name} {self._types.get(name, default_kind)}')
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+# --- PER-REQUEST PROFILING ---
+class RequestProfiler:
+    """Opt-in profiler for single requests (X-Profile: 1 header).
+
+    Uses pyinstrument's sampling profiler when installed and falls back to
+    cProfile. Reports go to `out_dir`, one file per profiled request; only the
+    newest `max_reports` are kept.
+    """
+
+    def __init__(self, out_dir, max_reports=200):
+        self.out_dir = out_dir
+        self.max_reports = max_reports
+        try:
+            import pyinstrument
+            self._pyinstrument = pyinstrument
+        except ImportError:
+            self._pyinstrument = None
+
+    def start(self):
+        if self._pyinstrument is not None:
+            profiler = self._pyinstrument.Profiler(interval=0.001)
+            profiler.start()
+        else:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return profiler
+
+    def stop(self, profiler, name):
+        os.makedirs(self.out_dir, exist_ok=True)
+        # Unique per request: several reports can finish within the same second
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        safe = ''.join(c if c.isalnum() else '_' for c in name)
+        if self._pyinstrument is not None:
+            profiler.stop()
+            path = os.path.join(self.out_dir, f'{stamp}-{safe}.html')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(profiler.output_html())
+        else:
+            profiler.disable()
+            path = os.path.join(self.out_dir, f'{stamp}-{safe}.prof')
+            profiler.dump_stats(path)
+        self._prune()
+        return path
+
+    def _prune(self):
+        reports = sorted(
+            (entry for entry in os.scandir(self.out_dir) if entry.name.endswith(('.html', '.prof'))),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in reports[:-self.max_reports]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:  # pruned by another worker
+                pass
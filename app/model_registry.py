@@ -0,0 +1,251 @@
+import os
+import re
+import sys
+import json
+import time
+import pickle
+import shutil
+import threading
+
+import xgboost
+
+from pricing import (
+    CATEGORICAL_COLUMNS, FEATURE_COLUMNS, FastPricePredictor, build_feature_frame, categories_path,
+    load_categories, model_booster, predict_frame,
+)
+
+
+# --- MODEL DIRECTORY LAYOUT ---
+# models/
+#   CURRENT                  <- optional, name of the version to serve
+#   2024-06-03/
+#     model.ubj              <- native XGBoost (preferred), or model.json / model.pkl
+#     model_categories.json  <- optional training categories
+MODEL_FILES = ('model.ubj', 'model.json', 'model.pkl')
+CURRENT_FILE = 'CURRENT'
+
+# Row used to check that a candidate model accepts the 11-column schema
+_SMOKE_ROW = {
+    'State': 'smoke', 'District': 'smoke', 'Market': 'smoke', 'Commodity': 'smoke',
+    'Variety': 'smoke', 'Grade': 'smoke',
+    'Min_Price': 1000, 'Max_Price': 2000, 'Current_Price': 1500, 'Date': '2024-01-01',
+}
+
+
+def _natural_key(version):
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', version)]
+
+
+def load_model_file(path):
+    """Load a price model. Native .ubj/.json files load straight into a Booster
+    (no pickle, no version-coupled sklearn wrapper); .pkl keeps the old path."""
+    if path.endswith('.pkl'):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    return xgboost.Booster(model_file=path)
+
+
+def validate_schema(model, categories):
+    """Raise ValueError unless the model matches the features predict_price builds."""
+    booster = model_booster(model)
+    if booster.num_features() != len(FEATURE_COLUMNS):
+        raise ValueError(f"expected {len(FEATURE_COLUMNS)} features, model has {booster.num_features()}")
+    if booster.feature_names and list(booster.feature_names) != FEATURE_COLUMNS:
+        raise ValueError(f"feature names {booster.feature_names} do not match {FEATURE_COLUMNS}")
+    # The DataFrame path must run end to end before the model is served (load_bundle checks the fast path)
+    predict_frame(model, build_feature_frame([_SMOKE_ROW], categories))
+
+
+class PriceModelBundle:
+    """Everything needed to serve one model version. Never mutated after load,
+    so a request that grabbed a bundle keeps a consistent view during a swap."""
+
+    def __init__(self, version, path, model, categories, fast):
+        self.version = version
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        self.model = model
+        self.categories = categories
+        self.fast = fast
+        self.loaded_at = time.time()
+
+    def info(self):
+        return {
+            "version": self.version,
+            "path": self.path,
+            "format": os.path.splitext(self.path)[1].lstrip('.'),
+            "has_categories": self.categories is not None,
+            "fast_path": self.fast is not None,
+            "loaded_at": self.loaded_at,
+        }
+
+
+def load_bundle(version, path):
+    model = load_model_file(path)
+    categories = load_categories(path)
+    validate_schema(model, categories)
+    try:
+        fast = FastPricePredictor(model, categories)
+        fast.predict(_SMOKE_ROW)
+    except Exception as e:
+        fast = None
+        print(f"⚠️ Warning: fast price path unavailable for {version}, using DataFrame path: {e}")
+    return PriceModelBundle(version, path, model, categories, fast)
+
+
+class ModelRegistry:
+    """Versioned price models loaded from a directory and swapped atomically.
+
+    `refresh()` is cheap enough to call on every request: it only looks at the
+    disk every `check_interval` seconds and only one thread ever loads a new
+    version, while the others keep serving the current bundle.
+    """
+
+    def __init__(self, model_dir, legacy_path=None, on_swap=None, check_interval=5.0):
+        self.model_dir = model_dir
+        self.legacy_path = legacy_path
+        self.on_swap = on_swap
+        self.check_interval = check_interval
+        self.active = None
+        self._last_check = 0.0
+        self._failed = {}  # (path, mtime) of candidates that failed validation
+        self._load_lock = threading.Lock()
+
+    def versions(self):
+        if not os.path.isdir(self.model_dir):
+            return []
+        found = [name for name in os.listdir(self.model_dir) if self._model_file(name)]
+        return sorted(found, key=_natural_key)
+
+    def _model_file(self, version):
+        folder = os.path.join(self.model_dir, version)
+        if not os.path.isdir(folder):
+            return None
+        for name in MODEL_FILES:
+            path = os.path.join(folder, name)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def target(self):
+        """(version, path) that should be served right now, or None."""
+        pointer = os.path.join(self.model_dir, CURRENT_FILE)
+        if os.path.exists(pointer):
+            with open(pointer, 'r', encoding='utf-8') as f:
+                version = f.read().strip()
+            path = self._model_file(version)
+            if path:
+                return version, path
+            print(f"⚠️ Warning: {CURRENT_FILE} points at missing model version '{version}'")
+        versions = self.versions()
+        if versions:
+            return versions[-1], self._model_file(versions[-1])
+        if self.legacy_path and os.path.exists(self.legacy_path):
+            return 'legacy', self.legacy_path
+        return None
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return self.active
+        if not self._load_lock.acquire(blocking=force):
+            return self.active  # another thread is already loading
+        try:
+            self._last_check = now
+            target = self.target()
+            if target is None:
+                return self.active
+            version, path = target
+            mtime = os.path.getmtime(path)
+            active = self.active
+            if active and active.path == path and active.mtime == mtime:
+                return active
+            if self._failed.get(path) == mtime:
+                return active
+            try:
+                bundle = load_bundle(version, path)
+            except Exception as e:
+                self._failed[path] = mtime
+                print(f"❌ Error loading price model {version} from {path}: {e}")
+                return active
+            self.active = bundle
+            if self.on_swap:
+                self.on_swap(bundle)
+            print(f"✅ Price Prediction Model {version} loaded from {path}")
+            return bundle
+        finally:
+            self._load_lock.release()
+
+    def info(self):
+        active = self.active
+        return {
+            "active": active.info() if active else None,
+            "versions": self.versions(),
+        }
+
+
+# --- CLI ---
+def export_version(pickle_path, model_dir, version, fmt='ubj'):
+    """Convert a pickled model into a native-format version directory."""
+    with open(pickle_path, 'rb') as f:
+        model = pickle.load(f)
+    folder = os.path.join(model_dir, version)
+    os.makedirs(folder, exist_ok=True)
+    target = os.path.join(folder, f'model.{fmt}')
+    model_booster(model).save_model(target)
+    if os.path.exists(categories_path(pickle_path)):
+        shutil.copyfile(categories_path(pickle_path), categories_path(target))
+    return target
+
+
+def write_categories(training_csv, model_path):
+    """Write the categories sidecar for `model_path` from the CSV the model was trained on.
+
+    Training used astype('category'), whose categories are the sorted unique
+    values of each column, so that is the order the codes refer to.
+    """
+    import pandas as pd
+
+    frame = pd.read_csv(training_csv, dtype=str, usecols=lambda c: c in CATEGORICAL_COLUMNS)
+    missing = [col for col in CATEGORICAL_COLUMNS if col not in frame.columns]
+    if missing:
+        raise ValueError(f"{training_csv} has no {', '.join(missing)} column(s)")
+    categories = {col: sorted(frame[col].dropna().unique().tolist()) for col in CATEGORICAL_COLUMNS}
+    target = categories_path(model_path)
+    tmp = target + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(categories, f, ensure_ascii=False)
+    os.replace(tmp, target)
+    return target, {col: len(values) for col, values in categories.items()}
+
+
+def activate_version(model_dir, version):
+    """Point CURRENT at `version`; the rename is atomic so readers never see a partial file."""
+    tmp = os.path.join(model_dir, CURRENT_FILE + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(version + '\n')
+    os.replace(tmp, os.path.join(model_dir, CURRENT_FILE))
+
+
+if __name__ == '__main__':
+    usage = (
+        "usage: python model_registry.py export <price_model.pkl> <models_dir> <version> [ubj|json]\n"
+        "       python model_registry.py activate <models_dir> <version>\n"
+        "       python model_registry.py categories <training.csv> <model file>\n"
+        "       python model_registry.py list <models_dir>"
+    )
+    args = sys.argv[1:]
+    if len(args) >= 4 and args[0] == 'export':
+        fmt = args[4] if len(args) > 4 else 'ubj'
+        print(f"✅ Exported to {export_version(args[1], args[2], args[3], fmt)}")
+    elif len(args) == 3 and args[0] == 'activate':
+        activate_version(args[1], args[2])
+        print(f"✅ {args[2]} is now the active price model")
+    elif len(args) == 3 and args[0] == 'categories':
+        target, counts = write_categories(args[1], args[2])
+        print(f"✅ Categories written to {target}: {counts}")
+    elif len(args) == 2 and args[0] == 'list':
+        print(json.dumps(ModelRegistry(args[1]).versions(), indent=2))
+    else:
+        print(usage)
+        sys.exit(1)
@@ -0,0 +1,269 @@
+import os
+import json
+import datetime
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import xgboost
+
+
+# --- FEATURE SCHEMA ---
+# Column order the price model was trained on (11 features).
+FEATURE_COLUMNS = [
+    'State', 'District', 'Market', 'Commodity', 'Variety', 'Grade',
+    'Min Price', 'Max Price', 'Modal Price', 'Year', 'Month',
+]
+CATEGORICAL_COLUMNS = ['State', 'District', 'Market', 'Commodity', 'Variety', 'Grade']
+
+# API field name -> model column name for the numeric inputs
+NUMERIC_FIELDS = {
+    'Min_Price': 'Min Price',
+    'Max_Price': 'Max Price',
+    'Current_Price': 'Modal Price',
+}
+
+
+class InvalidDateError(ValueError):
+    """Some rows have a Date that cannot be parsed; `rows` are their 0-based positions."""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        shown = ', '.join(str(i) for i in self.rows[:10]) + (', ...' if len(self.rows) > 10 else '')
+        super().__init__(f"Invalid Date in row{'s' if len(self.rows) > 1 else ''} {shown}")
+
+
+def _parse_date(value):
+    """One date in any format pandas understands, or None when it cannot be parsed."""
+    try:
+        return pd.to_datetime(value)
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+
+def categories_path(model_path):
+    """Sidecar written next to the model: price_model.pkl -> price_model_categories.json"""
+    return os.path.splitext(model_path)[0] + '_categories.json'
+
+
+def load_categories(model_path):
+    """Load the training category lists ({column: [values in training order]}).
+
+    Returns None when the sidecar does not exist; callers then fall back to the
+    legacy single-row encoding (see `encode_categorical`).
+    """
+    path = categories_path(model_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        categories = json.load(f)
+    return {col: list(categories.get(col) or []) for col in CATEGORICAL_COLUMNS}
+
+
+def encode_categorical(values, known=None):
+    """Turn a column of raw strings into the categorical dtype XGBoost expects.
+
+    With the training categories, values map to their training codes and
+    unseen values become missing. Without them we cannot recover training
+    codes: a lone row passed through astype('category') always gets code 0, so
+    every present value keeps code 0 here too. That way a batch predicts
+    exactly what the same rows would predict one at a time.
+    """
+    values = pd.Series(values, dtype=object)
+    if known:
+        return pd.Categorical(values, categories=known)
+    codes = np.where(values.notna(), 0, -1)
+    return pd.Categorical.from_codes(codes, categories=['__unknown__'])
+
+
+def build_feature_frame(raw, categories=None):
+    """Build the model input DataFrame from API-style records.
+
+    `raw` is a list of dicts or a DataFrame using the request field names
+    (State, District, ..., Min_Price, Max_Price, Current_Price, Date).
+    """
+    if not isinstance(raw, pd.DataFrame):
+        raw = pd.DataFrame(list(raw))
+    n = len(raw)
+
+    def column(name):
+        if name in raw.columns:
+            return raw[name]
+        return pd.Series([None] * n, index=raw.index, dtype=object)
+
+    # --- Split Date into Year and Month (missing dates mean "now", malformed ones are rejected) ---
+    raw_dates = column('Date')
+    dates = pd.to_datetime(raw_dates, errors='coerce')
+    given = raw_dates.notna() & (raw_dates.astype(str).str.strip() != '')
+    failed = np.flatnonzero((given & dates.isna()).to_numpy())
+    if len(failed):
+        # Vectorised parsing infers one format for the column; retry odd rows on their own
+        dates = dates.astype(object)
+        bad = []
+        for i in failed:
+            parsed = _parse_date(raw_dates.iloc[i])
+            if parsed is None:
+                bad.append(int(i))
+            else:
+                dates.iloc[i] = parsed
+        if bad:
+            raise InvalidDateError(bad)
+        dates = pd.to_datetime(dates)
+    now = datetime.datetime.now()
+    frame = pd.DataFrame(index=raw.index)
+    for col in CATEGORICAL_COLUMNS:
+        frame[col] = encode_categorical(column(col), (categories or {}).get(col))
+    for field, col in NUMERIC_FIELDS.items():
+        frame[col] = pd.to_numeric(column(field), errors='raise').fillna(0).astype(float)
+    frame['Year'] = dates.dt.year.fillna(now.year).astype(int)
+    frame['Month'] = dates.dt.month.fillna(now.month).astype(int)
+    return frame[FEATURE_COLUMNS].reset_index(drop=True)
+
+
+def model_booster(model):
+    """Underlying Booster of a pickled XGBRegressor or a natively loaded Booster."""
+    return model if isinstance(model, xgboost.Booster) else model.get_booster()
+
+
+def predict_frame(model, frame):
+    """Predict a feature DataFrame with either kind of model."""
+    if isinstance(model, xgboost.Booster):
+        return model.predict(xgboost.DMatrix(frame, enable_categorical=True))
+    return model.predict(frame)
+
+
+# --- SINGLE-ROW FAST PATH ---
+def _parse_year_month(date_str):
+    if not date_str:
+        now = datetime.datetime.now()
+        return now.year, now.month
+    try:
+        # The date input sends ISO dates; avoid pandas for the common case
+        dt = datetime.date.fromisoformat(str(date_str)[:10])
+    except ValueError:
+        dt = _parse_date(date_str)
+        if dt is None or pd.isna(dt):
+            raise InvalidDateError([0])
+    return dt.year, dt.month
+
+
+class FastPricePredictor:
+    """Predict one row without building a DataFrame.
+
+    Categories are encoded through dicts precomputed from the training
+    categories, the features are written into a reusable float32 row and the
+    booster is called with inplace_predict. Produces the same numbers as
+    `price_model.predict(build_feature_frame([data], categories))`.
+    """
+
+    def __init__(self, model, categories=None):
+        booster = model_booster(model).copy()
+        booster.feature_names = list(FEATURE_COLUMNS)
+        booster.feature_types = ['c' if col in CATEGORICAL_COLUMNS else 'float' for col in FEATURE_COLUMNS]
+        self.booster = booster
+
+        # XGBRegressor.predict stops at best_iteration; a raw Booster uses every tree
+        best_iteration = None if isinstance(model, xgboost.Booster) else getattr(model, 'best_iteration', None)
+        self.iteration_range = (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+
+        # Columns without a training category list keep the legacy encoding
+        self.code_maps = {
+            col: {value: code for code, value in enumerate(categories[col])}
+            for col in CATEGORICAL_COLUMNS
+            if categories and categories.get(col)
+        }
+        self._local = threading.local()
+
+    def _row(self):
+        # One preallocated row per worker thread
+        row = getattr(self._local, 'row', None)
+        if row is None:
+            row = self._local.row = np.empty((1, len(FEATURE_COLUMNS)), dtype=np.float32)
+        return row
+
+    def encode(self, data):
+        row = self._row()
+        values = row[0]
+        for i, col in enumerate(CATEGORICAL_COLUMNS):
+            value = data.get(col)
+            mapping = self.code_maps.get(col)
+            if value is None:
+                values[i] = np.nan
+            elif mapping is None:
+                values[i] = 0  # legacy encoding, see encode_categorical
+            else:
+                values[i] = mapping.get(value, np.nan)
+        offset = len(CATEGORICAL_COLUMNS)
+        for i, field in enumerate(NUMERIC_FIELDS):
+            values[offset + i] = float(data.get(field) or 0)
+        values[-2], values[-1] = _parse_year_month(data.get('Date'))
+        return row
+
+    def predict_row(self, row):
+        return float(self.booster.inplace_predict(row, iteration_range=self.iteration_range)[0])
+
+    def predict(self, data):
+        return self.predict_row(self.encode(data))
+
+
+# --- PREDICTION RESULT CACHE ---
+class PredictionCache:
+    """LRU + TTL cache of predictions keyed on the encoded feature row.
+
+    Keys are built after normalisation (category codes, parsed Year/Month), so
+    requests that differ only in ways the model cannot see share an entry.
+    `invalidate()` must be called whenever the model is replaced; it also bumps
+    a generation counter so a prediction computed by the old model that
+    finishes after the swap is not stored.
+    """
+
+    def __init__(self, max_entries=4096, ttl_seconds=900):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, generation):
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,259 @@
+const chatContainer = document.getElementById('chatContainer');
+const textInput = document.getElementById('textInput');
+const sendBtn = document.getElementById('sendBtn');
+const micBtn = document.getElementById('micBtn');
+const imageInput = document.getElementById('imageInput');
+const preview = document.getElementById('preview');
+const langSelect = document.getElementById('languageSelect');
+const audioToggle = document.getElementById('audioToggle');
+const nitrogenBtn = document.getElementById('nitrogenBtn');
+
+marked.setOptions({ breaks: true, gfm: true });
+
+// VIEW TOGGLING logic
+function toggleView(viewName) {
+    const chatView = document.getElementById('chat-view');
+    const priceView = document.getElementById('price-view');
+
+    if (viewName === 'price') {
+        chatView.style.display = 'none';
+        priceView.style.display = 'flex';
+    } else {
+        chatView.style.display = 'flex';
+        priceView.style.display = 'none';
+    }
+}
+
+// PRICE FORM AUTOCOMPLETE (suggestions from the model's known categories)
+['State', 'District', 'Market', 'Commodity', 'Variety', 'Grade'].forEach(field => {
+    const input = document.getElementById(`pred${field}`);
+    const list = document.getElementById(`list${field}`);
+    let timer = null;
+    input.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(async () => {
+            if (!input.value.trim()) { list.innerHTML = ''; return; }
+            try {
+                const res = await fetch(`/api/price_autocomplete?field=${field}&q=${encodeURIComponent(input.value)}`);
+                const data = await res.json();
+                list.innerHTML = '';
+                (data.suggestions || []).forEach(s => {
+                    const opt = document.createElement('option');
+                    opt.value = s;
+                    list.appendChild(opt);
+                });
+            } catch (err) { /* suggestions are optional */ }
+        }, 150);
+    });
+});
+
+// PRICE PREDICTION LOGIC (Connected to Backend)
+async function predictPrice() {
+    const currentPriceInput = document.getElementById('currentPrice').value;
+    const currentPrice = parseFloat(currentPriceInput) || 0;
+
+    const resultBox = document.getElementById('priceResult');
+    const loading = document.getElementById('loadingAnim');
+    const finalResult = document.getElementById('finalResult');
+    const display = document.getElementById('predictedPriceDisplay');
+    const alertBox = document.getElementById('alertBox');
+
+    // Gather Data
+    const payload = {
+        State: document.getElementById('predState').value,
+        District: document.getElementById('predDistrict').value,
+        Market: document.getElementById('predMarket').value,
+        Commodity: document.getElementById('predCommodity').value,
+        Variety: document.getElementById('predVariety').value,
+        Grade: document.getElementById('predGrade').value,
+        Min_Price: document.getElementById('predMin').value,
+        Max_Price: document.getElementById('predMax').value,
+        Current_Price: currentPrice,
+        Date: document.getElementById('predDate').value
+    };
+
+    resultBox.style.display = 'block';
+    loading.style.display = 'block';
+    finalResult.style.display = 'none';
+
+    try {
+        // Call Backend API
+        const response = await fetch('/api/predict_price', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify(payload)
+        });
+
+        const data = await response.json();
+
+        loading.style.display = 'none';
+        finalResult.style.display = 'block';
+
+        if (response.ok) {
+            const predicted = data.predicted_price.toFixed(2);
+            display.innerText = `₹ ${predicted}`;
+
+            // Reset Classes
+            alertBox.className = 'alert-box';
+
+            // Logic for Alert Message (Comparing predicted vs current)
+            if (currentPrice > 0) {
+                if (predicted > currentPrice * 1.05) {
+                    alertBox.classList.add('alert-green');
+                    alertBox.innerHTML = '<i class="fa-solid fa-arrow-trend-up"></i> Price Increasing: Hold crop for better profit';
+                } else if (predicted < currentPrice * 0.95) {
+                    alertBox.classList.add('alert-red');
+                    alertBox.innerHTML = '<i class="fa-solid fa-arrow-trend-down"></i> Price Decreasing: Sell early to avoid loss';
+                } else {
+                    alertBox.classList.add('alert-yellow');
+                    alertBox.innerHTML = '<i class="fa-solid fa-minus"></i> Market Stable: Price expected to remain stable';
+                }
+            } else {
+                alertBox.classList.add('alert-yellow');
+                alertBox.innerHTML = '<i class="fa-solid fa-check"></i> Prediction Complete';
+            }
+        } else {
+            display.innerText = "Error";
+            alertBox.innerText = data.error || "Prediction failed";
+            alertBox.className = 'alert-box alert-red';
+        }
+
+    } catch (error) {
+        loading.style.display = 'none';
+        finalResult.style.display = 'block';
+        display.innerText = "Error";
+        alertBox.innerText = "Connection Failed";
+        alertBox.className = 'alert-box alert-red';
+        console.error(error);
+    }
+}
+
+// Voice Input
+const SpeechRecognition = window.SpeechRecognition || window.webkitSpeechRecognition;
+let recognition = null;
+if (SpeechRecognition) {
+    recognition = new SpeechRecognition();
+    recognition.continuous = false;
+    const langMap = { 'en': 'en-US', 'hi': 'hi-IN', 'es': 'es-ES', 'fr': 'fr-FR', 'ta': 'ta-IN', 'te': 'te-IN' };
+
+    recognition.onstart = () => { micBtn.classList.add('listening'); textInput.placeholder = "Listening..."; };
+    recognition.onend = () => { micBtn.classList.remove('listening'); textInput.placeholder = "Ask about crop health..."; };
+    recognition.onresult = (event) => { textInput.value = event.results[0][0].transcript; };
+    micBtn.addEventListener('click', () => { recognition.lang = langMap[langSelect.value] || 'en-US'; recognition.start(); });
+} else { micBtn.style.display = 'none'; }
+
+// --- SOIL SENSOR (latest ESP32 reading; demo values if none received yet) ---
+// Text from the API goes through marked.parse into innerHTML, so escape it first
+const escapeHtml = (value) => String(value).replace(/[&<>"'`*_\[\]]/g, (c) => `&#${c.charCodeAt(0)};`);
+
+nitrogenBtn.addEventListener('click', async () => {
+    toggleView('chat'); // Ensure we are on chat view to see result
+
+    // 1. Show Connecting Message
+    addMessage("📡 Connecting to IoT Soil Sensor (ESP32)...", 'ai');
+
+    let level = null;
+    let sensorLine = "* **Sensor Status:** Online 🟢";
+    try {
+        const res = await fetch('/api/sensors/latest?metric=nitrogen');
+        if (res.ok) {
+            const reading = await res.json();
+            level = Math.round(reading.value);
+            sensorLine = `* **Sensor:** ${escapeHtml(reading.device_id)} 🟢 (last reading ${new Date(reading.ts * 1000).toLocaleString()})`;
+        }
+    } catch (err) { /* fall back to demo values */ }
+    if (level === null) {
+        const levels = [120, 135, 142, 128, 145]; // Demo data until a sensor reports in
+        level = levels[Math.floor(Math.random() * levels.length)];
+        sensorLine = "* **Sensor Status:** Demo mode (no readings received yet) 🟡";
+    }
+
+    // Typical optimal band for field crops is roughly 120-160 kg/ha
+    let status = "**Optimal Range** ✅";
+    let advice = "Your soil nitrogen levels are sufficient for the current growth stage. Continue with standard irrigation. No immediate fertilization required.";
+    if (level < 120) {
+        status = "**Below Optimal** ⚠️";
+        advice = "Nitrogen is on the low side. Consider a split application of nitrogen fertilizer (e.g. urea) and re-test after the next irrigation.";
+    } else if (level > 160) {
+        status = "**Above Optimal** ⚠️";
+        advice = "Nitrogen is high. Skip the next nitrogen top-dressing to avoid lodging and leaching losses.";
+    }
+
+    const resultMsg = `
+### 🌱 Soil Nitrogen Analysis Complete
+
+${sensorLine}
+* **Detected Nitrogen (N):** ${level} kg/ha
+* **Status:** ${status}
+
+**Recommendation:** ${advice}
+    `;
+    addMessage(resultMsg, 'ai');
+});
+
+imageInput.addEventListener('change', function() {
+    const file = this.files[0];
+    if (file) {
+        const reader = new FileReader();
+        reader.onload = (e) => { preview.src = e.target.result; preview.style.display = 'block'; };
+        reader.readAsDataURL(file);
+    }
+});
+
+async function sendMessage() {
+    const text = textInput.value;
+    const file = imageInput.files[0];
+    const lang = langSelect.value;
+    const audioEnabled = audioToggle.value === 'true';
+
+    if (!text && !file) return;
+
+    addMessage(text || "Analyzing...", 'user', file ? URL.createObjectURL(file) : null);
+    textInput.value = ''; imageInput.value = ''; preview.style.display = 'none';
+
+    const formData = new FormData();
+    formData.append('prompt', text);
+    formData.append('lang', lang);
+    if (file) formData.append('image', file);
+
+    const loadingId = addLoadingBubble();
+
+    try {
+        const response = await fetch('/api/chat', { method: 'POST', body: formData });
+        const data = await response.json();
+        removeMessage(loadingId);
+
+        if (response.ok) {
+            addMessage(data.text, 'ai');
+            if (audioEnabled && data.audio_url) { new Audio(data.audio_url).play(); }
+        } else {
+            addMessage("Error: " + (data.text || "Unknown Server Error"), 'ai');
+        }
+    } catch (error) {
+        removeMessage(loadingId);
+        addMessage("Connection failed.", 'ai');
+    }
+}
+
+function addMessage(text, sender, imageUrl = null) {
+    const div = document.createElement('div');
+    div.className = `message ${sender}`;
+    let content = sender === 'ai' ? marked.parse(text) : text;
+    if (imageUrl) content = `<img src="${imageUrl}" style="max-width: 150px; border-radius: 10px; margin-bottom: 5px; display:block;">` + content;
+    div.innerHTML = `<div class="avatar ${sender}"><i class="fa-solid fa-${sender === 'ai' ? 'robot' : 'user'}"></i></div><div class="bubble">${content}</div>`;
+    chatContainer.appendChild(div);
+    chatContainer.scrollTop = chatContainer.scrollHeight;
+}
+
+function addLoadingBubble() {
+    const id = 'loading-' + Date.now();
+    const div = document.createElement('div'); div.id = id; div.className = 'message ai';
+    div.innerHTML = `<div class="avatar ai"><i class="fa-solid fa-robot"></i></div><div class="bubble"><i class="fa-solid fa-spinner fa-spin"></i> Analyzing...</div>`;
+    chatContainer.appendChild(div);
+    chatContainer.scrollTop = chatContainer.scrollHeight;
+    return id;
+}
+function removeMessage(id) { const el = document.getElementById(id); if (el) el.remove(); }
+
+sendBtn.addEventListener('click', sendMessage);
+textInput.addEventListener('keypress', (e) => { if (e.key === 'Enter') sendMessage(); });
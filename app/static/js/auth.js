@@ -0,0 +1,34 @@
+function toggleForms() {
+    document.getElementById('loginForm').classList.toggle('hidden');
+    document.getElementById('registerForm').classList.toggle('hidden');
+    document.querySelectorAll('.error-msg').forEach(e => e.innerText = '');
+}
+
+async function handleAuth(e, type) {
+    e.preventDefault();
+    const form = e.target;
+    const formData = new FormData(form);
+    const errorDiv = document.getElementById(`${type}Error`);
+    const btn = form.querySelector('button');
+
+    btn.innerHTML = '<i class="fa-solid fa-spinner fa-spin"></i> Processing...';
+    errorDiv.innerText = '';
+
+    try {
+        const res = await fetch(`/auth/${type}`, {
+            method: 'POST',
+            body: formData
+        });
+        const data = await res.json();
+
+        if (data.success) {
+            window.location.reload();
+        } else {
+            errorDiv.innerText = data.message || "An error occurred";
+            btn.innerText = type === 'login' ? 'Sign In' : 'Create Account';
+        }
+    } catch (err) {
+        errorDiv.innerText = "Connection Failed. Check Server.";
+        btn.innerText = type === 'login' ? 'Sign In' : 'Create Account';
+    }
+}
@@ -0,0 +1,209 @@
+import os
+import json
+import math
+import time
+import datetime
+import threading
+from collections import defaultdict
+
+
+# --- STORE LAYOUT ---
+# <root>/<kind>/raw/2024-06-03.tsv      <- append-only, one line per point:
+#                                          ts \t series \t metric \t value
+# <root>/<kind>/rollup_1h/2024-06-03.json <- hourly count/sum/min/max, written
+#                                          once a day is closed (lazy compaction),
+#                                          with the raw file size it was built from
+RAW_DIR = 'raw'
+ROLLUP_DIR = 'rollup_1h'
+LATEST_LOOKBACK_DAYS = 7
+# Accepted timestamps; anything outside is a broken device clock or bad input
+MIN_TS = 946684800.0   # 2000-01-01
+MAX_TS = 4102444800.0  # 2100-01-01
+
+
+def parse_ts(value):
+    """Epoch seconds from an epoch number, an ISO string or None (now); ValueError outside MIN_TS..MAX_TS."""
+    if value is None or value == '':
+        return time.time()
+    if isinstance(value, str):
+        try:
+            value = float(value)  # epoch passed as a query-string value
+        except ValueError:
+            pass
+    if isinstance(value, bool):
+        raise ValueError(f'Invalid timestamp {value!r}')
+    if isinstance(value, (int, float)):
+        # ESP32 clocks often report milliseconds
+        ts = value / 1000.0 if value > 1e11 else float(value)
+    else:
+        dt = datetime.datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=datetime.timezone.utc)
+        ts = dt.timestamp()
+    if not (math.isfinite(ts) and MIN_TS <= ts < MAX_TS):
+        raise ValueError(f'Timestamp {value!r} out of range')
+    return ts
+
+
+def parse_value(value):
+    """A finite float reading; ValueError for inf/NaN, which would not survive the TSV and JSON round trip."""
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f'Invalid value {value!r}')
+    return value
+
+
+def _day(ts):
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).strftime('%Y-%m-%d')
+
+
+def _days_between(start, end):
+    day = datetime.datetime.fromtimestamp(start, datetime.timezone.utc).date()
+    last = datetime.datetime.fromtimestamp(end, datetime.timezone.utc).date()
+    while day <= last:
+        yield day.isoformat()
+        day += datetime.timedelta(days=1)
+
+
+def _clean(text):
+    return ' '.join(str(text).split())
+
+
+class TimeSeriesStore:
+    """Local append-only time-series store partitioned by kind and UTC day.
+
+    Writes are a single buffered append per partition per batch, so bursts of
+    readings cost one file write rather than one per point. Hourly rollups are
+    computed from the raw partition on demand and persisted once the day is
+    over, so ingestion never rewrites existing data.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._latest = {}  # (kind, series, metric) -> (ts, value)
+        self.points_written = 0
+
+    def _path(self, kind, folder, day, ext):
+        return os.path.join(self.root, kind, folder, f'{day}.{ext}')
+
+    # --- WRITE ---
+    def append(self, kind, points):
+        """Append (ts, series, metric, value) tuples; returns how many were stored."""
+        partitions = defaultdict(list)
+        newest = {}
+        for ts, series, metric, value in points:
+            series, metric, value = _clean(series), _clean(metric), float(value)
+            partitions[_day(ts)].append(f'{ts:.3f}\t{series}\t{metric}\t{value!r}\n')
+            key = (kind, series, metric)
+            if key not in newest or ts >= newest[key][0]:
+                newest[key] = (ts, value)
+
+        with self._lock:
+            for day, lines in partitions.items():
+                path = self._path(kind, RAW_DIR, day, 'tsv')
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.writelines(lines)
+            for key, point in newest.items():
+                current = self._latest.get(key)
+                if current is None or point[0] >= current[0]:
+                    self._latest[key] = point
+            count = sum(len(lines) for lines in partitions.values())
+            self.points_written += count
+        return count
+
+    # --- READ ---
+    def _scan(self, kind, day):
+        path = self._path(kind, RAW_DIR, day, 'tsv')
+        if not os.path.exists(path):
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) != 4:
+                    continue  # torn write from a crash
+                yield float(parts[0]), parts[1], parts[2], float(parts[3])
+
+    def query(self, kind, series, metric, start, end):
+        """Raw (ts, value) points for one series/metric with start <= ts < end."""
+        return [(ts, value) for ts, _, value in self._query(kind, series, metric, start, end)]
+
+    def _query(self, kind, series, metric, start, end):
+        # series=None matches every series (used by latest() for "any device")
+        series, metric = (_clean(series) if series else None), _clean(metric)
+        out = []
+        for day in _days_between(start, end):
+            for ts, s, m, value in self._scan(kind, day):
+                if m == metric and (series is None or s == series) and start <= ts < end:
+                    out.append((ts, s, value))
+        out.sort()
+        return out
+
+    def _rollup_day(self, kind, day):
+        path = self._path(kind, ROLLUP_DIR, day, 'json')
+        raw = self._path(kind, RAW_DIR, day, 'tsv')
+        # Taken before the scan: a point appended meanwhile makes the saved rollup stale, not wrong
+        raw_size = os.path.getsize(raw) if os.path.exists(raw) else 0
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            # Buffered uploads can still land in a closed day; recompute when the raw file grew
+            if saved.get('raw_size') == raw_size:
+                return saved['buckets']
+
+        buckets = {}
+        for ts, series, metric, value in self._scan(kind, day):
+            key = f'{series}\t{metric}\t{int(ts // 3600) * 3600}'
+            b = buckets.get(key)
+            if b is None:
+                buckets[key] = [1, value, value, value]
+            else:
+                b[0] += 1
+                b[1] += value
+                b[2] = min(b[2], value)
+                b[3] = max(b[3], value)
+
+        # Only closed days are final; today's rollup is recomputed each time
+        if buckets and day < _day(time.time()):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'raw_size': raw_size, 'buckets': buckets}, f)
+            os.replace(tmp, path)
+        return buckets
+
+    def rollup(self, kind, series, metric, start, end):
+        """Hourly buckets {ts, count, mean, min, max} for one series/metric."""
+        prefix = f'{_clean(series)}\t{_clean(metric)}\t'
+        out = []
+        for day in _days_between(start, end):
+            for key, (count, total, lo, hi) in self._rollup_day(kind, day).items():
+                if not key.startswith(prefix):
+                    continue
+                hour = int(key[len(prefix):])
+                if start <= hour < end:
+                    out.append({"ts": hour, "count": count, "mean": total / count, "min": lo, "max": hi})
+        out.sort(key=lambda b: b["ts"])
+        return out
+
+    def latest(self, kind, series, metric):
+        """(series, ts, value) of the newest point, or None. series=None means any series."""
+        series, metric = (_clean(series) if series else None), _clean(metric)
+        with self._lock:
+            cached = [
+                (point[0], key[1], point[1]) for key, point in self._latest.items()
+                if key[0] == kind and key[2] == metric and (series is None or key[1] == series)
+            ]
+        if cached:
+            ts, s, value = max(cached)
+            return s, ts, value
+        # Nothing ingested since startup: fall back to the recent raw partitions
+        now = time.time()
+        points = self._query(kind, series, metric, now - LATEST_LOOKBACK_DAYS * 86400, now + 1)
+        if not points:
+            return None
+        ts, s, value = points[-1]
+        with self._lock:
+            self._latest.setdefault((kind, s, metric), (ts, value))
+        return s, ts, value
@@ -0,0 +1,71 @@
+"""Compare two benchmark reports and fail on regressions.
+
+    python benchmarks/compare.py baseline.json candidate.json [--tolerance 0.15] [--min-ms 2]
+
+Latency percentiles may grow and throughput may drop by at most `tolerance`
+(relative). Latency changes smaller than `min-ms` are treated as noise.
+Exits with status 1 when any scenario regressed, so it can gate a deploy.
+"""
+import argparse
+import json
+import sys
+
+LATENCY_KEYS = ("p50", "p90", "p99")
+
+
+def load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(baseline, candidate, tolerance=0.15, min_ms=2.0):
+    """Yield (scenario, metric, old, new, change, regressed) for every shared metric."""
+    for scenario in sorted(set(baseline["results"]) & set(candidate["results"])):
+        old, new = baseline["results"][scenario], candidate["results"][scenario]
+        for key in LATENCY_KEYS:
+            a = (old.get("latency_ms") or {}).get(key)
+            b = (new.get("latency_ms") or {}).get(key)
+            if a is None or b is None:
+                continue
+            change = (b - a) / a if a else 0.0
+            yield scenario, f"{key}_ms", a, b, change, change > tolerance and (b - a) > min_ms
+        a, b = old.get("throughput_per_s"), new.get("throughput_per_s")
+        if a and b is not None:
+            change = (b - a) / a
+            yield scenario, "throughput_per_s", a, b, change, change < -tolerance
+        if new.get("errors", 0) > old.get("errors", 0):
+            yield scenario, "errors", old.get("errors", 0), new["errors"], 0.0, True
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("baseline")
+    p.add_argument("candidate")
+    p.add_argument("--tolerance", type=float, default=0.15)
+    p.add_argument("--min-ms", type=float, default=2.0)
+    args = p.parse_args(argv)
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    for key in ("python", "cpu_count"):
+        if baseline.get(key) != candidate.get(key):
+            print(f"⚠️ Reports differ in {key}: {baseline.get(key)} vs {candidate.get(key)}")
+    missing = sorted(set(baseline["results"]) - set(candidate["results"]))
+    if missing:
+        print(f"⚠️ Not in candidate: {', '.join(missing)}")
+
+    regressions = 0
+    print(f"{'scenario':32} {'metric':18} {'baseline':>12} {'candidate':>12} {'change':>8}")
+    for scenario, metric, a, b, change, regressed in compare(baseline, candidate, args.tolerance, args.min_ms):
+        regressions += regressed
+        flag = "  ❌" if regressed else ""
+        print(f"{scenario:32} {metric:18} {a:>12} {b:>12} {change:>+8.1%}{flag}")
+
+    if regressions:
+        print(f"\n❌ {regressions} regression(s) beyond {args.tolerance:.0%}")
+        return 1
+    print("\n✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
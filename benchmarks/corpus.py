@@ -0,0 +1,113 @@
+"""Synthetic agricultural documents for the ingestion and retrieval benchmarks."""
+import csv
+import os
+import random
+
+CROPS = ["wheat", "rice", "maize", "cotton", "sugarcane", "tomato", "onion", "potato", "chilli", "soybean"]
+PESTS = ["aphids", "stem borer", "whitefly", "leaf folder", "bollworm", "thrips", "fruit fly", "jassids"]
+DISEASES = ["blast", "rust", "leaf curl", "late blight", "wilt", "powdery mildew", "sheath blight"]
+INPUTS = ["urea", "DAP", "potash", "neem oil", "imidacloprid", "mancozeb", "zinc sulphate", "farmyard manure"]
+STATES = ["Punjab", "Maharashtra", "Karnataka", "Tamil Nadu", "Uttar Pradesh", "Gujarat"]
+
+# Manuals repeat boilerplate across documents; keep some of that in the corpus
+BOILERPLATE = (
+    "Safety: wear gloves and a mask while spraying, do not spray against the wind, "
+    "keep chemicals away from children and wash hands after handling. Follow the label dose."
+)
+
+
+def sentence(rng):
+    crop, pest, disease, product = rng.choice(CROPS), rng.choice(PESTS), rng.choice(DISEASES), rng.choice(INPUTS)
+    templates = [
+        f"For {crop}, apply {rng.randint(20, 120)} kg/ha of {product} at {rng.choice(['sowing', 'tillering', 'flowering'])}.",
+        f"{pest.capitalize()} damage in {crop} is controlled with {product} at {rng.randint(1, 5)} ml per litre.",
+        f"Symptoms of {disease} in {crop} include yellowing, lesions and reduced yield.",
+        f"Irrigate {crop} every {rng.randint(5, 15)} days during {rng.choice(['kharif', 'rabi', 'zaid'])} season.",
+        f"Soil testing before sowing {crop} helps decide the dose of {product}.",
+    ]
+    return rng.choice(templates)
+
+
+def page_text(rng, sentences=40):
+    lines = [sentence(rng) for _ in range(sentences)]
+    if rng.random() < 0.5:
+        lines.insert(rng.randrange(len(lines)), BOILERPLATE)
+    return " ".join(lines)
+
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages, line_chars=90):
+    """Write a minimal text PDF (Helvetica, one content stream per page)."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for text in pages:
+        words, lines, current = text.split(), [], ""
+        for word in words:
+            if len(current) + len(word) + 1 > line_chars:
+                lines.append(current)
+                current = word
+            else:
+                current = f"{current} {word}".strip()
+        lines.append(current)
+        ops = ["BT", "/F1 10 Tf", "12 TL", "40 800 Td"] + [f"({_pdf_escape(line)}) '" for line in lines[:64]] + ["ET"]
+        stream = "\n".join(ops)
+        objects.append(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+        content_id = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>")
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def make_corpus(root, pdfs=20, pages_per_pdf=5, csv_rows=2000, seed=0):
+    """Create data/raw_pdfs and data/raw_csvs under `root`; returns (pdf_dir, csv_dir)."""
+    rng = random.Random(seed)
+    pdf_dir = os.path.join(root, "raw_pdfs")
+    csv_dir = os.path.join(root, "raw_csvs")
+    os.makedirs(pdf_dir, exist_ok=True)
+    os.makedirs(csv_dir, exist_ok=True)
+
+    # Half of the manuals end with the same annex page, as real series of manuals do
+    annex = page_text(random.Random(seed + 2))
+    for i in range(pdfs):
+        pages = [page_text(rng) for _ in range(pages_per_pdf)]
+        if i % 2:
+            pages.append(annex)
+        write_pdf(os.path.join(pdf_dir, f"manual_{i:03d}.pdf"), pages)
+
+    with open(os.path.join(csv_dir, "mandi_prices.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["State", "Commodity", "Min Price", "Max Price", "Modal Price", "Arrival_Date"])
+        for _ in range(csv_rows):
+            low = rng.randint(800, 4000)
+            writer.writerow([rng.choice(STATES), rng.choice(CROPS), low, low + rng.randint(100, 900),
+                             low + rng.randint(50, 500), f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"])
+    return pdf_dir, csv_dir
+
+
+def queries(n, seed=0):
+    rng = random.Random(seed + 1)
+    asks = [
+        "How much {product} should I apply to {crop}?",
+        "How do I control {pest} in {crop}?",
+        "What are the symptoms of {disease} in {crop}?",
+        "How often should I irrigate {crop}?",
+    ]
+    return [rng.choice(asks).format(product=rng.choice(INPUTS), crop=rng.choice(CROPS),
+                                    pest=rng.choice(PESTS), disease=rng.choice(DISEASES))
+            for _ in range(n)]
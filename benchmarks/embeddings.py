@@ -0,0 +1,112 @@
+"""Micro-benchmark of the MiniLM embedding backends (rag/embedding_backends.py).
+
+    python benchmarks/embeddings.py --backends torch,onnx,onnx-int8 --out benchmarks/reports/embeddings.json
+
+For each backend: document throughput (800-character chunks, as ingested) and
+single-query latency. The first backend is the reference: the others report
+the cosine similarity of their vectors to it and how many of its top-k
+neighbours they retrieve for the same queries (overlap@k, 1.0 = identical
+results). The report has the same layout as run.py, so compare.py works on it.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import datetime
+import platform
+
+import numpy as np
+
+from corpus import page_text, queries
+from run import ROOT, RAG_DIR, git_commit, summarize
+
+
+def chunk_texts(n, seed, size=800):
+    rng = random.Random(seed)
+    texts = []
+    while len(texts) < n:
+        page = page_text(rng)
+        texts.extend(page[i:i + size] for i in range(0, len(page), size))
+    return texts[:n]
+
+
+def top_k(doc_vectors, query_vectors, k):
+    return np.argsort(-(query_vectors @ doc_vectors.T), axis=1)[:, :k]
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--backends", default="torch,onnx,onnx-int8")
+    p.add_argument("--documents", type=int, default=512)
+    p.add_argument("--queries", type=int, default=100)
+    p.add_argument("--top-k", type=int, default=4)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--out", default=os.path.join(ROOT, "benchmarks", "reports", "embeddings.json"))
+    args = p.parse_args(argv)
+
+    sys.path.insert(0, RAG_DIR)
+    from embedding_backends import get_embeddings
+
+    texts = chunk_texts(args.documents, args.seed)
+    asks = queries(args.queries, args.seed)
+    results, reference = {}, None
+
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        print(f"⏱️  {backend}...")
+        model = get_embeddings(backend)
+        model.embed_documents(texts[:32])  # warm up
+
+        start = time.perf_counter()
+        docs = np.asarray(model.embed_documents(texts), dtype=np.float32)
+        doc_s = time.perf_counter() - start
+
+        latencies, query_vectors = [], []
+        for q in asks:
+            start = time.perf_counter()
+            query_vectors.append(model.embed_query(q))
+            latencies.append(time.perf_counter() - start)
+        query_vectors = np.asarray(query_vectors, dtype=np.float32)
+
+        results[f"embeddings.{backend}.documents"] = summarize([], 0, doc_s, count=len(texts))
+        results[f"embeddings.{backend}.query"] = summarize(latencies, 0, sum(latencies))
+
+        neighbours = top_k(docs, query_vectors, args.top_k)
+        if reference is None:
+            reference = (backend, docs, neighbours)
+        else:
+            cosine = (docs * reference[1]).sum(axis=1)
+            overlap = np.mean([len(set(a) & set(b)) / args.top_k for a, b in zip(neighbours, reference[2])])
+            results[f"embeddings.{backend}.documents"]["agreement"] = {
+                "reference": reference[0],
+                "cosine_mean": round(float(cosine.mean()), 5),
+                "cosine_min": round(float(cosine.min()), 5),
+                f"overlap_at_{args.top_k}": round(float(overlap), 4),
+            }
+
+        summary = results[f"embeddings.{backend}.documents"]
+        print(f"   - {summary['throughput_per_s']} chunks/s, query p50 "
+              f"{results[f'embeddings.{backend}.query']['latency_ms']['p50']:.2f} ms"
+              + (f", agreement {summary['agreement']}" if "agreement" in summary else ""))
+
+    report = {
+        "schema": 1,
+        "name": "embeddings",
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": vars(args),
+        "suites": {},
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"✅ Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Local stand-ins for the external services the app talks to.
+
+Each fake sleeps for a configurable, seeded latency so benchmark runs are
+repeatable offline and measure our code rather than Gemini's or Google's.
+"""
+import asyncio
+import hashlib
+import random
+import threading
+import time
+
+import numpy as np
+
+
+class Latency:
+    """Seeded latency source: `mean` seconds +/- uniform `jitter`."""
+
+    def __init__(self, mean=0.0, jitter=0.0, seed=0):
+        self.mean = mean
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            offset = self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        return max(0.0, self.mean + offset)
+
+    def sleep(self):
+        delay = self.next()
+        if delay:
+            time.sleep(delay)
+
+    async def sleep_async(self):
+        delay = self.next()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+# --- GEMINI ---
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """Drop-in for genai.GenerativeModel. Configure the class before use."""
+
+    latency = Latency()
+    reply_chars = 600
+    calls = 0
+
+    def __init__(self, model_name=None, **kwargs):
+        self.model_name = model_name
+
+    @classmethod
+    def _reply(cls, contents):
+        FakeGenerativeModel.calls += 1
+        prompt = contents if isinstance(contents, str) else next((c for c in contents if isinstance(c, str)), "")
+        seed = hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+        text = f"Advice for {seed[:8]}: check soil moisture, scout for pests and apply balanced NPK. "
+        return FakeResponse((text * (cls.reply_chars // len(text) + 1))[:cls.reply_chars])
+
+    def generate_content(self, contents, **kwargs):
+        self.latency.sleep()
+        return self._reply(contents)
+
+    async def generate_content_async(self, contents, **kwargs):
+        await self.latency.sleep_async()
+        return self._reply(contents)
+
+
+# --- TEXT TO SPEECH ---
+class FakeTTS:
+    """Drop-in for gTTS: sleeps, then writes ~1 KB of fake MP3 per 100 characters."""
+
+    latency = Latency()
+
+    def __init__(self, text, lang="en", slow=False, **kwargs):
+        self.text = text
+
+    def write_to_fp(self, fp):
+        self.latency.sleep()
+        fp.write(b"\xff\xfb" * (5 * len(self.text) + 64))
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            self.write_to_fp(f)
+
+
+# --- MONGODB ---
+class SlowCollection:
+    """Wraps a (mongomock) collection and adds a round-trip delay to each query."""
+
+    QUERY_METHODS = {"find_one", "insert_one", "update_one", "delete_one", "count_documents"}
+
+    def __init__(self, collection, latency):
+        self._collection = collection
+        self._latency = latency
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name not in self.QUERY_METHODS:
+            return attr
+
+        def call(*args, **kwargs):
+            self._latency.sleep()
+            return attr(*args, **kwargs)
+        return call
+
+
+# --- EMBEDDINGS ---
+class FakeEmbeddings:
+    """LangChain-compatible embeddings: deterministic hashed bag-of-words vectors.
+
+    Similar texts get similar vectors, so retrieval over a Chroma store built
+    with these still returns sensible neighbours. `latency` is paid per text.
+    """
+
+    def __init__(self, dim=384, latency=None):
+        self.dim = dim
+        self.latency = latency or Latency()
+
+    def _embed(self, text):
+        self.latency.sleep()
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            h = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[h % self.dim] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
@@ -0,0 +1,403 @@
+"""Offline benchmark suite for CropSense AI.
+
+Runs the hot paths against local stand-ins (see fakes.py) and writes a JSON
+report that compare.py can diff against a baseline:
+
+    python benchmarks/run.py --out benchmarks/reports/baseline.json
+    python benchmarks/run.py --suites chat,predict_price --llm-latency 0.8 --out new.json
+    python benchmarks/compare.py benchmarks/reports/baseline.json new.json
+
+Suites:
+    predict_price  single-row and batch price prediction through Flask
+    chat           /api/chat text and image requests (fake Gemini + gTTS;
+                   --rag adds knowledge base retrieval)
+    auth           register/login (mongomock with added round-trip latency)
+    ingest         rag/ingest.py stages on synthetic PDFs and CSVs
+    retrieval      similarity search on the vector DB the ingest suite built
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from corpus import make_corpus, queries
+from fakes import FakeEmbeddings, FakeGenerativeModel, FakeTTS, Latency, SlowCollection
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT, "app")
+RAG_DIR = os.path.join(ROOT, "rag")
+SUITES = ["predict_price", "chat", "auth", "ingest", "retrieval"]
+REPORT_SCHEMA = 1
+
+
+# --- MEASUREMENT ---
+def summarize(latencies, errors, wall_s, count=None):
+    count = len(latencies) if count is None else count
+    result = {
+        "count": count,
+        "errors": errors,
+        "wall_s": round(wall_s, 4),
+        "throughput_per_s": round(count / wall_s, 2) if wall_s else None,
+    }
+    if latencies:
+        ms = np.asarray(latencies) * 1000.0
+        result["latency_ms"] = {
+            "mean": round(float(ms.mean()), 3),
+            "p50": round(float(np.percentile(ms, 50)), 3),
+            "p90": round(float(np.percentile(ms, 90)), 3),
+            "p99": round(float(np.percentile(ms, 99)), 3),
+            "max": round(float(ms.max()), 3),
+        }
+    return result
+
+
+def run_load(call, payloads, concurrency, warmup=0):
+    """Call `call(payload) -> ok` for every payload from `concurrency` threads.
+
+    The first `warmup` payloads are sent beforehand and not recorded, so lazy
+    initialisation (thread-local rows, clients, imports) does not skew the tail.
+    """
+    payloads = list(payloads)
+    for payload in payloads[:warmup]:
+        call(payload)
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(payload):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            ok = call(payload)
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, payloads))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    value = fn(*args)
+    return value, time.perf_counter() - start
+
+
+# --- APP UNDER TEST ---
+def load_app(args, workdir):
+    """Import app/app.py wired to the fakes instead of Gemini, gTTS and MongoDB."""
+    os.environ.update({
+        "MONGO_URI": "mongomock://",
+        "GOOGLE_API_KEY": "benchmark-fake-key",
+        "SECRET_KEY": "benchmark",
+        "CHAT_RATE_PER_MINUTE": "1000000",
+        "CHAT_RATE_BURST": "1000000",
+        "TIMESERIES_DIR": os.path.join(workdir, "timeseries"),
+        "QUERY_TRANSLATION_CACHE": os.path.join(workdir, "translations.sqlite"),
+        "RAG_INDEX_DIR": os.path.join(workdir, "rag_index"),
+        "QUERY_TRANSLATOR": "none",  # offline: no opus-mt download when --rag loads the knowledge base
+    })
+    os.environ.pop("RATE_LIMIT_DB", None)
+    os.environ.pop("PROFILE_DIR", None)
+    # Knowledge base retrieval in chat only runs with --rag, against a synthetic store
+    os.environ["RAG_ENABLED"] = "0"
+    if args.rag:
+        os.environ["RAG_CHROMA_DIR"] = build_rag_store(args, workdir)
+    sys.path.insert(0, APP_DIR)
+    import app as core
+
+    if args.rag:
+        import retriever
+        retriever.get_embeddings = lambda: embeddings_for(args)
+        core.knowledge_base.start()
+        while not core.knowledge_base.ready and core.knowledge_base.load_error is None:
+            time.sleep(0.05)
+
+    FakeGenerativeModel.latency = Latency(args.llm_latency, args.llm_jitter, args.seed)
+    FakeTTS.latency = Latency(args.tts_latency, args.tts_latency / 4, args.seed + 1)
+    core.genai.GenerativeModel = FakeGenerativeModel
+    core.gTTS = FakeTTS
+    if core.users_collection is not None:
+        core.users_collection = SlowCollection(core.users_collection, Latency(args.mongo_latency, 0, args.seed + 2))
+    core.TEMP_DIR = os.path.join(workdir, "audio")
+    os.makedirs(core.TEMP_DIR, exist_ok=True)
+    return core
+
+
+def client_factory(core, user=None):
+    """One Flask test client per worker thread, optionally logged in."""
+    local = threading.local()
+
+    def get():
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = core.app.test_client()
+            if user:
+                with client.session_transaction() as s:
+                    s["user"] = user
+        return client
+    return get
+
+
+# --- SUITES ---
+def price_rows(core, n, distinct, seed):
+    rng = random.Random(seed)
+    bundle = core.price_registry.active
+    categories = (bundle.categories if bundle else None) or {}
+    fallback = {
+        "State": ["Punjab", "Maharashtra", "Karnataka"], "District": ["Ludhiana", "Pune", "Mysore"],
+        "Market": ["Khanna", "Pune", "Mysore"], "Commodity": ["Wheat", "Onion", "Tomato"],
+        "Variety": ["Other", "Local", "Hybrid"], "Grade": ["FAQ", "Medium"],
+    }
+    pool = []
+    for _ in range(max(1, distinct)):
+        row = {col: rng.choice(categories.get(col) or fallback[col]) for col in fallback}
+        low = rng.randint(800, 4000)
+        row.update({"Min_Price": low, "Max_Price": low + rng.randint(100, 900),
+                    "Current_Price": low + rng.randint(50, 500),
+                    "Date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"})
+        pool.append(row)
+    return [rng.choice(pool) for _ in range(n)]
+
+
+def suite_predict_price(core, args, workdir):
+    if core.price_registry.active is None:
+        return {"skipped": "no price model found"}
+    client = client_factory(core)
+    results = {}
+
+    core.prediction_cache.invalidate()
+    rows = price_rows(core, args.requests, args.price_distinct, args.seed)
+    results["single"] = run_load(
+        lambda row: client().post("/api/predict_price", json=row).status_code == 200, rows, args.concurrency, args.warmup)
+    results["single"]["cache"] = core.prediction_cache.stats()
+
+    batch = price_rows(core, args.batch_rows, args.batch_rows, args.seed + 1)
+
+    def post_batch(_):
+        response = client().post("/api/predict_price/batch", json=batch)
+        body = response.get_data()  # drain the stream
+        return response.status_code == 200 and body.count(b"\n") == len(batch)
+    results["batch"] = run_load(post_batch, range(args.batch_requests), 1, warmup=1)
+    results["batch"]["rows_per_s"] = round(args.batch_rows * args.batch_requests / results["batch"]["wall_s"], 1)
+    return results
+
+
+def suite_chat(core, args, workdir):
+    client = client_factory(core, user="benchmark")
+    rng = random.Random(args.seed)
+    prompts = queries(args.requests, args.seed)
+
+    def post_text(prompt):
+        response = client().post("/api/chat", data={"prompt": prompt, "lang": "en"})
+        return response.status_code == 200
+
+    def jpeg(i):
+        from PIL import Image
+        # Distinct noise images so every request misses the diagnosis cache
+        pixels = np.random.default_rng(args.seed + i).integers(0, 255, (224, 224, 3), dtype=np.uint8)
+        buf = io.BytesIO()
+        Image.fromarray(pixels).save(buf, format="JPEG", quality=85)
+        return buf.getvalue()
+
+    images = [jpeg(i) for i in range(max(1, args.requests // 4))]
+
+    def post_image(i):
+        data = {"prompt": rng.choice(prompts), "lang": "en", "image": (io.BytesIO(images[i]), "leaf.jpg")}
+        response = client().post("/api/chat", data=data, content_type="multipart/form-data")
+        return response.status_code == 200
+
+    results = {}
+    results["text"] = run_load(post_text, prompts, args.concurrency, args.warmup)
+    calls = FakeGenerativeModel.calls
+    results["image"] = run_load(post_image, range(len(images)), args.concurrency)
+    results["image"]["llm_calls"] = FakeGenerativeModel.calls - calls
+    if args.rag:
+        results["text"]["rag"] = core.knowledge_base.stats()["outcomes"]
+    return results
+
+
+def suite_auth(core, args, workdir):
+    if core.users_collection is None:
+        return {"skipped": "mongomock is not installed"}
+    client = client_factory(core)
+    n = args.auth_users
+    users = [(f"bench_{args.seed}_{i}", f"pw-{i}-secret") for i in range(n)]
+    results = {
+        "register": run_load(lambda u: client().post("/auth/register", data={"username": u[0], "password": u[1]}).status_code == 200,
+                             users, args.concurrency),
+        "login": run_load(lambda u: client().post("/auth/login", data={"username": u[0], "password": u[1]}).status_code == 200,
+                          users, args.concurrency),
+    }
+    return results
+
+
+def embeddings_for(args):
+    if args.real_embeddings:
+        import ingest
+        return ingest.get_embeddings()
+    return FakeEmbeddings(latency=Latency(args.embed_latency, 0, args.seed))
+
+
+def build_rag_store(args, workdir):
+    sys.path.insert(0, RAG_DIR)
+    import ingest
+    pdf_dir, csv_dir = make_corpus(os.path.join(workdir, "rag_corpus"), args.pdfs, args.pages, 0, args.seed)
+    persist_dir = os.path.join(workdir, "rag_db")
+    chunks, _ = ingest.remove_near_duplicates(ingest.split_documents(ingest.load_pdfs(pdf_dir)))
+    ingest.store_chunks(chunks, embeddings_for(args), persist_dir)
+    return persist_dir
+
+
+def suite_ingest(args, workdir):
+    try:
+        sys.path.insert(0, RAG_DIR)
+        import ingest
+    except ImportError as e:
+        return {"skipped": f"RAG dependencies missing: {e}"}
+
+    corpus_dir = os.path.join(workdir, "corpus")
+    pdf_dir, csv_dir = make_corpus(corpus_dir, args.pdfs, args.pages, args.csv_rows, args.seed)
+    persist_dir = os.path.join(workdir, "chroma_db")
+    embeddings = embeddings_for(args)
+
+    pdf_docs, pdf_s = timed(ingest.load_pdfs, pdf_dir)
+    csv_docs, csv_s = timed(ingest.load_csvs, csv_dir)
+    chunks, split_s = timed(ingest.split_documents, pdf_docs + csv_docs)
+    split_count = len(chunks)
+    (chunks, removed), dedup_s = timed(ingest.remove_near_duplicates, chunks)
+    _, store_s = timed(ingest.store_chunks, chunks, embeddings, persist_dir)
+
+    args.persist_dir = persist_dir
+    total = pdf_s + csv_s + split_s + dedup_s + store_s
+    return {
+        "load_pdfs": summarize([], 0, pdf_s, count=len(pdf_docs)),
+        "load_csvs": summarize([], 0, csv_s, count=len(csv_docs)),
+        "split": summarize([], 0, split_s, count=split_count),
+        "dedup": dict(summarize([], 0, dedup_s, count=split_count), removed=removed),
+        "embed_and_store": summarize([], 0, store_s, count=len(chunks)),
+        "total": dict(summarize([], 0, total, count=len(chunks)), documents=len(pdf_docs) + len(csv_docs)),
+    }
+
+
+def suite_retrieval(args, workdir):
+    persist_dir = getattr(args, "persist_dir", None)
+    if persist_dir is None:
+        return {"skipped": "needs the ingest suite in the same run"}
+    try:
+        import retriever
+    except ImportError as e:
+        return {"skipped": f"RAG dependencies missing: {e}"}
+
+    store = retriever.load_vectorstore(persist_dir, embeddings_for(args))
+    search = lambda q: len(store.similarity_search(q, k=args.top_k)) > 0
+    return {"similarity_search": run_load(search, queries(args.requests, args.seed), args.concurrency, args.warmup)}
+
+
+# --- REPORT ---
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--suites", default=",".join(SUITES), help="comma separated, default: all")
+    p.add_argument("--out", default=os.path.join(ROOT, "benchmarks", "reports", "latest.json"))
+    p.add_argument("--name", default=None, help="label stored in the report")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--requests", type=int, default=200, help="requests per load scenario")
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--warmup", type=int, default=10, help="unrecorded requests before each load scenario")
+    p.add_argument("--llm-latency", type=float, default=0.5, help="fake Gemini latency, seconds")
+    p.add_argument("--llm-jitter", type=float, default=0.1)
+    p.add_argument("--tts-latency", type=float, default=0.2, help="fake gTTS latency, seconds")
+    p.add_argument("--mongo-latency", type=float, default=0.002, help="added per Mongo query, seconds")
+    p.add_argument("--embed-latency", type=float, default=0.0, help="fake embedding latency per text, seconds")
+    p.add_argument("--rag", action="store_true", help="chat retrieves from a synthetic knowledge base")
+    p.add_argument("--real-embeddings", action="store_true", help="use MiniLM instead of fake embeddings")
+    p.add_argument("--price-distinct", type=int, default=50, help="distinct rows in the single-prediction mix")
+    p.add_argument("--batch-rows", type=int, default=5000)
+    p.add_argument("--batch-requests", type=int, default=5)
+    p.add_argument("--auth-users", type=int, default=20)
+    p.add_argument("--pdfs", type=int, default=20)
+    p.add_argument("--pages", type=int, default=5)
+    p.add_argument("--csv-rows", type=int, default=2000)
+    p.add_argument("--top-k", type=int, default=4)
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    suites = [s.strip() for s in args.suites.split(",") if s.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        raise SystemExit(f"Unknown suites: {', '.join(sorted(unknown))}")
+
+    config = dict(vars(args))
+    workdir = tempfile.mkdtemp(prefix="cropsense-bench-")
+    results, suite_info = {}, {}
+    try:
+        core = load_app(args, workdir) if {"predict_price", "chat", "auth"} & set(suites) else None
+        # ingest runs before retrieval, which searches the store it built
+        for name in SUITES:
+            if name not in suites:
+                continue
+            print(f"⏱️  Running {name}...")
+            if name in ("ingest", "retrieval"):
+                outcome = globals()[f"suite_{name}"](args, workdir)
+            else:
+                outcome = globals()[f"suite_{name}"](core, args, workdir)
+            if "skipped" in outcome:
+                print(f"   ⚠️ skipped: {outcome['skipped']}")
+                suite_info[name] = outcome
+                continue
+            for scenario, summary in outcome.items():
+                results[f"{name}.{scenario}"] = summary
+                lat = summary.get("latency_ms")
+                detail = f"p50 {lat['p50']:.1f} ms, p99 {lat['p99']:.1f} ms, " if lat else ""
+                print(f"   - {scenario}: {detail}{summary['throughput_per_s']}/s, {summary['errors']} errors")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "schema": REPORT_SCHEMA,
+        "name": args.name,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": config,
+        "suites": suite_info,
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"✅ Report written to {args.out}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Near-duplicate chunk elimination for ingestion (MinHash + LSH).
+
+Manuals repeat the same safety and dosage paragraphs across many PDFs. Before
+embedding, every chunk gets a MinHash signature over its word shingles;
+locality-sensitive hashing on signature bands finds candidate pairs, and a
+chunk whose estimated Jaccard similarity to an already kept chunk reaches the
+threshold is dropped. The kept (canonical) chunk records where its copies came
+from. Paragraphs that differ in any number ("2 ml" vs "5 ml") are never merged.
+
+Incremental builds (watch.py) pass the signatures of the chunks already in the
+index as `known`, saved next to the build with save_signatures(), so a new
+advisory repeating a stored paragraph is dropped too.
+"""
+import re
+import zlib
+
+import numpy as np
+
+NUM_PERM = 128
+BANDS = 16          # 16 bands x 8 rows: candidates from ~0.7 Jaccard upwards
+SHINGLE_WORDS = 5
+THRESHOLD = 0.85
+
+_PRIME = np.uint64(4294967291)  # largest prime below 2**32
+_WORD = re.compile(r"\w+", re.UNICODE)
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)?")
+
+
+def _permutations(num_perm, seed=1):
+    rng = np.random.RandomState(seed)
+    # a, b < 2**31 and shingle hashes < 2**32 keep a*h + b inside uint64
+    a = rng.randint(1, 2 ** 31, size=num_perm).astype(np.uint64)
+    b = rng.randint(0, 2 ** 31, size=num_perm).astype(np.uint64)
+    return a, b
+
+
+def shingles(text, size=SHINGLE_WORDS):
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        self.num_perm = num_perm
+        self.a, self.b = _permutations(num_perm, seed)
+
+    def signature(self, text):
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles(text)), dtype=np.uint64)
+        # (num_perm, n_shingles) -> minimum per permutation
+        return ((np.outer(self.a, hashes) + self.b[:, None]) % _PRIME).min(axis=1)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of the two shingle sets."""
+    return float(np.count_nonzero(sig_a == sig_b)) / len(sig_a)
+
+
+class NearDuplicateIndex:
+    """LSH index over kept signatures; `find(sig)` returns the best match or None."""
+
+    def __init__(self, num_perm=NUM_PERM, bands=BANDS, threshold=THRESHOLD):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.rows = num_perm // bands
+        self.bands = bands
+        self.threshold = threshold
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = []
+
+    def _band_keys(self, sig):
+        return [sig[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def find(self, sig, accept=None):
+        candidates = set()
+        for bucket, key in zip(self._buckets, self._band_keys(sig)):
+            candidates.update(bucket.get(key, ()))
+        best, best_sim = None, self.threshold
+        for item in candidates:
+            sim = similarity(sig, self._signatures[item])
+            if sim >= best_sim and (accept is None or accept(item)):
+                best, best_sim = item, sim
+        return best
+
+    def add(self, sig):
+        item = len(self._signatures)
+        self._signatures.append(sig)
+        for bucket, key in zip(self._buckets, self._band_keys(sig)):
+            bucket.setdefault(key, []).append(item)
+        return item
+
+
+def _origin(meta):
+    source = str(meta.get("source", "unknown"))
+    if meta.get("page") is not None:
+        return f"{source} p.{int(meta['page']) + 1}"
+    return source
+
+
+def deduplicate_chunks(chunks, threshold=THRESHOLD, skip_types=("csv",), known=None):
+    """Drop near-duplicate chunks, keeping the first copy as canonical.
+
+    Returns (kept_chunks, removed_count). Canonical chunks that absorbed
+    copies get `duplicate_count` and a `sources` string listing every origin
+    (Chroma metadata must be scalar). Chunks whose metadata type is in
+    `skip_types` (CSV rows: distinct facts that look alike) are kept as is.
+
+    `known` is a list of (signature, numbers) for chunks stored earlier: a
+    copy of one of them is dropped (its stored metadata is left as is), and
+    the chunks kept here are appended to it.
+    """
+    hasher = MinHasher()
+    index = NearDuplicateIndex(threshold=threshold)
+    canonical = []  # index item -> (chunk or None when already stored, numbers)
+    for sig, numbers in known or ():
+        index.add(sig)
+        canonical.append((None, numbers))
+    kept, removed = [], 0
+
+    for chunk in chunks:
+        if (chunk.metadata or {}).get("type") in skip_types or not chunk.page_content.strip():
+            kept.append(chunk)
+            continue
+        sig = hasher.signature(chunk.page_content)
+        numbers = sorted(_NUMBER.findall(chunk.page_content))
+        match = index.find(sig, accept=lambda item: canonical[item][1] == numbers)
+        if match is None:
+            index.add(sig)
+            canonical.append((chunk, numbers))
+            kept.append(chunk)
+            if known is not None:
+                known.append((sig, numbers))
+            continue
+
+        original = canonical[match][0]
+        removed += 1
+        if original is None:  # stored by an earlier build
+            continue
+        meta = original.metadata
+        origins = meta.get("sources") or _origin(meta)
+        meta["sources"] = f"{origins}; {_origin(chunk.metadata or {})}"
+        meta["duplicate_count"] = int(meta.get("duplicate_count", 0)) + 1
+
+    return kept, removed
+
+
+def save_signatures(path, known):
+    """Write deduplicate_chunks' `known` list to an .npz file."""
+    signatures = np.array([sig for sig, _ in known], dtype=np.uint64).reshape(len(known), NUM_PERM)
+    numbers = np.array([" ".join(nums) for _, nums in known], dtype=str)
+    with open(path, "wb") as f:
+        np.savez_compressed(f, signatures=signatures, numbers=numbers)
+
+
+def load_signatures(path):
+    """The `known` list saved by save_signatures(), or None when there is none."""
+    try:
+        with np.load(path) as data:
+            return [(sig, nums.split()) for sig, nums in zip(data["signatures"], data["numbers"])]
+    except FileNotFoundError:
+        return None
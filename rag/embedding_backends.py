@@ -0,0 +1,120 @@
+"""Embedding backends for all-MiniLM-L6-v2, shared by ingestion and retrieval.
+
+EMBEDDING_BACKEND selects how the model runs on CPU:
+    torch      sentence-transformers through HuggingFaceEmbeddings (default)
+    onnx       the same weights exported to ONNX Runtime
+    onnx-int8  ONNX with int8 dynamic quantization of the linear layers
+
+The ONNX files are exported on first use (needs torch + transformers once) into
+EMBEDDING_ONNX_DIR, or ahead of time with `python rag/embedding_backends.py`.
+All backends produce the same mean-pooled, L2-normalised 384-d vectors, so an
+index built with one can be queried with another;
+benchmarks/embeddings.py measures their speed and retrieval agreement.
+"""
+import os
+import inspect
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+MAX_LENGTH = 256  # max_seq_length of the sentence-transformers model
+BACKENDS = ("torch", "onnx", "onnx-int8")
+ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "data", "models", "all-MiniLM-L6-v2-onnx"))
+
+
+def export_onnx(out_dir=ONNX_DIR, model_name=EMBEDDING_MODEL):
+    """Write model.onnx, its int8 copy model.int8.onnx and the tokenizer to `out_dir`."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    class Encoder(torch.nn.Module):
+        # Keyword call: positional order of forward() differs across transformers versions
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask,
+                              token_type_ids=token_type_ids).last_hidden_state
+
+    sample = tokenizer(["an example sentence about wheat"], return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    # Newer torch defaults to the dynamo exporter; the classic one handles BERT fine
+    kwargs = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    with torch.no_grad():
+        torch.onnx.export(
+            Encoder(model), tuple(sample[name] for name in names), fp32_path,
+            input_names=names, output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in names + ["last_hidden_state"]},
+            opset_version=14, **kwargs,
+        )
+    quantize_dynamic(fp32_path, os.path.join(out_dir, "model.int8.onnx"), weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(out_dir)
+    return out_dir
+
+
+class OnnxEmbeddings(Embeddings):
+    """MiniLM on ONNX Runtime with sentence-transformers' mean pooling + normalisation."""
+
+    def __init__(self, model_dir=ONNX_DIR, quantized=True, batch_size=32, threads=None):
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        path = os.path.join(model_dir, "model.int8.onnx" if quantized else "model.onnx")
+        if not os.path.exists(path):
+            print(f"🧠 Exporting {EMBEDDING_MODEL} to ONNX in {model_dir}...")
+            export_onnx(model_dir)
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.batch_size = batch_size
+
+    def _encode(self, texts):
+        enc = self.tokenizer(texts, padding=True, truncation=True, max_length=MAX_LENGTH, return_tensors="np")
+        feeds = {name: value.astype(np.int64) for name, value in enc.items() if name in self.input_names}
+        hidden = self.session.run(None, feeds)[0]
+        mask = enc["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        # Batches of similar length waste less time on padding; output keeps input order
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._encode([texts[i] for i in batch])):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text):
+        return self._encode([text])[0].tolist()
+
+
+def get_embeddings(backend=None):
+    backend = backend or os.getenv("EMBEDDING_BACKEND", "torch")
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    if backend in ("onnx", "onnx-int8"):
+        threads = int(os.getenv("EMBEDDING_THREADS", "0")) or None
+        return OnnxEmbeddings(quantized=backend == "onnx-int8", threads=threads)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r}, expected one of {', '.join(BACKENDS)}")
+
+
+if __name__ == "__main__":
+    print(f"✅ ONNX model written to {export_onnx()}")
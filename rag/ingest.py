@@ -1,15 +1,15 @@
 import os
 import pandas as pd
-from PIL import Image
-import pytesseract
 
 # LangChain Imports
-from langchain_community.document_loaders import PyPDFLoader
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
 
+from dedup import THRESHOLD as DEDUP_THRESHOLD, deduplicate_chunks
+from ocr import SmartOcr
+from embedding_backends import EMBEDDING_MODEL, get_embeddings
+
 
 # -------- CONFIG --------
 # Define directories for different data types
@@ -18,110 +18,153 @@ PDF_DIR = os.path.join(DATA_DIR, "raw_pdfs")
 CSV_DIR = os.path.join(DATA_DIR, "raw_csvs")
 IMAGE_DIR = os.path.join(DATA_DIR, "raw_images") # New directory for plant images
 CHROMA_DIR = os.path.join(DATA_DIR, "chroma_db")
+OCR_CACHE_DIR = os.path.join(DATA_DIR, "ocr_cache")
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tiff', '.bmp')
+
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 150
+
+# Scanned pages are OCRed in a process pool (OCR_WORKERS, default: all cores).
+# OCR_LANGS fixes the Tesseract languages, e.g. "hin+eng"; otherwise they are
+# detected per document.
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "0")) or None
+OCR_LANGS = os.getenv("OCR_LANGS") or None
 
-documents = []
+# Each stage is a function so benchmarks/ can time them on synthetic data and
+# watch.py can ingest only new files (`files`: names inside the directory);
+# running this file still performs the full ingestion.
+
+def get_ocr():
+    return SmartOcr(OCR_CACHE_DIR, workers=OCR_WORKERS, langs=OCR_LANGS)
 
 # =========================================================
-# 1️⃣ LOAD PDFs (Text-based)
+# 1️⃣ LOAD PDFs (text layer, OCR for scanned pages)
 # =========================================================
-if os.path.exists(PDF_DIR):
-    print(f"📂 Scanning PDF directory: {PDF_DIR}")
-    for file in os.listdir(PDF_DIR):
-        if file.endswith(".pdf"):
-            try:
-                loader = PyPDFLoader(os.path.join(PDF_DIR, file))
-                docs = loader.load()
-                documents.extend(docs)
-                print(f"   - Loaded: {file}")
-            except Exception as e:
-                print(f"   ❌ Error loading {file}: {e}")
+def load_pdfs(pdf_dir=PDF_DIR, ocr=None, files=None):
+    documents = []
+    if os.path.exists(pdf_dir):
+        print(f"📂 Scanning PDF directory: {pdf_dir}")
+        if files is None:
+            files = sorted(f for f in os.listdir(pdf_dir) if f.endswith(".pdf"))
+        pages = (ocr or get_ocr()).load_pdfs([os.path.join(pdf_dir, f) for f in files])
+        counts = {}
+        for path, index, text, scanned in pages:
+            total, ocred = counts.get(path, (0, 0))
+            counts[path] = (total + 1, ocred + scanned)
+            if text.strip():
+                metadata = {"source": path, "page": index}
+                if scanned:
+                    metadata["ocr"] = True
+                documents.append(Document(page_content=text, metadata=metadata))
+        for path, (total, ocred) in counts.items():
+            note = f" ({ocred}/{total} pages OCR)" if ocred else ""
+            print(f"   - Loaded: {os.path.basename(path)}{note}")
+    return documents
 
 # =========================================================
 # 2️⃣ LOAD CSV FILES (Structured Data)
 # =========================================================
-if os.path.exists(CSV_DIR):
-    print(f"📂 Scanning CSV directory: {CSV_DIR}")
-    for file in os.listdir(CSV_DIR):
-        if file.endswith(".csv"):
-            try:
-                df = pd.read_csv(os.path.join(CSV_DIR, file))
-                # Convert each row into a readable text format
-                for _, row in df.iterrows():
-                    # Handle potential NaN values
-                    clean_row = {k: (v if pd.notna(v) else "N/A") for k, v in row.items()}
-                    text = ", ".join([f"{col}: {val}" for col, val in clean_row.items()])
-                    
-                    documents.append(Document(
-                        page_content=text,
-                        metadata={"source": file, "type": "csv"}
-                    ))
-                print(f"   - Loaded: {file}")
-            except Exception as e:
-                print(f"   ❌ Error loading {file}: {e}")
+def load_csvs(csv_dir=CSV_DIR, files=None):
+    documents = []
+    if os.path.exists(csv_dir):
+        print(f"📂 Scanning CSV directory: {csv_dir}")
+        for file in (os.listdir(csv_dir) if files is None else files):
+            if file.endswith(".csv"):
+                try:
+                    df = pd.read_csv(os.path.join(csv_dir, file))
+                    # Convert each row into a readable text format
+                    for _, row in df.iterrows():
+                        # Handle potential NaN values
+                        clean_row = {k: (v if pd.notna(v) else "N/A") for k, v in row.items()}
+                        text = ", ".join([f"{col}: {val}" for col, val in clean_row.items()])
+
+                        documents.append(Document(
+                            page_content=text,
+                            metadata={"source": file, "type": "csv"}
+                        ))
+                    print(f"   - Loaded: {file}")
+                except Exception as e:
+                    print(f"   ❌ Error loading {file}: {e}")
+    return documents
 
 # =========================================================
 # 3️⃣ LOAD IMAGES (OCR for Plant Disease Data)
 # =========================================================
-# This section was missing in your original code
-if os.path.exists(IMAGE_DIR):
-    print(f"📂 Scanning Image directory: {IMAGE_DIR}")
-    for file in os.listdir(IMAGE_DIR):
-        if file.lower().endswith(('.png', '.jpg', '.jpeg', '.tiff', '.bmp')):
-            try:
-                image_path = os.path.join(IMAGE_DIR, file)
-                image = Image.open(image_path)
-                
-                # Extract text from image using Tesseract OCR
-                extracted_text = pytesseract.image_to_string(image)
-                
-                if extracted_text.strip():
-                    documents.append(Document(
-                        page_content=extracted_text,
-                        metadata={"source": file, "type": "image"}
-                    ))
-                    print(f"   - OCR Scanned: {file}")
-                else:
-                    print(f"   ⚠️ No text found in: {file}")
-                    
-            except Exception as e:
-                print(f"   ❌ Error processing image {file}: {e}")
-
-print(f"\n📄 Total documents loaded: {len(documents)}")
-
-if not documents:
-    print("⚠️ No documents found! Check your data directories.")
-    exit()
+def load_images(image_dir=IMAGE_DIR, ocr=None, files=None):
+    documents = []
+    if os.path.exists(image_dir):
+        print(f"📂 Scanning Image directory: {image_dir}")
+        if files is None:
+            files = [f for f in os.listdir(image_dir) if f.lower().endswith(IMAGE_EXTENSIONS)]
+        # Same preprocessing, process pool and cache as scanned PDF pages
+        for path, text in (ocr or get_ocr()).load_images([os.path.join(image_dir, f) for f in files]):
+            file = os.path.basename(path)
+            if text.strip():
+                documents.append(Document(
+                    page_content=text,
+                    metadata={"source": file, "type": "image"}
+                ))
+                print(f"   - OCR Scanned: {file}")
+            else:
+                print(f"   ⚠️ No text found in: {file}")
+    return documents
 
 # =========================================================
 # 4️⃣ CHUNKING
 # =========================================================
-splitter = RecursiveCharacterTextSplitter(
-    chunk_size=800,
-    chunk_overlap=150,
-)
-
-chunks = splitter.split_documents(documents)
-
-print(f"🔹 Total chunks created: {len(chunks)}")
+def split_documents(documents):
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+    )
+    return splitter.split_documents(documents)
 
+def remove_near_duplicates(chunks, threshold=DEDUP_THRESHOLD, known=None):
+    # Repeated boilerplate is embedded and stored once (see dedup.py)
+    return deduplicate_chunks(chunks, threshold, known=known)
 
 # =========================================================
 # 5️⃣ EMBEDDINGS
 # =========================================================
-print("🧠 Generating Embeddings...")
-embeddings = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2"
-)
-
+# get_embeddings() comes from embedding_backends.py: EMBEDDING_BACKEND=torch
+# (default), onnx or onnx-int8 run the same MiniLM model.
 
 # =========================================================
 # 6️⃣ STORE IN CHROMA VECTOR DB
 # =========================================================
-print("💾 Saving to Vector Database...")
-vectorstore = Chroma.from_documents(
-    documents=chunks,
-    embedding=embeddings,
-    persist_directory=CHROMA_DIR,
-)
-
-print(f"✅ Multimodal ingestion complete! DB stored at: {CHROMA_DIR}")
\ No newline at end of file
+def store_chunks(chunks, embeddings, persist_dir=CHROMA_DIR):
+    return Chroma.from_documents(
+        documents=chunks,
+        embedding=embeddings,
+        persist_directory=persist_dir,
+    )
+
+
+def main():
+    ocr = get_ocr()
+    documents = load_pdfs(ocr=ocr) + load_csvs() + load_images(ocr=ocr)
+    print(f"\n📄 Total documents loaded: {len(documents)}")
+    print(f"🔎 Pages with text layer: {ocr.stats['text_pages']}, OCRed: {ocr.stats['ocr_pages']}, "
+          f"from OCR cache: {ocr.stats['cached_pages']}")
+
+    if not documents:
+        print("⚠️ No documents found! Check your data directories.")
+        return
+
+    chunks = split_documents(documents)
+    print(f"🔹 Total chunks created: {len(chunks)}")
+
+    chunks, removed = remove_near_duplicates(chunks)
+    print(f"🧹 Near-duplicate chunks removed: {removed} ({len(chunks)} left)")
+
+    print(f"🧠 Generating Embeddings ({EMBEDDING_MODEL}, {os.getenv('EMBEDDING_BACKEND', 'torch')})...")
+    embeddings = get_embeddings()
+
+    print("💾 Saving to Vector Database...")
+    store_chunks(chunks, embeddings)
+
+    print(f"✅ Multimodal ingestion complete! DB stored at: {CHROMA_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""OCR for scanned PDFs and images, used by ingest.py.
+
+Only pages without a usable text layer are OCRed. Those pages are rendered
+(pypdfium2 when installed, otherwise the page's embedded scan is extracted
+with pypdf), downscaled, binarized and sent to Tesseract in a process pool.
+The Tesseract language pack is picked once per document from the script
+Tesseract's OSD detects. Results are cached on disk by page content hash,
+so re-running ingestion over the same bulletins costs no OCR at all.
+"""
+import os
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+import pytesseract
+from pypdf import PdfReader
+
+try:
+    import pypdfium2
+except ImportError:  # pragma: no cover - optional, pip install pypdfium2
+    pypdfium2 = None
+
+OCR_DPI = 300
+MAX_SIDE = 3500        # ~A4 at 300 dpi; larger scans are downscaled first
+MIN_TEXT_CHARS = 25    # fewer extractable characters means "no text layer"
+OCR_CONFIG = "--oem 1 --psm 3"
+CACHE_VERSION = "2"    # bump when preprocessing or OCR settings change
+
+# Tesseract OSD script -> language packs to load (English is kept for mixed bulletins)
+SCRIPT_LANGS = {
+    "Latin": "eng",
+    "Devanagari": "hin+eng",
+    "Tamil": "tam+eng",
+    "Telugu": "tel+eng",
+    "Kannada": "kan+eng",
+    "Bengali": "ben+eng",
+    "Gujarati": "guj+eng",
+}
+
+
+# --- IMAGE PREPARATION ---
+def otsu_threshold(gray):
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    weights = np.cumsum(hist)
+    means = np.cumsum(hist * np.arange(256))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (means[-1] * weights / total - means) ** 2 / (weights * (total - weights))
+    if np.isnan(between).all():  # a single grey level, e.g. a blank page
+        return 127
+    return int(np.nanargmax(between))
+
+
+def preprocess(image, max_side=MAX_SIDE):
+    """Grayscale, cap the resolution and binarize with Otsu's threshold."""
+    image = image.convert("L")
+    scale = max_side / max(image.size)
+    if scale < 1:
+        image = image.resize((max(1, int(image.width * scale)), max(1, int(image.height * scale))), Image.LANCZOS)
+    gray = np.asarray(image)
+    return Image.fromarray(np.where(gray > otsu_threshold(gray), 255, 0).astype(np.uint8))
+
+
+def render_page(path, index, dpi=OCR_DPI):
+    if pypdfium2 is not None:
+        pdf = pypdfium2.PdfDocument(path)
+        try:
+            return pdf[index].render(scale=dpi / 72, grayscale=True).to_pil()
+        finally:
+            pdf.close()
+    # A scanned page is normally one full-page image; take the largest
+    images = PdfReader(path).pages[index].images
+    if not images:
+        return None
+    return max((img.image for img in images), key=lambda im: im.width * im.height)
+
+
+# --- WORKER FUNCTIONS (run in the process pool) ---
+def _load(job):
+    kind, path, index = job
+    return render_page(path, index) if kind == "pdf" else Image.open(path)
+
+
+def detect_langs(job, available):
+    """Language packs for a document from the script of one of its pages."""
+    try:
+        image = _load(job)
+        if image is None:
+            return "eng"
+        script = pytesseract.image_to_osd(preprocess(image, 1600), output_type=pytesseract.Output.DICT)["script"]
+    except Exception:
+        return "eng"
+    wanted = SCRIPT_LANGS.get(script, "eng").split("+")
+    return "+".join(lang for lang in wanted if lang in available) or "eng"
+
+
+def ocr_job(job, langs):
+    image = _load(job)
+    if image is None:
+        return ""
+    return pytesseract.image_to_string(preprocess(image), lang=langs, config=OCR_CONFIG)
+
+
+# --- CACHE ---
+class OcrCache:
+    """OCR text on disk, one file per page hash."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key + ".txt")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, text):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+
+def _hash_xobjects(h, resources, seen):
+    # Scanners often wrap the page image in a Form XObject, so the page's own
+    # content stream is identical on every page; the image sits one level down.
+    xobjects = (resources.get_object() if resources is not None else {}).get("/XObject") or {}
+    for name in sorted(xobjects):
+        ref = xobjects[name]
+        obj = ref.get_object()
+        ident = (ref.idnum, ref.generation) if hasattr(ref, "idnum") else id(obj)
+        if ident in seen:  # shared form or a reference cycle
+            continue
+        seen.add(ident)
+        subtype = obj.get("/Subtype")
+        if subtype == "/Image":
+            h.update(obj.get_data())
+        elif subtype == "/Form":
+            h.update(obj.get_data())
+            _hash_xobjects(h, obj.get("/Resources"), seen)
+
+
+def page_hash(page):
+    """Hash of what a page draws: its content streams and image data, Form XObjects included."""
+    h = hashlib.sha256()
+    contents = page.get_contents()
+    if contents is not None:
+        h.update(contents.get_data())
+    _hash_xobjects(h, page.get("/Resources"), set())
+    return h.hexdigest()
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+# --- OCR RUNNER ---
+class SmartOcr:
+    """Text extraction for a batch of PDFs/images with OCR only where needed.
+
+    `langs` fixes the Tesseract languages (e.g. "hin+eng") instead of
+    detecting them per document.
+    """
+
+    def __init__(self, cache_dir, workers=None, langs=None):
+        self.cache = OcrCache(cache_dir)
+        self.workers = workers or os.cpu_count() or 1
+        self.langs = langs
+        self.stats = {"text_pages": 0, "ocr_pages": 0, "cached_pages": 0}
+        self._available = None
+
+    def _cache_key(self, content_hash):
+        return f"{content_hash}-{self.langs or 'auto'}-v{CACHE_VERSION}"
+
+    def available_langs(self):
+        if self._available is None:
+            try:
+                self._available = set(pytesseract.get_languages(config=""))
+            except Exception:
+                self._available = {"eng"}
+        return self._available
+
+    def _run(self, documents):
+        """documents: {doc_id: [(cache_key, job), ...]} -> {cache_key: text} for every job."""
+        results, todo = {}, {}
+        for doc_id, jobs in documents.items():
+            for key, job in jobs:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    results[key] = cached
+                    self.stats["cached_pages"] += 1
+                else:
+                    todo.setdefault(doc_id, []).append((key, job))
+        if not todo:
+            return results
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            if self.langs:
+                doc_langs = {doc_id: self.langs for doc_id in todo}
+            else:
+                available = self.available_langs()
+                detections = {doc_id: pool.submit(detect_langs, jobs[0][1], available) for doc_id, jobs in todo.items()}
+                doc_langs = {}
+                for doc_id, future in detections.items():
+                    try:
+                        doc_langs[doc_id] = future.result()
+                    except Exception as e:  # e.g. the worker process died
+                        print(f"   ⚠️ Language detection failed for {os.path.basename(doc_id)}, using eng: {e}")
+                        doc_langs[doc_id] = "eng"
+            futures = [(key, pool.submit(ocr_job, job, doc_langs[doc_id]))
+                       for doc_id, jobs in todo.items() for key, job in jobs]
+            for key, future in futures:
+                try:
+                    text = future.result()
+                except Exception as e:
+                    print(f"   ❌ OCR failed for {key[:12]}: {e}")
+                    continue
+                self.cache.put(key, text)
+                results[key] = text
+                self.stats["ocr_pages"] += 1
+        return results
+
+    def load_pdfs(self, paths):
+        """Per-page (path, page_index, text, ocr_used) for every PDF, in order."""
+        pages, documents = [], {}
+        for path in paths:
+            try:
+                reader = PdfReader(path)
+                count = len(reader.pages)
+            except Exception as e:
+                print(f"   ❌ Error loading {os.path.basename(path)}: {e}")
+                continue
+            for index in range(count):
+                # A broken page is skipped, not the file or the whole run
+                try:
+                    page = reader.pages[index]
+                    text = page.extract_text() or ""
+                    scanned = len("".join(text.split())) < MIN_TEXT_CHARS
+                    key = self._cache_key(page_hash(page)) if scanned else None
+                except Exception as e:
+                    print(f"   ❌ Error reading page {index + 1} of {os.path.basename(path)}: {e}")
+                    continue
+                if not scanned:
+                    pages.append((path, index, text, None))
+                    self.stats["text_pages"] += 1
+                    continue
+                documents.setdefault(path, []).append((key, ("pdf", path, index)))
+                pages.append((path, index, None, key))
+
+        texts = self._run(documents)
+        return [(path, index, text if key is None else texts.get(key, ""), key is not None)
+                for path, index, text, key in pages]
+
+    def load_images(self, paths):
+        """(path, text) for every image; each image is its own document."""
+        documents = {}
+        for path in paths:
+            try:
+                documents[path] = [(self._cache_key(file_hash(path)), ("image", path, 0))]
+            except OSError as e:  # removed or unreadable since it was listed
+                print(f"   ❌ Error loading {os.path.basename(path)}: {e}")
+        texts = self._run(documents)
+        return [(path, texts.get(jobs[0][0], "")) for path, jobs in documents.items()]
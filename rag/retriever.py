@@ -1,34 +1,64 @@
 from dotenv import load_dotenv
 from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+
+from embedding_backends import get_embeddings
+from translation import get_query_normalizer
 
 load_dotenv()
 
 CHROMA_DIR = "data/chroma_db"
 
-# --- SAME embeddings used in ingestion ---
-embeddings = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2"
-)
+# The embedding model, vector DB and LLM are built on first use, so importing
+# this module (from the app or the benchmarks) does not load MiniLM.
+_embeddings = None
+_vectorstore = None
+_normalizer = None
+_rag_chain = None
 
-# --- Load vector DB ---
-vectorstore = Chroma(
-    persist_directory=CHROMA_DIR,
-    embedding_function=embeddings,
-)
 
-retriever = vectorstore.as_retriever(search_kwargs={"k": 4})
+# --- Load vector DB (SAME embedding model as ingestion, see embedding_backends.py) ---
+def get_embedding_model():
+    # Shared, so reloading a new index build (app/knowledge.py) doesn't reload MiniLM
+    global _embeddings
+    if _embeddings is None:
+        _embeddings = get_embeddings()
+    return _embeddings
+
+
+def load_vectorstore(persist_dir=CHROMA_DIR, embeddings=None):
+    return Chroma(
+        persist_directory=persist_dir,
+        embedding_function=embeddings or get_embedding_model(),
+    )
+
+
+def get_vectorstore():
+    global _vectorstore
+    if _vectorstore is None:
+        _vectorstore = load_vectorstore()
+    return _vectorstore
+
+
+def get_retriever(k=4):
+    return get_vectorstore().as_retriever(search_kwargs={"k": k})
+
+
+# --- Query normalisation (the index is English, see translation.py) ---
+def get_normalizer():
+    global _normalizer
+    if _normalizer is None:
+        _normalizer = get_query_normalizer()
+        _normalizer.warm()  # loads the translation models; slow the first time
+    return _normalizer
+
+
+def normalize_query(query: str) -> str:
+    return get_normalizer().normalize(query)
 
-# --- Gemini Flash 3 Preview LLM ---
-llm = ChatGoogleGenerativeAI(
-    model="gemini-3-flash-preview",   # Flash preview / latest fast model
-    temperature=1.0,
-    convert_system_message_to_human=True,
-)
 
 # --- Prompt ---
 prompt = ChatPromptTemplate.from_template(
@@ -45,14 +75,27 @@ Question:
 Give clear, practical, step-by-step farming guidance suitable for Indian farmers."""
 )
 
+
 # --- LCEL RAG chain ---
-rag_chain = (
-    {"context": retriever, "question": RunnablePassthrough()}
-    | prompt
-    | llm
-    | StrOutputParser()
-)
+def get_rag_chain():
+    global _rag_chain
+    if _rag_chain is None:
+        # --- Gemini Flash 3 Preview LLM ---
+        llm = ChatGoogleGenerativeAI(
+            model="gemini-3-flash-preview",   # Flash preview / latest fast model
+            temperature=1.0,
+            convert_system_message_to_human=True,
+        )
+        _rag_chain = (
+            # Search with the English query, answer the farmer's original question
+            {"context": RunnableLambda(normalize_query) | get_retriever(), "question": RunnablePassthrough()}
+            | prompt
+            | llm
+            | StrOutputParser()
+        )
+    return _rag_chain
+
 
 # --- Public function ---
 def ask(query: str) -> str:
-    return rag_chain.invoke(query)
+    return get_rag_chain().invoke(query)
@@ -0,0 +1,216 @@
+"""Query normalisation for retrieval: detect the language, translate to English.
+
+The knowledge base is embedded with English-only MiniLM, so a Hindi, Tamil,
+Telugu, Spanish or French question is translated locally before the vector
+search instead of asking Gemini to do it. Translators are pluggable
+(QUERY_TRANSLATOR):
+    marian       Helsinki-NLP opus-mt models through transformers + sentencepiece (default)
+    argos        argostranslate with its installed language packages
+    none         no translation
+    module:func  any callable func(text, source_lang) -> English text
+
+Models for QUERY_TRANSLATOR_LANGS are loaded up front by warm() (the app
+calls it on the knowledge base loader thread), never inside a chat's
+retrieval budget; a language without a loaded model is searched as is.
+Translations are kept in a SQLite cache that survives restarts, so a repeated
+question costs one lookup.
+"""
+import os
+import re
+import sqlite3
+import hashlib
+import importlib
+import threading
+
+LANGUAGES = ("en", "hi", "ta", "te", "es", "fr")
+TRANSLATED_LANGUAGES = tuple(lang.strip() for lang in os.getenv("QUERY_TRANSLATOR_LANGS", "hi,ta,te,es,fr").split(",")
+                             if lang.strip())
+CACHE_PATH = os.getenv("QUERY_TRANSLATION_CACHE", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "data", "translation_cache.sqlite"))
+
+# --- LANGUAGE DETECTION ---
+# Indic languages by Unicode block; Latin-script ones by common function words
+_SCRIPTS = (
+    ("hi", re.compile("[ऀ-ॿ]")),
+    ("ta", re.compile("[஀-௿]")),
+    ("te", re.compile("[ఀ-౿]")),
+)
+_STOPWORDS = {
+    "en": {"the", "is", "are", "what", "how", "my", "to", "in", "of", "and", "should", "for", "with", "which"},
+    "es": {"el", "la", "los", "las", "es", "que", "qué", "cómo", "como", "mi", "para", "en", "con", "del", "por", "una"},
+    "fr": {"le", "la", "les", "est", "que", "quoi", "comment", "mon", "ma", "mes", "pour", "dans", "avec", "des", "une"},
+}
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def detect_language(text):
+    """Best guess among LANGUAGES; English when unsure."""
+    text = text or ""
+    counts = [(len(pattern.findall(text)), lang) for lang, pattern in _SCRIPTS]
+    count, lang = max(counts)
+    if count >= 2:
+        return lang
+    words = _WORD.findall(text.lower())
+    scores = {lang: sum(word in stop for word in words) for lang, stop in _STOPWORDS.items()}
+    if "ñ" in text or "¿" in text:
+        scores["es"] += 2
+    if any(c in text for c in "çèêàù"):
+        scores["fr"] += 1
+    best = max(scores, key=scores.get)
+    return best if scores[best] > scores["en"] else "en"
+
+
+# --- TRANSLATORS ---
+class MarianTranslator:
+    """opus-mt models, one per source language, loaded by warm()."""
+
+    MODELS = {
+        "hi": "Helsinki-NLP/opus-mt-hi-en",
+        "es": "Helsinki-NLP/opus-mt-es-en",
+        "fr": "Helsinki-NLP/opus-mt-fr-en",
+        "ta": "Helsinki-NLP/opus-mt-mul-en",
+        "te": "Helsinki-NLP/opus-mt-mul-en",
+    }
+
+    def __init__(self):
+        # Fail early when missing; MarianTokenizer needs sentencepiece
+        from transformers import MarianMTModel, MarianTokenizer  # noqa: F401
+        import sentencepiece  # noqa: F401
+        self._models = {}  # model name -> (tokenizer, model), or None when it could not be loaded
+        self._lock = threading.Lock()
+
+    def warm(self, languages):
+        from transformers import MarianMTModel, MarianTokenizer
+        with self._lock:
+            for name in sorted({self.MODELS[lang] for lang in languages if lang in self.MODELS}):
+                if name in self._models:
+                    continue
+                try:
+                    self._models[name] = (MarianTokenizer.from_pretrained(name), MarianMTModel.from_pretrained(name).eval())
+                    print(f"✅ Translation model {name} loaded")
+                except Exception as e:
+                    # Not downloaded and no network: don't retry on every reload
+                    print(f"⚠️ Warning: translation model {name} unavailable: {e}")
+                    self._models[name] = None
+
+    def __call__(self, text, source_lang):
+        # Only models loaded by warm(); never a download inside a request
+        loaded = self._models.get(self.MODELS.get(source_lang))
+        if loaded is None:
+            return text
+        tokenizer, model = loaded
+        batch = tokenizer([text], return_tensors="pt", truncation=True, max_length=256)
+        output = model.generate(**batch, max_new_tokens=256, num_beams=1)
+        return tokenizer.decode(output[0], skip_special_tokens=True)
+
+
+class ArgosTranslator:
+    def __init__(self):
+        from argostranslate import translate
+        self._translate = translate.translate
+
+    def __call__(self, text, source_lang):
+        return self._translate(text, source_lang, "en")
+
+
+def load_translator(name):
+    """Translator callable for a QUERY_TRANSLATOR value, or None."""
+    if not name or name == "none":
+        return None
+    if name == "marian":
+        return MarianTranslator()
+    if name == "argos":
+        return ArgosTranslator()
+    module, _, attr = name.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+# --- PERSISTENT CACHE ---
+class TranslationCache:
+    """(language, query) -> English in a local SQLite file, shared across processes."""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS translations (key TEXT PRIMARY KEY, lang TEXT, source TEXT, english TEXT)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _key(lang, text):
+        return hashlib.sha1(f"{lang}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get(self, lang, text):
+        row = self._conn().execute("SELECT english FROM translations WHERE key = ?", (self._key(lang, text),)).fetchone()
+        return row[0] if row else None
+
+    def put(self, lang, text, english):
+        self._conn().execute("INSERT OR REPLACE INTO translations (key, lang, source, english) VALUES (?, ?, ?, ?)",
+                             (self._key(lang, text), lang, text, english))
+
+
+# --- NORMALISER ---
+class QueryNormalizer:
+    """normalize(query) -> English text for the vector search (the query itself on any failure)."""
+
+    def __init__(self, translator=None, cache=None, max_chars=500, languages=TRANSLATED_LANGUAGES):
+        self.translator = translator
+        self.cache = cache
+        self.max_chars = max_chars
+        self.languages = languages
+        self._lock = threading.Lock()
+        self.stats = {"translated": 0, "cache_hits": 0, "untranslated": 0, "errors": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def warm(self):
+        """Load the translation models for `languages`; slow, call it off the request path."""
+        warm = getattr(self.translator, "warm", None)
+        if warm is not None:
+            warm(self.languages)
+
+    def normalize(self, query):
+        text = " ".join((query or "").split())[:self.max_chars]
+        lang = detect_language(text)
+        if lang == "en" or lang not in self.languages or self.translator is None or not text:
+            return text
+        if self.cache is not None:
+            cached = self.cache.get(lang, text)
+            if cached is not None:
+                self._count("cache_hits")
+                return cached
+        try:
+            english = " ".join(self.translator(text, lang).split())
+        except Exception as e:
+            self._count("errors")
+            print(f"⚠️ Warning: query translation ({lang}) failed: {e}")
+            return text
+        if not english or english == text:  # no model for this language; don't cache that
+            self._count("untranslated")
+            return text
+        self._count("translated")
+        if self.cache is not None:
+            self.cache.put(lang, text, english)
+        return english
+
+    __call__ = normalize
+
+
+def get_query_normalizer():
+    name = os.getenv("QUERY_TRANSLATOR", "marian")
+    try:
+        translator = load_translator(name)
+    except Exception as e:
+        print(f"⚠️ Warning: query translator {name!r} unavailable, non-English queries are searched as is: {e}")
+        translator = None
+    return QueryNormalizer(translator, TranslationCache() if translator else None)
@@ -0,0 +1,233 @@
+"""Watch-folder ingestion service: new advisories become searchable in minutes.
+
+    python rag/watch.py            # run until stopped
+    python rag/watch.py --once     # build whatever changed, publish it, exit
+
+The raw_pdfs / raw_csvs / raw_images folders are polled every --interval
+seconds. A file is taken once its size and mtime have not changed for
+--settle seconds (until then it is probably still being copied), and files
+dropped together are built as one batch. Each batch goes into a staging
+directory that is published by swapping the CURRENT pointer. The app follows
+CURRENT (KnowledgeBase in app/knowledge.py) and keeps answering from the
+previous build until the new one is complete.
+
+data/rag_index/
+  CURRENT                <- name of the published build
+  20240603T101500/       <- a complete Chroma store
+    files.json           <- {"pdf/name.pdf": [size, mtime_ns], ...} it was built from
+    dedup.npz            <- MinHash signatures of the stored chunks (dedup.py)
+
+New files are added to a copy of the current build, so only they are
+embedded; their chunks are deduplicated against the stored ones through
+dedup.npz. A changed or deleted file triggers a full rebuild instead: its
+chunks may be the one stored copy of a near-duplicate. So does a build
+without dedup.npz. OCR comes from the cache, so a rebuild mostly costs the
+embedding time.
+"""
+import os
+import json
+import time
+import shutil
+import argparse
+import datetime
+
+from langchain_chroma import Chroma
+
+import ingest
+from dedup import load_signatures, save_signatures
+from embedding_backends import get_embeddings
+
+INDEX_DIR = os.getenv("RAG_INDEX_DIR", os.path.join(ingest.DATA_DIR, "rag_index"))
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "files.json"
+SIGNATURES_FILE = "dedup.npz"
+STAGING_SUFFIX = ".staging"
+
+# kind -> (folder, accepted extensions); manifest names are "kind/filename"
+FOLDERS = {
+    "pdf": (ingest.PDF_DIR, (".pdf",)),
+    "csv": (ingest.CSV_DIR, (".csv",)),
+    "image": (ingest.IMAGE_DIR, ingest.IMAGE_EXTENSIONS),
+}
+
+
+# --- FOLDER SCAN ---
+def scan(folders=FOLDERS):
+    """{"kind/name": [size, mtime_ns]} for every file ingestion would read."""
+    files = {}
+    for kind, (folder, extensions) in folders.items():
+        if not os.path.isdir(folder):
+            continue
+        for name in os.listdir(folder):
+            if not name.lower().endswith(extensions):
+                continue
+            try:
+                st = os.stat(os.path.join(folder, name))
+            except FileNotFoundError:  # removed while listing
+                continue
+            files[f"{kind}/{name}"] = [st.st_size, st.st_mtime_ns]
+    return files
+
+
+class FolderWatcher:
+    """Reports files whose size and mtime have been unchanged for `settle` seconds."""
+
+    def __init__(self, folders=FOLDERS, settle=30.0):
+        self.folders = folders
+        self.settle = settle
+        self._since = {}  # name -> (stat, monotonic time it was first seen with that stat)
+
+    def poll(self):
+        """(stable files, names still changing)."""
+        now = time.monotonic()
+        current = scan(self.folders)
+        since = {}
+        for name, stat in current.items():
+            previous = self._since.get(name)
+            since[name] = previous if previous and previous[0] == stat else (stat, now)
+        self._since = since
+        stable = {name: stat for name, (stat, t) in since.items() if now - t >= self.settle}
+        return stable, set(current) - set(stable)
+
+
+# --- BUILDS ---
+def current_build(index_dir=INDEX_DIR):
+    try:
+        with open(os.path.join(index_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def read_manifest(index_dir, build):
+    if build is None:
+        return {}
+    try:
+        with open(os.path.join(index_dir, build, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def publish(index_dir, build):
+    """Point CURRENT at `build`; the rename is atomic so readers never see a partial file."""
+    tmp = os.path.join(index_dir, CURRENT_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(build + "\n")
+    os.replace(tmp, os.path.join(index_dir, CURRENT_FILE))
+
+
+def prune(index_dir, keep=3):
+    """Delete all but the newest `keep` builds (never the published one) and stale staging dirs."""
+    published = current_build(index_dir)
+    builds = sorted(name for name in os.listdir(index_dir)
+                    if os.path.isdir(os.path.join(index_dir, name)))
+    staging = [name for name in builds if name.endswith(STAGING_SUFFIX)]
+    finished = [name for name in builds if not name.endswith(STAGING_SUFFIX)]
+    # Older builds stay around for a while: the app may still be searching them
+    for name in staging + finished[:-keep]:
+        if name != published:
+            shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+
+
+def load_documents(names, ocr):
+    by_kind = {}
+    for name in sorted(names):
+        kind, _, file = name.partition("/")
+        by_kind.setdefault(kind, []).append(file)
+    documents = []
+    if by_kind.get("pdf"):
+        documents += ingest.load_pdfs(ingest.PDF_DIR, ocr, files=by_kind["pdf"])
+    if by_kind.get("csv"):
+        documents += ingest.load_csvs(ingest.CSV_DIR, files=by_kind["csv"])
+    if by_kind.get("image"):
+        documents += ingest.load_images(ingest.IMAGE_DIR, ocr, files=by_kind["image"])
+    return documents
+
+
+def build(files, embeddings, ocr, index_dir=INDEX_DIR):
+    """Build an index of `files` (a scan() result) next to the current one and publish it."""
+    os.makedirs(index_dir, exist_ok=True)
+    previous = current_build(index_dir)
+    old = read_manifest(index_dir, previous)
+    incremental = bool(previous) and all(files.get(name) == stat for name, stat in old.items())
+    known = load_signatures(os.path.join(index_dir, previous, SIGNATURES_FILE)) if incremental else None
+    if known is None:  # without the stored signatures new chunks could duplicate stored ones
+        incremental, known = False, []
+    todo = [name for name in files if name not in old] if incremental else list(files)
+
+    name = datetime.datetime.now().strftime("%Y%m%dT%H%M%S")
+    while os.path.exists(os.path.join(index_dir, name)):
+        name += "-1"
+    staging = os.path.join(index_dir, name + STAGING_SUFFIX)
+    started = time.perf_counter()
+    print(f"🔄 Building {name}: {len(todo)} file(s), {'added to ' + previous if incremental else 'full rebuild'}")
+    try:
+        if incremental:
+            shutil.copytree(os.path.join(index_dir, previous), staging)
+        chunks, removed = ingest.remove_near_duplicates(ingest.split_documents(load_documents(todo, ocr)), known=known)
+        if chunks:
+            store = ingest.store_chunks(chunks, embeddings, staging)
+        else:
+            store = Chroma(persist_directory=staging, embedding_function=embeddings)  # an empty but valid store
+        # Release the SQLite files before the directory is renamed (close() is chromadb >= 1.x)
+        close = getattr(store._client, "close", None)
+        if close is not None:
+            close()
+        with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(files, f, indent=1, sort_keys=True)
+        save_signatures(os.path.join(staging, SIGNATURES_FILE), known)
+        os.rename(staging, os.path.join(index_dir, name))
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    publish(index_dir, name)
+    print(f"✅ Published {name}: {len(chunks)} new chunk(s), {removed} near-duplicate(s) dropped, "
+          f"{time.perf_counter() - started:.1f}s")
+    return name
+
+
+# --- SERVICE LOOP ---
+def run(index_dir=INDEX_DIR, interval=15.0, settle=30.0, max_wait=300.0, keep=3, once=False):
+    embeddings = get_embeddings()  # loaded once, reused by every build
+    ocr = ingest.get_ocr()
+    watcher = FolderWatcher(settle=0 if once else settle)
+    waiting_since = None
+    print(f"👀 Watching {', '.join(folder for folder, _ in FOLDERS.values())} -> {index_dir}")
+    while True:
+        stable, changing = watcher.poll()
+        previous = current_build(index_dir)
+        published = read_manifest(index_dir, previous)
+        # A file still being rewritten counts as its published version until it settles
+        wanted = dict(stable)
+        wanted.update({name: published[name] for name in changing if name in published})
+        if wanted == published and previous is not None:
+            waiting_since = None
+        else:
+            waiting_since = waiting_since or time.monotonic()
+            # Batch: wait for a quiet moment, unless files keep arriving for max_wait
+            if not changing or time.monotonic() - waiting_since >= max_wait:
+                try:
+                    build(wanted, embeddings, ocr, index_dir)
+                    prune(index_dir, keep)
+                    waiting_since = None
+                except Exception as e:
+                    print(f"❌ Index build failed, retrying on the next poll: {e}")
+        if once:
+            return
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--index-dir", default=INDEX_DIR)
+    p.add_argument("--interval", type=float, default=float(os.getenv("RAG_WATCH_INTERVAL", "15")),
+                   help="seconds between folder scans")
+    p.add_argument("--settle", type=float, default=float(os.getenv("RAG_WATCH_SETTLE", "30")),
+                   help="seconds a file must stay unchanged before it is ingested")
+    p.add_argument("--max-wait", type=float, default=float(os.getenv("RAG_WATCH_MAX_WAIT", "300")),
+                   help="build anyway once changes have waited this long for a quiet moment")
+    p.add_argument("--keep", type=int, default=3, help="finished builds to keep on disk")
+    p.add_argument("--once", action="store_true", help="ingest the current folder contents and exit")
+    args = p.parse_args()
+    run(args.index_dir, args.interval, args.settle, args.max_wait, args.keep, args.once)